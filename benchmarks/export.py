@@ -0,0 +1,224 @@
+"""
+Benchmarks of PMML export across model families on synthetic data.
+
+Every case records wall time, peak traced memory, exported nodes per second and size of the output and the results
+are written as JSON, so that runs of different commits can be compared:
+
+    $ python benchmarks/export.py --output before.json
+    $ python benchmarks/export.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import sklearn
+from sklearn.datasets import make_classification
+from sklearn.ensemble import ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from scikit2pmml import PMMLDocument, scikit2pmml  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+QUICK = {
+    'decision_tree': [5, 10],
+    'random_forest': [10],
+    'extra_trees': [10],
+    'gradient_boosting': [10],
+    'logistic_regression': [10, 1000]
+}
+
+FULL = {
+    'decision_tree': [5, 10, 20, None],
+    'deep_tree': [250000],
+    'random_forest': [10, 100, 1000],
+    'extra_trees': [10, 100, 1000],
+    'gradient_boosting': [10, 100, 1000],
+    'logistic_regression': [10, 1000, 10000, 50000]
+}
+
+
+class CountingSink:
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+
+def _tree_data(n_samples=5000, n_features=20, n_classes=3, flip_y=0.01):
+    return make_classification(n_samples=n_samples, n_features=n_features, n_informative=10, n_classes=n_classes,
+                               flip_y=flip_y, random_state=0)
+
+
+def build(family, size):
+    """
+    Fits estimator of the given family on synthetic data.
+
+    :param family: one of decision_tree, deep_tree, random_forest, extra_trees, gradient_boosting or
+        logistic_regression.
+    :param size: depth of the tree, number of samples of the (fully grown) deep tree fitted on noisy data (250000
+        give about 100k nodes), number of trees of the forest, number of stages of the boosting or number of features
+        of the linear model.
+    :return: fitted estimator
+    """
+    if family == 'decision_tree':
+        return DecisionTreeClassifier(max_depth=size, random_state=0).fit(*_tree_data())
+    if family == 'deep_tree':
+        return DecisionTreeClassifier(random_state=0).fit(*_tree_data(n_samples=size, flip_y=0.3))
+    if family == 'random_forest':
+        return RandomForestClassifier(n_estimators=size, max_depth=10, random_state=0).fit(*_tree_data())
+    if family == 'extra_trees':
+        return ExtraTreesClassifier(n_estimators=size, max_depth=10, random_state=0).fit(*_tree_data())
+    if family == 'gradient_boosting':
+        return GradientBoostingClassifier(n_estimators=size, max_depth=3, subsample=0.5, random_state=0).fit(
+            *_tree_data())
+    if family == 'logistic_regression':
+        X, y = make_classification(n_samples=200, n_features=size, n_informative=min(size // 2, 10),
+                                   n_redundant=0, random_state=0)
+        return LogisticRegression(max_iter=20).fit(X, y)
+    raise ValueError('Unknown family: {}.'.format(family))
+
+
+def node_count(estimator):
+    if hasattr(estimator, 'estimators_'):
+        return sum(e.tree_.node_count for e in np.ravel(estimator.estimators_))
+    if hasattr(estimator, 'tree_'):
+        return estimator.tree_.node_count
+    return 0
+
+
+def export(estimator, mode, **kwargs):
+    """
+    :param mode: stream (streaming writer), document (default scikit2pmml call writing the file and returning the
+        element tree) or element (default scikit2pmml call building the element tree only).
+    :return: size of the output (None when no file is written)
+    """
+    sink = CountingSink()
+    if mode == 'stream':
+        PMMLDocument(estimator, None, **kwargs).write(sink)
+    elif mode == 'document':
+        scikit2pmml(estimator, file=sink, **kwargs)
+    else:
+        scikit2pmml(estimator, **kwargs)
+        return None
+    return sink.size
+
+
+def measure(estimator, mode, repeat, **kwargs):
+    """
+    :return: dictionary with best wall time, peak memory (of separate traced run) and output bytes
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = export(estimator, mode, **kwargs)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    export(estimator, mode, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    seconds = min(times)
+    nodes = node_count(estimator)
+    return {
+        'seconds': seconds,
+        'peak_bytes': peak,
+        'output_bytes': size,
+        'nodes': nodes,
+        'nodes_per_second': nodes / seconds if nodes else None
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                         cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'machine': platform.machine()
+    }
+
+
+def run(grid, modes, repeat, profiles):
+    results = []
+    for family, sizes in grid.items():
+        for size in sizes:
+            estimator = build(family, size)
+            for mode in modes:
+                for profile, kwargs in profiles.items():
+                    if profile == 'compact' and family == 'logistic_regression':
+                        continue
+                    if 'backend' in kwargs and mode != 'stream':
+                        continue
+                    case = '{}[{}]/{}/{}'.format(family, size, mode, profile)
+                    result = measure(estimator, mode, repeat, **kwargs)
+                    result.update(case=case, family=family, size=size, mode=mode, profile=profile)
+                    results.append(result)
+                    logger.info('{:<45} {:>9.3f}s {:>10.1f}MB peak {:>10.1f}MB out'.format(
+                        case, result['seconds'], result['peak_bytes'] / 1e6, (result['output_bytes'] or 0) / 1e6))
+    return results
+
+
+def compare(results, baseline):
+    """
+    Logs relative change of time, memory and size against the baseline report.
+    """
+    previous = {r['case']: r for r in baseline['results']}
+    for result in results:
+        before = previous.get(result['case'])
+        if before is None:
+            continue
+        changes = ['{} {:+.1%}'.format(metric, result[metric] / before[metric] - 1)
+                   for metric in ('seconds', 'peak_bytes', 'output_bytes') if before[metric] and result[metric]]
+        logger.info('{:<45} {}'.format(result['case'], ', '.join(changes)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='run only the small cases')
+    parser.add_argument('--families', nargs='+', choices=sorted(FULL), help='run only the given model families')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs (the best one is reported)')
+    parser.add_argument('--modes', nargs='+', default=['stream', 'document', 'element'],
+                        choices=['stream', 'document', 'element'])
+    parser.add_argument('--output', help='file where the JSON report is written')
+    parser.add_argument('--compare', help='JSON report of previous run to compare with')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    logging.getLogger('scikit2pmml').setLevel(logging.ERROR)
+    warnings.simplefilter('ignore')
+    profiles = {'default': {}, 'compact': {'compact': True}, 'lxml': {'backend': 'lxml'}, 'etree': {'backend': 'etree'}}
+    grid = QUICK if args.quick else FULL
+    if args.families:
+        grid = {family: sizes for family, sizes in grid.items() if family in args.families}
+    report = {
+        'environment': environment(),
+        'results': run(grid, args.modes, args.repeat, profiles)
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report['results'], json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+Serialization backends - models describe themselves as stream of events (start and end of element, empty element,
+whole element or pre-serialized bytes) and the writers turn the events into the output:
+
+* etree - builds ElementTree elements (the original implementation, used for the element tree API too),
+* lxml - writes through incremental lxml.etree.xmlfile writer (requires lxml),
+* bytes - formats escaped XML directly, without creating any objects per element (default).
+"""
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+from scikit2pmml.serialization import tostring, escape_attribute
+
+BACKENDS = ('bytes', 'lxml', 'etree')
+
+
+def _attributes(attrib):
+    return ''.join(' {}="{}"'.format(key, escape_attribute(value)) for key, value in attrib.items())
+
+
+class ElementWriter:
+    """
+    Builds element tree from the events, the built element is available as root.
+    """
+
+    # the writer does not produce bytes
+    serializes = False
+    # the writer does not prefer pre-serialized bytes over events
+    direct = False
+
+    def __init__(self):
+        self.root = None
+        self.stack = []
+
+    def _add(self, element):
+        if self.stack:
+            self.stack[-1].append(element)
+        elif self.root is None:
+            self.root = element
+
+    def start(self, tag, attrib):
+        if self.stack:
+            self.stack.append(ET.SubElement(self.stack[-1], tag, attrib))
+        else:
+            element = ET.Element(tag, attrib)
+            self._add(element)
+            self.stack.append(element)
+
+    def end(self, tag):
+        self.stack.pop()
+
+    def empty(self, tag, attrib):
+        if self.stack:
+            ET.SubElement(self.stack[-1], tag, attrib)
+        else:
+            self._add(ET.Element(tag, attrib))
+
+    def element(self, element):
+        self._add(element)
+
+    def fragment(self, model, name):
+        self._add(getattr(model, name))
+
+    def raw(self, data):
+        self._add(ET.fromstring(data))
+
+    def drain(self):
+        return b''
+
+    def close(self):
+        pass
+
+
+class BytesWriter:
+    """
+    Formats the events directly as escaped XML (identical to the ElementTree serialization) and collects it until
+    drained.
+    """
+
+    serializes = True
+    direct = True
+
+    def __init__(self):
+        self.text = []
+        self.chunks = []
+
+    def _flush_text(self):
+        if self.text:
+            self.chunks.append(''.join(self.text).encode('utf-8'))
+            self.text = []
+
+    def start(self, tag, attrib):
+        self.text.append('<{}{}>'.format(tag, _attributes(attrib)))
+
+    def end(self, tag):
+        self.text.append('</{}>'.format(tag))
+
+    def empty(self, tag, attrib):
+        self.text.append('<{}{} />'.format(tag, _attributes(attrib)))
+
+    def element(self, element):
+        self.raw(tostring(element))
+
+    def fragment(self, model, name):
+        self.raw(model.serialized(name))
+
+    def raw(self, data):
+        self._flush_text()
+        self.chunks.append(data)
+
+    def drain(self):
+        self._flush_text()
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+    def close(self):
+        pass
+
+
+class LxmlWriter:
+    """
+    Writes the events through incremental lxml writer, pre-serialized bytes are spliced into its output.
+    """
+
+    serializes = True
+    direct = False
+
+    def __init__(self):
+        try:
+            from lxml import etree
+        except ImportError:
+            raise ImportError("Install lxml package to use lxml backend.")
+        self.etree = etree
+        self.chunks = []
+        self.context = etree.xmlfile(self, encoding='utf-8')
+        self.file = self.context.__enter__()
+        self.stack = []
+
+    def write(self, data):
+        # called by lxml
+        self.chunks.append(data)
+
+    def start(self, tag, attrib):
+        element = self.file.element(tag, attrib)
+        element.__enter__()
+        self.stack.append(element)
+
+    def end(self, tag):
+        self.stack.pop().__exit__(None, None, None)
+
+    def empty(self, tag, attrib):
+        self.file.write(self.etree.Element(tag, attrib))
+
+    def element(self, element):
+        self.raw(tostring(element))
+
+    def fragment(self, model, name):
+        self.raw(model.serialized(name))
+
+    def raw(self, data):
+        self.file.flush()
+        self.chunks.append(data)
+
+    def drain(self):
+        if self.file is not None:
+            self.file.flush()
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+    def close(self):
+        self.context.__exit__(None, None, None)
+        self.file = None
+
+
+def create_writer(backend):
+    """
+    :param backend: name of the backend (bytes, lxml or etree).
+    :return: writer of the backend
+    """
+    if backend == 'bytes':
+        return BytesWriter()
+    if backend == 'lxml':
+        return LxmlWriter()
+    if backend == 'etree':
+        return ElementWriter()
+    raise ValueError('Unknown backend: {}, use one of {}.'.format(backend, ', '.join(BACKENDS)))
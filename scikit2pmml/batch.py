@@ -0,0 +1,146 @@
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import io
+import logging
+import time
+import traceback
+
+from scikit2pmml.document import PMMLDocument
+from scikit2pmml.parallel import Completed, effective_n_jobs
+
+logger = logging.getLogger(__name__)
+
+ExportResult = namedtuple('ExportResult', ['index', 'destination', 'size', 'seconds', 'error', 'document', 'digest'])
+ExportResult.__doc__ = """
+Outcome of one export of the batch.
+
+:param index: position of the model in the batch.
+:param destination: file name the PMML was written into (None when the document is returned).
+:param size: number of (uncompressed) bytes of the document.
+:param seconds: duration of the export.
+:param error: formatted exception when the export failed, otherwise None.
+:param document: UTF-8 encoded document when no destination was given, otherwise None.
+:param digest: SHA-256 hex digest of the (uncompressed) document.
+"""
+
+
+def export_one(index, estimator, transformer, kwargs, destination):
+    """
+    Exports one model of the batch, module level function so that it can be run in worker processes. Exceptions are
+    returned within the result, so that one bad model does not abort the batch. The estimator may be a loader instead -
+    callable without arguments returning it (e.g. loading it from file), so that only the loader is shipped to the
+    worker and the model is loaded there.
+
+    :return: ExportResult
+    """
+    start = time.perf_counter()
+    try:
+        if callable(estimator):
+            estimator = estimator()
+        pmml = PMMLDocument(estimator, transformer, **kwargs)
+        buffer = io.BytesIO() if destination is None else None
+        pmml.write(buffer if destination is None else destination)
+        document = buffer.getvalue() if destination is None else None
+        return ExportResult(index, destination, pmml.size, time.perf_counter() - start, None, document, pmml.digest)
+    except Exception:
+        return ExportResult(index, destination, 0, time.perf_counter() - start, traceback.format_exc(), None, None)
+
+
+class BatchExport:
+    """
+    Exports many models on a pool of worker processes, results are yielded as the exports finish (not in order of the
+    models). The models are taken from the iterable lazily, at most window of them are in flight at once. Aggregate
+    statistics are updated as the results are consumed.
+
+    :param models: iterable of (estimator, transformer, kwargs, destination) tuples, estimator may be loader (callable
+        returning it), destination is file name (compressed according to extension) or None to return the document
+        within the result.
+    :param n_jobs: number of worker processes (-1 means all CPUs, 1 exports in the calling process).
+    :param window: maximal number of submitted but not yet finished exports (defaults to 4 * n_jobs).
+    """
+
+    def __init__(self, models, n_jobs=-1, window=None):
+        self.models = models
+        self.n_jobs = effective_n_jobs(n_jobs)
+        self.window = window or 4 * self.n_jobs
+        self.exported = 0
+        self.failed = 0
+        self.size = 0
+        self.seconds = 0.0
+
+    @property
+    def models_per_second(self):
+        return (self.exported + self.failed) / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.size / self.seconds if self.seconds else 0.0
+
+    def __iter__(self):
+        start = time.perf_counter()
+        if self.n_jobs == 1:
+            results = (export_one(i, *task) for i, task in enumerate(self.models))
+            for result in results:
+                yield self._collect(result, start)
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+                for result in self._parallel(executor):
+                    yield self._collect(result, start)
+        logger.info('[x] Exported {} models ({} failed) in {:.2f}s - {:.1f} models/s, {:.1f} MB/s.'.format(
+            self.exported, self.failed, self.seconds, self.models_per_second, self.bytes_per_second / 1e6))
+
+    def _parallel(self, executor):
+        pending = {}
+        tasks = enumerate(self.models)
+        for i, task in tasks:
+            pending[self._submit(executor, i, task)] = (i, task[3])
+            while len(pending) >= self.window:
+                for result in self._finished(pending):
+                    yield result
+        while pending:
+            for result in self._finished(pending):
+                yield result
+
+    @staticmethod
+    def _submit(executor, i, task):
+        try:
+            return executor.submit(export_one, i, *task)
+        except Exception:
+            return Completed(ExportResult(i, task[3], 0, 0.0, traceback.format_exc(), None, None))
+
+    @staticmethod
+    def _finished(pending):
+        futures = [f for f in pending if isinstance(f, Completed)]
+        if not futures:
+            futures, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in futures:
+            index, destination = pending.pop(future)
+            try:
+                yield future.result()
+            except Exception:
+                # e.g. the model could not be pickled or the worker died
+                yield ExportResult(index, destination, 0, 0.0, traceback.format_exc(), None, None)
+
+    def _collect(self, result, start):
+        if result.error is None:
+            self.exported += 1
+            self.size += result.size
+        else:
+            self.failed += 1
+            logger.error('[!] Export of model {} failed:\n{}'.format(result.index, result.error))
+        self.seconds = time.perf_counter() - start
+        return result
+
+
+def scikit2pmml_many(models, n_jobs=-1, window=None):
+    """
+    Exports many models (e.g. one per customer) on shared pool of worker processes.
+
+    :param models: iterable of (estimator, transformer, kwargs, destination) tuples, estimator may be loader (callable
+        returning it, e.g. functools.partial(joblib.load, path)), destination is file name or None to return the
+        document within the result.
+    :param n_jobs: number of worker processes (-1 means all CPUs).
+    :param window: maximal number of exports in flight, bounds the memory (defaults to 4 * n_jobs).
+    :return: BatchExport - iterable of ExportResult yielded as the exports finish, with aggregate statistics
+    """
+    return BatchExport(models, n_jobs, window)
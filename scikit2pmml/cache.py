@@ -0,0 +1,115 @@
+from collections import OrderedDict
+import hashlib
+import os
+import tempfile
+
+# bump whenever the serialized form of the cached fragments changes, so that stale disk caches are not reused
+CACHE_VERSION = 2
+
+
+def fingerprint(arrays, context):
+    """
+    Content hash of the model arrays and naming context (feature names, target values, export options...).
+
+    :param arrays: list of numpy arrays.
+    :param context: tuple of hashable values affecting the serialized form.
+    :return: hex digest
+    """
+    digest = hashlib.sha256(repr((CACHE_VERSION, context)).encode('utf-8'))
+    for array in arrays:
+        digest.update(repr((array.dtype.str, array.shape)).encode('utf-8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class FragmentCache:
+    """
+    In-memory cache of serialized fragments (e.g. trees of a forest) with least recently used eviction, so that
+    re-export of a warm-started ensemble serializes only the new trees.
+
+    :param max_bytes: maximal total size of cached fragments.
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.fragments = OrderedDict()
+
+    def __len__(self):
+        return len(self.fragments)
+
+    def get(self, key):
+        fragment = self.fragments.get(key)
+        if fragment is not None:
+            self.fragments.move_to_end(key)
+        return fragment
+
+    def put(self, key, fragment):
+        if len(fragment) > self.max_bytes:
+            return
+        if key in self.fragments:
+            self.size -= len(self.fragments.pop(key))
+        self.fragments[key] = fragment
+        self.size += len(fragment)
+        while self.size > self.max_bytes:
+            _, evicted = self.fragments.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class DiskFragmentCache:
+    """
+    Cache of serialized fragments stored as files in directory (shared by consecutive processes), the least recently
+    used files are removed when their total size exceeds the limit.
+
+    :param directory: directory of the cache (created if it does not exist).
+    :param max_bytes: maximal total size of cached fragments.
+    """
+
+    def __init__(self, directory, max_bytes=2 * 2 ** 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(os.path.getsize(path) for path in self._paths())
+
+    def _paths(self):
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.fragment')]
+
+    def _path(self, key):
+        return os.path.join(self.directory, '{}.fragment'.format(key))
+
+    def __len__(self):
+        return len(self._paths())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                fragment = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return fragment
+
+    def put(self, key, fragment):
+        if len(fragment) > self.max_bytes:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            self.size -= os.path.getsize(path)
+        # written aside and moved, so that concurrent readers never see partial fragment
+        fd, temporary = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(fragment)
+        os.replace(temporary, path)
+        self.size += len(fragment)
+        if self.size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        paths = sorted(self._paths(), key=os.path.getmtime)
+        self.size = sum(os.path.getsize(path) for path in paths)
+        for path in paths:
+            if self.size <= self.max_bytes:
+                break
+            self.size -= os.path.getsize(path)
+            os.remove(path)
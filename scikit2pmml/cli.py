@@ -0,0 +1,215 @@
+"""
+Bulk conversion of stored models (joblib or pickle files) into PMML:
+
+    $ scikit2pmml models/ --output-dir pmml/ --extension .pmml.gz --jobs 8
+
+Models are given as files, directories (searched for *.joblib, *.pkl and *.pickle files) or manifests (text files
+listing one model file per line, given by --manifest). Params of the export (e.g. feature_names, target_values,
+target_name) are read from sidecar JSON file of the model (forest.joblib -> forest.json). Models are loaded in the
+worker processes with mmap_mode='r', so that the arrays of uncompressed joblib dumps are paged in from the file rather
+than read into memory. Outputs newer than their model and sidecar are skipped unless --force is given. Outputs keep the
+subdirectories of the models (relative to the given directory or manifest) under --output-dir, models mapped to the
+same output are reported as failed.
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import sys
+import time
+
+from scikit2pmml.batch import scikit2pmml_many
+
+MODEL_EXTENSIONS = ('.joblib', '.pkl', '.pickle')
+
+
+def load_model(path, mmap_mode='r'):
+    """
+    Loads stored model, the arrays of uncompressed joblib dumps are memory-mapped (mmap_mode is ignored otherwise).
+
+    :param path: joblib or pickle file.
+    :param mmap_mode: see joblib.load.
+    :return: estimator
+    """
+    import joblib
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+def model_files(sources, manifests=()):
+    """
+    Lists model files lazily, so that conversion starts before large directories are scanned through.
+
+    :param sources: model files and directories (searched recursively).
+    :param manifests: text files listing one model file per line (relative to the manifest, # starts comment).
+    :return: generator of pairs of file name and its path relative to the directory or manifest it comes from (base
+        name of the files given directly)
+    """
+    for source in sources:
+        if os.path.isdir(source):
+            for directory, _, files in os.walk(source):
+                for name in sorted(files):
+                    if name.endswith(MODEL_EXTENSIONS):
+                        path = os.path.join(directory, name)
+                        yield path, relative_path(path, source)
+        else:
+            yield source, os.path.basename(source)
+    for manifest in manifests:
+        with open(manifest) as lines:
+            for line in lines:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    path = os.path.join(os.path.dirname(manifest), line)
+                    yield path, relative_path(path, os.path.dirname(manifest))
+
+
+def relative_path(path, root):
+    """
+    :param path: model file.
+    :param root: directory the model was found in (or listed from).
+    :return: path of the model relative to the root, base name when it lies outside of the root
+    """
+    relative = os.path.relpath(path, root or os.curdir)
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep) or os.path.isabs(relative):
+        return os.path.basename(path)
+    return relative
+
+
+def stem(path):
+    base = os.path.basename(path)
+    for extension in MODEL_EXTENSIONS:
+        if base.endswith(extension):
+            return base[:-len(extension)]
+    return os.path.splitext(base)[0]
+
+
+def sidecar(path):
+    """
+    :param path: model file.
+    :return: file name of the JSON with params of the export of the model
+    """
+    return os.path.join(os.path.dirname(path), stem(path) + '.json')
+
+
+def is_up_to_date(destination, inputs):
+    """
+    :param destination: output file.
+    :param inputs: files the output is made from (missing ones are ignored).
+    :return: True when the output exists and is not older than any of the inputs
+    """
+    try:
+        exported = os.stat(destination).st_mtime
+    except OSError:
+        return False
+    return all(os.stat(f).st_mtime <= exported for f in inputs if os.path.exists(f))
+
+
+class Conversion:
+    """
+    Tasks of scikit2pmml_many made from the model files, skipped (up-to-date) models and models whose output collides
+    with output of another model (failed) are counted on the way.
+
+    :param files: iterable of pairs of model file and its relative path (see model_files).
+    :param output_dir: directory of the outputs, which keeps the relative paths of the models (next to the models when
+        None).
+    :param extension: extension of the outputs (.gz, .xz and .zst ones are compressed).
+    :param kwargs: params of the export, overridden by the sidecar JSON.
+    :param force: when True then up-to-date outputs are exported again.
+    :param mmap_mode: see joblib.load.
+    """
+
+    def __init__(self, files, output_dir=None, extension='.pmml', kwargs=None, force=False, mmap_mode='r'):
+        self.files = files
+        self.output_dir = output_dir
+        self.extension = extension
+        self.kwargs = kwargs or {}
+        self.force = force
+        self.mmap_mode = mmap_mode
+        self.skipped = 0
+        self.failed = 0
+        self.models = {}
+        self.destinations = set()
+
+    def destination(self, path, relative):
+        if self.output_dir is None:
+            directory = os.path.dirname(path)
+        else:
+            directory = os.path.join(self.output_dir, os.path.dirname(relative))
+        return os.path.join(directory, stem(path) + self.extension)
+
+    def __iter__(self):
+        for path, relative in self.files:
+            destination = self.destination(path, relative)
+            key = os.path.normcase(os.path.abspath(destination))
+            if key in self.destinations:
+                self.failed += 1
+                print('{} -> {} failed (duplicate output)'.format(path, destination))
+                continue
+            self.destinations.add(key)
+            params = sidecar(path)
+            if not self.force and is_up_to_date(destination, [path, params]):
+                self.skipped += 1
+                print('{} -> {} skipped (up to date)'.format(path, destination))
+                continue
+            kwargs = dict(self.kwargs)
+            if os.path.exists(params):
+                with open(params) as f:
+                    kwargs.update(json.load(f))
+            if self.output_dir is not None:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+            self.models[destination] = path
+            yield functools.partial(load_model, path, self.mmap_mode), None, kwargs, destination
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='scikit2pmml', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='*', help='model files and directories with them')
+    parser.add_argument('--manifest', action='append', default=[], help='text file listing model files')
+    parser.add_argument('--output-dir', help='directory of the outputs (next to the models by default)')
+    parser.add_argument('--extension', default='.pmml', help='extension of the outputs, e.g. .pmml.gz to compress them')
+    parser.add_argument('-j', '--jobs', type=int, default=-1, help='number of worker processes (-1 means all CPUs)')
+    parser.add_argument('--force', action='store_true', help='export also the models with up-to-date outputs')
+    parser.add_argument('--no-mmap', action='store_true', help='read the models into memory instead of mapping them')
+    parser.add_argument('--pmml-version', default='4.2', choices=['4.1', '4.2', '4.3'])
+    parser.add_argument('--compact', action='store_true', help='see compact param of the export')
+    parser.add_argument('--no-record-counts', action='store_true', help='omit recordCount of tree nodes')
+    parser.add_argument('--deterministic', action='store_true', help='see deterministic param of the export')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log progress of every export')
+    args = parser.parse_args(argv)
+    if not args.sources and not args.manifest:
+        parser.error('no models given')
+    return args
+
+
+def main(argv=None):
+    """
+    Entry point of the scikit2pmml command.
+
+    :param argv: command line arguments (sys.argv by default).
+    :return: exit status - 1 when any export failed
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR, format='%(message)s')
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    kwargs = {'pmml_version': args.pmml_version, 'compact': args.compact, 'deterministic': args.deterministic,
+              'record_counts': not args.no_record_counts}
+    conversion = Conversion(model_files(args.sources, args.manifest), args.output_dir, args.extension, kwargs,
+                            args.force, None if args.no_mmap else 'r')
+    start = time.perf_counter()
+    batch = scikit2pmml_many(conversion, n_jobs=args.jobs)
+    for result in batch:
+        path = conversion.models.pop(result.destination)
+        if result.error is None:
+            print('{} -> {} {} bytes in {:.2f}s'.format(path, result.destination, result.size, result.seconds))
+        else:
+            print('{} -> {} failed in {:.2f}s'.format(path, result.destination, result.seconds))
+    failed = batch.failed + conversion.failed
+    print('Exported {} models ({} failed, {} skipped) in {:.2f}s - {:.1f} MB written.'.format(
+        batch.exported, failed, conversion.skipped, time.perf_counter() - start, batch.size / 1e6))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
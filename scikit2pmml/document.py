@@ -0,0 +1,334 @@
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+from scikit2pmml.serialization import XML_DECLARATION, tostring, start_tag, end_tag
+from scikit2pmml.estimation import Estimate, combine, measure, repeated
+from scikit2pmml.backends import create_writer
+from scikit2pmml.files import open_sink
+from scikit2pmml.instrumentation import Instrumentation, NullInstrumentation
+from scikit2pmml.registry import find_converter, is_a
+from scikit2pmml.validation import Validator, validate
+from datetime import datetime
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_TRANSFORMERS = frozenset(['sklearn.preprocessing.StandardScaler', 'sklearn.preprocessing.MinMaxScaler'])
+# timestamp of deterministic documents unless the caller provides one
+DETERMINISTIC_TIMESTAMP = datetime(1970, 1, 1)
+SUPPORTED_NS = {
+    '4.1': 'http://www.dmg.org/PMML-4_1',
+    '4.2': 'http://www.dmg.org/PMML-4_2',
+    '4.2.1': 'http://www.dmg.org/PMML-4_2-',
+    '4.3': 'http://www.dmg.org/PMML-4_3'
+}
+
+
+class PMMLDocument:
+
+    def __init__(self, estimator, transformer, **kwargs):
+        self.estimator = estimator
+        self.transformer = transformer
+        self.feature_names = kwargs.get('feature_names', [])
+        self.target_name = kwargs.get('target_name', 'class')
+        self.target_values = kwargs.get('target_values', [])
+        self.version = kwargs.get('pmml_version', '4.2')
+        self.model_name = kwargs.get('model_name', None)
+        self.description = kwargs.get('description', None)
+        self.copyright = kwargs.get('copyright', None)
+        self.timestamp = kwargs.get('timestamp', None)
+        self.deterministic = kwargs.get('deterministic', False)
+        self.n_jobs = kwargs.get('n_jobs', 1)
+        self.fold_transformer = kwargs.get('fold_transformer', False)
+        self.sparse = kwargs.get('sparse', False)
+        self.compact = kwargs.get('compact', False)
+        self.record_counts = kwargs.get('record_counts', True)
+        self.child_order = kwargs.get('child_order', None)
+        self.node_traffic = kwargs.get('node_traffic', None)
+        self.true_last = kwargs.get('true_last', False)
+        self.collapse = kwargs.get('collapse', False)
+        self.instrumentation = kwargs.get('instrumentation', None)
+        if self.instrumentation is None:
+            progress = kwargs.get('progress', None)
+            self.instrumentation = Instrumentation(progress=progress) if progress else NullInstrumentation()
+        self.segment_cache = kwargs.get('segment_cache', None)
+        self.backend = kwargs.get('backend', 'bytes')
+        self.validate = kwargs.get('validate', False)
+        self.fragment_cache = {}
+        self.digest = None
+        self.size = None
+        self.serializer = self._get_serializer(estimator)
+
+    def __getstate__(self):
+        # documents are pickled only to be shipped into worker processes along with the segment models, hence the
+        # (possibly huge) estimator and serializers are left in the parent process
+        state = self.__dict__.copy()
+        state.update(estimator=None, serializer=None, fragment_cache={}, segment_cache=None,
+                     node_traffic=None, instrumentation=NullInstrumentation())
+        return state
+
+    def _get_serializer(self, estimator):
+        converter = find_converter(estimator)
+        if converter is None:
+            raise TypeError("Provided model is not supported.")
+        return converter(estimator, self)
+
+    def _validate_inputs(self):
+        logger.info('[x] Performing model validation.')
+        if not self.estimator.fit:
+            raise TypeError("Provide a fitted model.")
+        if self.transformer is not None and not any(is_a(self.transformer, t) for t in SUPPORTED_TRANSFORMERS):
+            raise TypeError("Provided transformer is not supported.")
+        if self.serializer.n_features != len(self.feature_names):
+            logger.warning('[!] Input shape does not match provided feature names - using generic names instead.')
+            self.feature_names = ['x{}'.format(i) for i in range(self.serializer.n_features)]
+        if self.serializer.function_name == 'classification' and self.serializer.n_classes != len(self.target_values):
+            logger.warning('[!] Output shape does not match provided target values - using generic names instead.')
+            self.target_values = ['y{}'.format(i) for i in range(self.serializer.n_classes)]
+        logger.info('[x] Model validation successful.')
+
+    @property
+    def fragment_key(self):
+        return tuple(self.feature_names), self.target_name, tuple(self.target_values), id(self.transformer), self.sparse
+
+    @property
+    def active_fields(self):
+        """
+        Pairs of indices and names of features exported into data dictionary and mining schema - all the features
+        unless sparse mode prunes the ones unused by the model.
+        """
+        key = ('active_fields', self.fragment_key)
+        if key not in self.fragment_cache:
+            active = self.serializer.active_features if self.sparse else None
+            if active is None:
+                self.fragment_cache[key] = list(enumerate(self.feature_names))
+            else:
+                self.fragment_cache[key] = [(i, self.feature_names[i]) for i in active.tolist()]
+        return self.fragment_cache[key]
+
+    @property
+    def cache_context(self):
+        """
+        Inputs of the document which affect serialized models, part of the keys of segment cache.
+        """
+        return self.fragment_key[:3] + (self.compact, self.record_counts, self.child_order, self.true_last,
+                                        self.deterministic, self.backend)
+
+    def _create_root(self):
+        root = ET.Element('PMML')
+        root.set('version', self.version)
+        root.set('xmlns', SUPPORTED_NS.get(self.version, 'http://www.dmg.org/PMML-4_2'))
+        return root
+
+    @property
+    def document(self):
+        with self.instrumentation.phase('validation'):
+            self._validate_inputs()
+        self.fragment_cache = {}
+        # the root is not kept by the document (which is referenced back by its serializers), so that the tree is
+        # released as soon as the caller drops it
+        root = self._build_root()
+        self.instrumentation.count_element(root)
+        tree = ET.ElementTree(root)
+        logger.info('[x] Generation of PMML successful.')
+        return tree
+
+    def _build_root(self):
+        root = self._create_root()
+        with self.instrumentation.phase('header'):
+            root.append(self.header)
+        with self.instrumentation.phase('data_dictionary'):
+            root.append(self.data_dictionary)
+        with self.instrumentation.phase('model'):
+            root.append(self.model)
+        return root
+
+    @property
+    def header(self):
+        header = ET.Element('Header')
+        if self.copyright:
+            header.set('copyright', self.copyright)
+        if self.description:
+            header.set('description', self.description)
+        timestamp = ET.SubElement(header, 'Timestamp')
+        if self.timestamp is not None:
+            timestamp.text = str(self.timestamp)
+        else:
+            timestamp.text = str(DETERMINISTIC_TIMESTAMP if self.deterministic else datetime.now())
+        return header
+
+    def _target_dictionary(self):
+        data_dict = ET.Element('DataDictionary')
+        data_field = ET.SubElement(data_dict, 'DataField')
+        data_field.set('name', self.target_name)
+        data_field.set('dataType', 'string' if self.serializer.function_name == 'classification' else 'double')
+        data_field.set('optype', 'categorical' if self.serializer.function_name == 'classification' else 'continuous')
+        for t in self.target_values:
+            value = ET.SubElement(data_field, 'Value')
+            value.set('value', t)
+        return data_dict
+
+    @property
+    def data_dictionary(self):
+        data_dict = self._target_dictionary()
+        active_fields = self.active_fields
+        logger.info('[x] Generating Data Dictionary ({} features).'.format(len(active_fields)))
+        debug = logger.isEnabledFor(logging.DEBUG)
+        for _, f in active_fields:
+            data_field = ET.SubElement(data_dict, 'DataField')
+            data_field.set('name', f)
+            data_field.set('dataType', 'double')
+            data_field.set('optype', 'continuous')
+            if debug:
+                logger.debug('\t[-] {}...OK!'.format(f))
+        return data_dict
+
+    @property
+    def model(self):
+        return self.serializer.model
+
+    def fragments(self):
+        """
+        Yields serialized document piece by piece using the serialization backend, the bytes and etree backends are
+        byte-identical to the serialization of the element tree, lxml one is equivalent XML.
+
+        :return: generator of UTF-8 encoded bytes
+        """
+        with self.instrumentation.phase('validation'):
+            self._validate_inputs()
+        self.fragment_cache = {}
+        for fragment in self._fragments():
+            self.instrumentation.count_fragment(fragment)
+            yield fragment
+        logger.info('[x] Generation of PMML successful.')
+
+    def _fragments(self):
+        if self.backend == 'etree':
+            yield XML_DECLARATION
+            yield tostring(self._build_root())
+            return
+        writer = create_writer(self.backend)
+        writer.raw(XML_DECLARATION)
+        writer.start('PMML', self._create_root().attrib)
+        with self.instrumentation.phase('header'):
+            writer.element(self.header)
+        yield writer.drain()
+        with self.instrumentation.phase('data_dictionary'):
+            writer.element(self.data_dictionary)
+        yield writer.drain()
+        with self.instrumentation.phase('model'):
+            for _ in self.serializer.write(writer):
+                fragment = writer.drain()
+                if fragment:
+                    yield fragment
+        writer.end('PMML')
+        writer.close()
+        yield writer.drain()
+
+    def estimate(self):
+        """
+        Projects footprint of the document from the model arrays without building it.
+
+        :return: Footprint
+        """
+        self._validate_inputs()
+        self.fragment_cache = {}
+        root = self._create_root()
+        root = measure(root)._replace(size=len(XML_DECLARATION) + len(start_tag(root)) + len(end_tag('PMML')))
+        return combine(root, measure(self.header), self._data_dictionary_footprint(), self.serializer.estimate())
+
+    def _data_dictionary_footprint(self):
+        indices = [i for i, _ in self.active_fields]
+        fields = repeated(len(indices), 1, 3, '<DataField name="" dataType="double" optype="continuous" />',
+                          self.serializer.feature_sizes[indices].sum())
+        return combine(measure(self._target_dictionary()), fields)
+
+    def stream(self):
+        """
+        Yields the serialized document (see fragments) while computing its SHA-256 digest and size, which are set when
+        the generator is exhausted. The document is validated against the schema on the way when validate is set
+        (ValueError is raised before invalid part is yielded).
+
+        :return: generator of UTF-8 encoded bytes
+        """
+        digest = hashlib.sha256()
+        size = 0
+        validator = Validator(self.version) if self.validate else None
+        for fragment in self.fragments():
+            digest.update(fragment)
+            size += len(fragment)
+            if validator is not None:
+                validator.feed(fragment)
+            yield fragment
+        if validator is not None:
+            validator.close()
+        self.digest = digest.hexdigest()
+        self.size = size
+
+    def write(self, file):
+        """
+        Streams the document into the file without building the whole element tree in memory. SHA-256 digest of the
+        (uncompressed) document is computed on the way, so that unchanged deterministic exports can be recognized
+        without reading the file again. The document is validated against the schema on the way too when validate is
+        set (ValueError is raised as soon as invalid part is written).
+
+        :param file: name of the file (compressed according to .gz, .xz or .zst extension), binary file-like object or
+            None when only the digest is needed.
+        :return: hex digest of the document
+        """
+        with open_sink(file) as sink:
+            for fragment in self.stream():
+                sink.write(fragment)
+        return self.digest
+
+
+def scikit2pmml(estimator, transformer=None, file=None, stream=False, **kwargs):
+    """
+    Exports sklearn model as PMML.
+
+    :param estimator: sklearn model to be exported as PMML (for supported models - see bellow).
+    :param transformer: if provided then scaling is applied to data fields.
+    :param file: name of the file (compressed according to .gz, .xz or .zst extension) or binary file-like object where
+        the PMML will be exported.
+    :param stream: if True then the document is written to the file piece by piece without building the element tree
+        (the file may be omitted when only the digest is needed).
+    :param kwargs: set of params that affects PMML metadata - see documentation for details.
+    :return: XML element tree (SHA-256 hex digest of the document when streaming)
+    """
+
+    pmml = PMMLDocument(estimator, transformer, **kwargs)
+    if stream:
+        return pmml.write(file)
+    if not file:
+        tree = pmml.document
+        if pmml.validate:
+            validate(tree, pmml.version)
+        return tree
+    # the file is written by the streaming writer (identical to the serialized tree, yet much faster) and validated on
+    # the way, then the tree with the same timestamp is built (and instrumented)
+    if pmml.timestamp is None and not pmml.deterministic:
+        pmml.timestamp = datetime.now()
+    instrumentation, pmml.instrumentation = pmml.instrumentation, NullInstrumentation()
+    pmml.write(file)
+    pmml.instrumentation = instrumentation
+    return pmml.document
+
+
+def estimate(estimator, transformer=None, **kwargs):
+    """
+    Estimates size and complexity of the PMML export without running it - counts of tree nodes, XML elements and
+    attributes, depth of the trees and size of the document are computed from the model arrays (tree_, coef_...), so
+    that e.g. forest exceeding limits of the scoring engine can be rejected before the export. Counts are exact, sizes
+    of formatted numbers are extrapolated from sample of them.
+
+    :param estimator: sklearn model to be exported as PMML.
+    :param transformer: if provided then scaling is applied to data fields.
+    :param kwargs: params of the export - see documentation for details.
+    :return: Estimate - footprints of the document exported with the params (default) and with compact=True and
+        record_counts=False (compact)
+    """
+    default = PMMLDocument(estimator, transformer, **kwargs).estimate()
+    kwargs = dict(kwargs, compact=True, record_counts=False)
+    return Estimate(default, PMMLDocument(estimator, transformer, **kwargs).estimate())
@@ -0,0 +1,131 @@
+"""
+Dry-run estimation of the exported document - counts of elements and attributes and the size of the output are computed
+from the model arrays (tree_, coef_...) without building any XML, so that capacity limits of the scoring engine can be
+checked before the export.
+"""
+from collections import namedtuple
+import numpy as np
+from scikit2pmml.serialization import end_tag, escape_attribute, format_numbers, start_tag, tostring
+
+# formatted lengths of numbers are averaged over sample of this size
+SAMPLE_SIZE = 4096
+
+Footprint = namedtuple('Footprint', ['nodes', 'depth', 'elements', 'attributes', 'size'])
+Footprint.__doc__ = """
+Projected footprint of (part of) the exported document.
+
+:param nodes: number of tree nodes.
+:param depth: maximal depth of the trees.
+:param elements: number of XML elements.
+:param attributes: number of XML attributes.
+:param size: number of (uncompressed) bytes.
+"""
+
+Estimate = namedtuple('Estimate', ['default', 'compact'])
+Estimate.__doc__ = """
+Projected footprints of the document exported with the given options (default) and of the smallest document (compact,
+exported with compact=True and record_counts=False).
+"""
+
+EMPTY = Footprint(0, 0, 0, 0, 0)
+
+
+def combine(*footprints):
+    """
+    :param footprints: footprints of the parts of the document.
+    :return: Footprint of the whole (counts are summed, depth is the maximal one)
+    """
+    return Footprint(sum(f.nodes for f in footprints), max(f.depth for f in footprints),
+                     sum(f.elements for f in footprints), sum(f.attributes for f in footprints),
+                     sum(f.size for f in footprints))
+
+
+def repeated(count, elements, attributes, template, payload=0, nodes=0):
+    """
+    Footprint of elements repeated with different attribute values, e.g. MiningField of every feature.
+
+    :param count: number of repetitions.
+    :param elements: number of elements of one repetition.
+    :param attributes: number of attributes of one repetition.
+    :param template: serialized repetition with empty attribute values.
+    :param payload: total size of the attribute values.
+    :param nodes: number of tree nodes of one repetition.
+    :return: Footprint
+    """
+    return Footprint(int(count * nodes), 0, int(count * elements), int(count * attributes),
+                     int(count * len(template) + payload))
+
+
+def measure(element):
+    """
+    Exact footprint of built element (including its children).
+
+    :param element: XML element.
+    :return: Footprint
+    """
+    if element is None:
+        return EMPTY
+    elements = attributes = nodes = 0
+    for e in element.iter():
+        elements += 1
+        attributes += len(e.attrib)
+        nodes += e.tag == 'Node'
+    return Footprint(nodes, 0, elements, attributes, len(tostring(element)))
+
+
+def wrapper(element):
+    """
+    :param element: element wrapping other ones (e.g. MiningModel).
+    :return: Footprint of its start and end tag
+    """
+    return measure(element)._replace(size=len(start_tag(element)) + len(end_tag(element.tag)))
+
+
+def attribute_sizes(values):
+    """
+    :param values: attribute values (e.g. feature names).
+    :return: array of sizes of the escaped UTF-8 encoded values
+    """
+    return np.array([len(escape_attribute(str(v)).encode('utf-8')) for v in values], dtype=np.int64)
+
+
+def sample(values):
+    """
+    :param values: array of numbers (or of rows of numbers).
+    :return: evenly spaced sample of at most SAMPLE_SIZE numbers (rows)
+    """
+    return values[::-(-len(values) // SAMPLE_SIZE)] if len(values) else values
+
+
+def formatted_size(values, compact=False, canonical=False, count=None):
+    """
+    Total size of the numbers formatted as by format_numbers, exact for up to SAMPLE_SIZE numbers and extrapolated
+    from evenly spaced sample of them otherwise.
+
+    :param values: array of numbers.
+    :param compact: see format_numbers.
+    :param canonical: see format_numbers.
+    :param count: number of numbers the values are sample of (by default the values are all of them).
+    :return: int
+    """
+    values = np.asarray(values).ravel()
+    count = values.size if count is None else count
+    values = sample(values)
+    if not values.size:
+        return 0
+    size = sum(map(len, format_numbers(values, compact, canonical)))
+    return int(round(size * count / values.size))
+
+
+def digits(counts):
+    """
+    :param counts: array of counts n.
+    :return: total number of digits of the ids 0, ..., n - 1 over all the counts
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    total = int(counts.sum())
+    power = 10
+    while counts.size and power < counts.max():
+        total += int(np.maximum(counts - power, 0).sum())
+        power *= 10
+    return total
@@ -0,0 +1,147 @@
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+from contextlib import contextmanager, ExitStack
+import gzip
+import lzma
+import os
+import uuid
+
+CHUNK_SIZE = 1 << 20
+
+MAGIC_NUMBERS = {
+    b'\x1f\x8b': 'gz',
+    b'\xfd7zXZ\x00': 'xz',
+    b'\x28\xb5\x2f\xfd': 'zst'
+}
+
+
+class NullSink:
+    """
+    Sink discarding everything written into it.
+    """
+
+    def write(self, data):
+        return len(data)
+
+
+class ChunkedWriter:
+    """
+    Collects small writes (e.g. single elements) and passes them to the underlying stream in large chunks.
+
+    :param stream: binary stream to be written into.
+    :param chunk_size: number of bytes collected before the chunk is written.
+    """
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(data)
+        self.size += len(data)
+        if self.size >= self.chunk_size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self.chunks:
+            self.stream.write(b''.join(self.chunks))
+            self.chunks = []
+            self.size = 0
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Install zstandard package to read or write .zst files.")
+    return zstandard
+
+
+def _temporary_name(file):
+    """
+    :param file: name of the file.
+    :return: name of hidden file next to it, unique for every call
+    """
+    directory, base = os.path.split(os.fspath(file))
+    return os.path.join(directory, '.{}.{}.tmp'.format(base, uuid.uuid4().hex))
+
+
+@contextmanager
+def open_sink(file):
+    """
+    Opens binary sink for the PMML document, the data are compressed inline according to the file extension
+    (.gz, .xz or .zst - the last one requires zstandard package) and written in large chunks. Files are written aside
+    and moved into place when the whole document is written, so that failed export never leaves partial file behind
+    (nor replaces the previous one).
+
+    :param file: name of the file, binary file-like object (written as is, it is not closed) or None to discard the
+        data.
+    :return: context manager yielding object with write method
+    """
+    if file is None or hasattr(file, 'write'):
+        sink = ChunkedWriter(NullSink() if file is None else file)
+        yield sink
+        sink.flush()
+        return
+    name = str(file)
+    temporary = _temporary_name(file)
+    try:
+        with ExitStack() as stack:
+            stream = stack.enter_context(open(temporary, 'xb'))
+            if name.endswith('.gz'):
+                # no modification time in the header and the final (not temporary) name in it, so that identical
+                # documents are compressed identically
+                stream = stack.enter_context(gzip.GzipFile(filename=name, fileobj=stream, mode='wb', mtime=0))
+            elif name.endswith('.xz'):
+                stream = stack.enter_context(lzma.LZMAFile(stream, mode='wb'))
+            elif name.endswith('.zst'):
+                stream = stack.enter_context(_zstandard().ZstdCompressor().stream_writer(stream))
+            sink = ChunkedWriter(stream)
+            yield sink
+            sink.flush()
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    os.replace(temporary, file)
+
+
+@contextmanager
+def open_source(file):
+    """
+    Opens PMML document for reading, compressed files (gzip, xz or zstd) are decompressed on the fly - the compression
+    is recognized from the content, not from the extension.
+
+    :param file: name of the file or binary file-like object (read as is, it is not closed).
+    :return: context manager yielding binary file-like object
+    """
+    with ExitStack() as stack:
+        if hasattr(file, 'read'):
+            yield file
+            return
+        stream = stack.enter_context(open(file, 'rb', buffering=CHUNK_SIZE))
+        head = stream.peek(6)
+        compression = [c for magic, c in MAGIC_NUMBERS.items() if head.startswith(magic)]
+        if compression == ['gz']:
+            stream = stack.enter_context(gzip.GzipFile(fileobj=stream, mode='rb'))
+        elif compression == ['xz']:
+            stream = stack.enter_context(lzma.LZMAFile(stream, mode='rb'))
+        elif compression == ['zst']:
+            stream = stack.enter_context(_zstandard().ZstdDecompressor().stream_reader(stream))
+        yield stream
+
+
+def read_pmml(file):
+    """
+    Reads (possibly compressed) PMML document.
+
+    :param file: name of the file or binary file-like object.
+    :return: XML element tree
+    """
+    with open_source(file) as source:
+        return ET.parse(source)
@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import time
+
+
+class InstrumentationAdapter:
+    """
+    Base of adapters forwarding export instrumentation into tracing or metrics systems, override what is needed.
+    """
+
+    def start_phase(self, name):
+        pass
+
+    def end_phase(self, name, seconds):
+        pass
+
+    def count(self, name, value):
+        pass
+
+
+class Instrumentation:
+    """
+    Collects timings of the export phases (validation, header, data_dictionary, model and segment/<id> for segments of
+    ensembles) and counters of exported nodes and elements.
+
+    :param progress: callback called with number of finished and total number of segments after every segment.
+    :param adapter: InstrumentationAdapter forwarding the phases and counters e.g. into tracing system.
+    """
+
+    enabled = True
+
+    def __init__(self, progress=None, adapter=None):
+        self.progress = progress
+        self.adapter = adapter or InstrumentationAdapter()
+        self.timings = OrderedDict()
+        self.counters = OrderedDict()
+
+    @contextmanager
+    def phase(self, name):
+        self.adapter.start_phase(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+            self.adapter.end_phase(name, seconds)
+
+    def count(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + value
+        self.adapter.count(name, value)
+
+    def count_fragment(self, fragment):
+        """
+        Counts elements and tree nodes of serialized fragment (markup characters are always escaped in attributes).
+
+        :param fragment: UTF-8 encoded bytes.
+        """
+        self.count('elements', fragment.count(b'<') - fragment.count(b'</') - fragment.count(b'<?'))
+        self.count('nodes', fragment.count(b'<Node '))
+
+    def count_element(self, element):
+        """
+        Counts elements and tree nodes of element (including all its children).
+
+        :param element: XML element.
+        """
+        tags = [e.tag for e in element.iter()]
+        self.count('elements', len(tags))
+        self.count('nodes', tags.count('Node'))
+
+    def segment_done(self, done, total):
+        if self.progress:
+            self.progress(done, total)
+
+
+class _NoPhase:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class NullInstrumentation:
+    """
+    Disabled instrumentation - every call is no-op, so that the export does not pay for it.
+    """
+
+    enabled = False
+    _no_phase = _NoPhase()
+
+    def phase(self, name):
+        return self._no_phase
+
+    def count(self, name, value):
+        pass
+
+    def count_fragment(self, fragment):
+        pass
+
+    def count_element(self, element):
+        pass
+
+    def segment_done(self, done, total):
+        pass
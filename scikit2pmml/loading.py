@@ -0,0 +1,375 @@
+"""
+Loading of the PMML documents produced by this library back into sklearn estimators, e.g. to retrain, warm-start or
+score models kept as PMML. The document is parsed incrementally and every element is cleared as soon as it is read, so
+that only the arrays of the model are kept in memory (not the whole DOM):
+
+    forest = load('forest.pmml.gz')
+    forest.predict_proba(X)
+
+Supported are decision trees and random forests of classification trees (TreeModel and MiningModel averaging them),
+linear and logistic regressions (RegressionModel, one-vs-rest chain of them). Trees are rebuilt through the state of
+sklearn.tree._tree.Tree. Columns of the input of the loaded estimator are the continuous fields of the data dictionary
+(in their order), classes are the values of the target field (strings). Linear normalizations of the inputs
+(LocalTransformations) are folded into the coefficients.
+"""
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+from collections import namedtuple
+from scikit2pmml.files import open_source
+import numpy as np
+
+# children of leaves and feature (threshold) of leaves in sklearn.tree._tree.Tree
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+ParsedTree = namedtuple('ParsedTree', ['function_name', 'left', 'right', 'feature', 'threshold', 'values',
+                                       'record_counts'])
+ParsedRegression = namedtuple('ParsedRegression', ['function_name', 'normalization', 'tables', 'output'])
+ParsedMining = namedtuple('ParsedMining', ['function_name', 'method', 'models'])
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+class DocumentParser:
+    """
+    Reads the document element by element (end events only) and clears every element once it is read. Models are
+    rebuilt bottom-up - nodes of trees are numbered in the order they end (children before parents) and segmentations
+    take the models finished before them.
+    """
+
+    def __init__(self):
+        self.fields = []
+        self.target = None
+        self.classes = None
+        self.derived = {}
+        self.completed = []
+        self.tables = []
+        self.tags = {}
+        self._reset_tree()
+
+    def _reset_tree(self):
+        self.left, self.right, self.feature, self.threshold = [], [], [], []
+        self.values, self.record_counts, self.scores, self.ids = [], [], [], []
+        self.node_predicates = []
+        # indices of finished nodes, whose (cleared) elements stay in the parent until it ends
+        self.node_index = {}
+
+    def parse(self, stream):
+        """
+        :param stream: binary file-like object with the document.
+        :return: parsed model (ParsedTree, ParsedRegression or ParsedMining)
+        """
+        tags, handlers = self.tags, {}
+        for _, elem in ET.iterparse(stream, events=('end',)):
+            try:
+                handler = handlers[elem.tag]
+            except KeyError:
+                tags[elem.tag] = _local(elem.tag)
+                handler = handlers[elem.tag] = getattr(self, '_' + tags[elem.tag], None)
+            if handler is not None:
+                handler(elem)
+        if len(self.completed) != 1:
+            raise ValueError('Expected one model in the document, found {}.'.format(len(self.completed)))
+        return self.completed[0]
+
+    def _children(self, elem, tag):
+        return [child for child in elem if self.tags.get(child.tag) == tag]
+
+    def _DataField(self, elem):
+        if elem.get('optype') == 'categorical':
+            self.classes = [value.get('value') for value in self._children(elem, 'Value')]
+        self.fields.append(elem.get('name'))
+        elem.clear()
+
+    def _MiningField(self, elem):
+        if elem.get('usageType') == 'predicted':
+            self.target = elem.get('name')
+
+    def _DerivedField(self, elem):
+        expression = list(elem)[0]
+        if self.tags.get(expression.tag) != 'NormContinuous':
+            raise ValueError('Unsupported transformation of {}: {}.'.format(elem.get('name'), _local(expression.tag)))
+        (o1, n1), (o2, n2) = sorted((float(p.get('orig')), float(p.get('norm'))) for p in expression)
+        # linear normalization is affine, so it can be folded into the coefficients
+        slope = (n2 - n1) / (o2 - o1)
+        self.derived[elem.get('name')] = (expression.get('field'), slope, n1 - slope * o1)
+        elem.clear()
+
+    def _Node(self, elem):
+        index = len(self.left)
+        children, distribution, predicate = [], [], None
+        for child in elem:
+            tag = self.tags[child.tag]
+            if tag == 'Node':
+                children.append(self.node_index.pop(child))
+            elif tag == 'ScoreDistribution':
+                distribution.append((child.get('value'), child.get('recordCount')))
+            elif tag == 'SimplePredicate':
+                predicate = (child.get('operator'), child.get('field'), child.get('value'))
+        # the predicate is read by the parent, whose split it describes
+        self.node_predicates.append(predicate)
+        self.scores.append(elem.get('score'))
+        self.ids.append(elem.get('id'))
+        self.record_counts.append(elem.get('recordCount'))
+        self.values.append(distribution)
+        if children:
+            if len(children) != 2:
+                raise ValueError('Only binary splits are supported.')
+            first, second = children
+            if self.node_predicates[first] is None:
+                raise ValueError('First child of the node has to carry SimplePredicate.')
+            operator, field, value = self.node_predicates[first]
+            if operator not in ('lessOrEqual', 'greaterThan'):
+                raise ValueError('Unsupported operator: {}.'.format(operator))
+            left, right = (first, second) if operator == 'lessOrEqual' else (second, first)
+            self.left.append(left)
+            self.right.append(right)
+            self.feature.append(field)
+            self.threshold.append(float(value))
+        else:
+            self.left.append(TREE_LEAF)
+            self.right.append(TREE_LEAF)
+            self.feature.append(None)
+            self.threshold.append(TREE_UNDEFINED)
+        elem.clear()
+        self.node_index[elem] = index
+
+    def _TreeModel(self, elem):
+        n_nodes = len(self.left)
+        # nodes keep their ids (indices of sklearn tree) when these are all there, otherwise they are numbered in
+        # reverse so that the root (which ends last) is the first one
+        try:
+            position = np.array(self.ids, dtype=np.intp)
+        except (TypeError, ValueError):
+            position = None
+        if position is None or not np.array_equal(np.sort(position), np.arange(n_nodes)):
+            position = np.arange(n_nodes)[::-1]
+        order = np.argsort(position)
+        left, right = np.array(self.left, dtype=np.intp), np.array(self.right, dtype=np.intp)
+        leaves = left == TREE_LEAF
+        left[~leaves] = position[left[~leaves]]
+        right[~leaves] = position[right[~leaves]]
+        field_index = {name: i for i, name in enumerate(self.fields)}
+        feature = np.array([TREE_UNDEFINED if f is None else field_index[f] for f in self.feature], dtype=np.intp)
+        values = None
+        if elem.get('functionName') == 'classification':
+            class_index = {c: k for k, c in enumerate(self.classes)}
+            values = np.zeros((n_nodes, len(self.classes)))
+            for i, distribution in enumerate(self.values):
+                for value, count in distribution:
+                    values[i, class_index[value]] = float(count)
+            # leaves without distribution are certain of their score
+            certain = np.flatnonzero(leaves & ~values.any(axis=1))
+            values[certain, [class_index[self.scores[i]] for i in certain.tolist()]] = 1.0
+            values = values[order]
+        record_counts = np.array([np.nan if c is None else float(c) for c in self.record_counts])
+        self.completed.append(ParsedTree(elem.get('functionName'), left[order], right[order], feature[order],
+                                         np.array(self.threshold, dtype=np.float64)[order], values,
+                                         record_counts[order]))
+        self._reset_tree()
+        elem.clear()
+
+    def _RegressionTable(self, elem):
+        predictors = [(p.get('name'), float(p.get('coefficient'))) for p in elem]
+        self.tables.append((elem.get('targetCategory'), float(elem.get('intercept', 0)), predictors))
+        elem.clear()
+
+    def _RegressionModel(self, elem):
+        outputs = [field.get('name') for output in self._children(elem, 'Output') for field in output
+                   if field.get('feature', 'predictedValue') == 'predictedValue']
+        self.completed.append(ParsedRegression(elem.get('functionName'), elem.get('normalizationMethod', 'none'),
+                                               self.tables, outputs[0] if outputs else None))
+        self.tables = []
+        elem.clear()
+
+    def _Segment(self, elem):
+        # the (emptied) element is left in the segmentation to be counted
+        for child in list(elem):
+            elem.remove(child)
+
+    def _Segmentation(self, elem):
+        start = len(self.completed) - len(self._children(elem, 'Segment'))
+        models = self.completed[start:]
+        del self.completed[start:]
+        self.completed.append((elem.get('multipleModelMethod'), models))
+        elem.clear()
+
+    def _MiningModel(self, elem):
+        method, models = self.completed.pop()
+        self.completed.append(ParsedMining(elem.get('functionName'), method, models))
+        elem.clear()
+
+
+class EstimatorBuilder:
+    """
+    Builds sklearn estimator of the parsed model.
+
+    :param parser: DocumentParser which parsed the document.
+    """
+
+    def __init__(self, parser):
+        self.features = [f for f in parser.fields if f != parser.target]
+        self.classes = parser.classes
+        self.derived = parser.derived
+        self.feature_index = {name: i for i, name in enumerate(self.features)}
+        # columns of the data dictionary (including the target) to columns of the input
+        self.columns = np.array([self.feature_index.get(f, TREE_UNDEFINED) for f in parser.fields], dtype=np.intp)
+
+    @property
+    def n_features(self):
+        return len(self.features)
+
+    def build(self, model):
+        if isinstance(model, ParsedTree) and model.function_name == 'classification':
+            return self.decision_tree(model)
+        if isinstance(model, ParsedRegression) and model.function_name == 'regression':
+            return self.linear_regression(model)
+        if isinstance(model, ParsedRegression):
+            return self.logistic_regression(model)
+        if isinstance(model, ParsedMining) and model.function_name == 'classification':
+            if model.method == 'average' and all(isinstance(m, ParsedTree) for m in model.models):
+                return self.random_forest(model)
+            if model.method == 'modelChain' and all(isinstance(m, ParsedRegression) for m in model.models):
+                return self.one_vs_rest(model)
+        raise ValueError('Unsupported {} model: {}.'.format(model.function_name, getattr(model, 'method', None) or
+                                                            type(model).__name__[len('Parsed'):]))
+
+    def tree(self, parsed):
+        """
+        :param parsed: ParsedTree of classification tree.
+        :return: sklearn.tree._tree.Tree
+        """
+        from sklearn.tree._tree import NODE_DTYPE, Tree
+        left, right, values = parsed.left, parsed.right, parsed.values
+        n_nodes = left.shape[0]
+        internal = left != TREE_LEAF
+        levels = []
+        level = np.zeros(1, dtype=np.intp)
+        while level.size:
+            levels.append(level)
+            level = level[internal[level]]
+            level = np.concatenate([left[level], right[level]])
+        # compact documents have distributions on leaves only, internal nodes sum their children level by level
+        missing = internal & ~values.any(axis=1)
+        for level in reversed(levels):
+            level = level[missing[level]]
+            values[level] = values[left[level]] + values[right[level]]
+        weighted = np.where(np.isnan(parsed.record_counts), values.sum(axis=1), parsed.record_counts)
+        proportions = values / np.maximum(values.sum(axis=1), np.finfo(np.float64).tiny)[:, np.newaxis]
+        nodes = np.zeros(n_nodes, dtype=NODE_DTYPE)
+        nodes['left_child'] = left
+        nodes['right_child'] = right
+        nodes['feature'] = np.where(parsed.feature >= 0, self.columns[parsed.feature], TREE_UNDEFINED)
+        nodes['threshold'] = parsed.threshold
+        nodes['impurity'] = 1 - (proportions ** 2).sum(axis=1)
+        nodes['n_node_samples'] = np.round(weighted)
+        nodes['weighted_n_node_samples'] = weighted
+        tree = Tree(self.n_features, np.array([values.shape[1]], dtype=np.intp), 1)
+        tree.__setstate__({'max_depth': len(levels) - 1, 'node_count': n_nodes, 'nodes': nodes,
+                           'values': np.ascontiguousarray(values[:, np.newaxis, :])})
+        return tree
+
+    def decision_tree(self, parsed, classes=None):
+        from sklearn.tree import DecisionTreeClassifier
+        tree = DecisionTreeClassifier()
+        tree.tree_ = self.tree(parsed)
+        tree.n_features_in_ = tree.max_features_ = self.n_features
+        tree.n_outputs_ = 1
+        tree.n_classes_ = len(self.classes)
+        tree.classes_ = np.array(self.classes) if classes is None else classes
+        return tree
+
+    def random_forest(self, parsed):
+        from sklearn.ensemble import RandomForestClassifier
+        forest = RandomForestClassifier(n_estimators=len(parsed.models))
+        # trees of forest are fitted on the class indices
+        indices = np.arange(len(self.classes), dtype=np.float64)
+        forest.estimators_ = [self.decision_tree(tree, indices) for tree in parsed.models]
+        forest.n_features_in_ = self.n_features
+        forest.n_outputs_ = 1
+        forest.n_classes_ = len(self.classes)
+        forest.classes_ = np.array(self.classes)
+        return forest
+
+    def coefficients(self, tables):
+        """
+        :param tables: list of (target category, intercept, predictors) tuples.
+        :return: pair of coefficient matrix (row per table) and intercepts, derived fields are folded in
+        """
+        coefficients = np.zeros((len(tables), self.n_features))
+        intercepts = np.array([intercept for _, intercept, _ in tables], dtype=np.float64)
+        for row, (_, _, predictors) in enumerate(tables):
+            for name, coefficient in predictors:
+                if name in self.feature_index:
+                    coefficients[row, self.feature_index[name]] += coefficient
+                else:
+                    field, slope, offset = self.derived[name]
+                    coefficients[row, self.feature_index[field]] += coefficient * slope
+                    intercepts[row] += coefficient * offset
+        return coefficients, intercepts
+
+    def linear_regression(self, parsed):
+        from sklearn.linear_model import LinearRegression
+        model = LinearRegression()
+        coefficients, intercepts = self.coefficients(parsed.tables)
+        model.coef_, model.intercept_ = coefficients[0], intercepts[0]
+        model.n_features_in_ = self.n_features
+        return model
+
+    def logistic_regression(self, parsed):
+        from sklearn.linear_model import LogisticRegression
+        class_index = {c: k for k, c in enumerate(self.classes)}
+        if parsed.normalization == 'softmax':
+            model = LogisticRegression(multi_class='multinomial')
+            tables = sorted(parsed.tables, key=lambda table: class_index[table[0]])
+            model.coef_, model.intercept_ = self.coefficients(tables)
+        elif parsed.normalization == 'logit' and len(self.classes) == 2:
+            model = LogisticRegression()
+            # the last table is the reference one (with probability 1 - the others)
+            table = parsed.tables[0]
+            coefficients, intercepts = self.coefficients([table])
+            sign = 1 if class_index[table[0]] == 1 else -1
+            model.coef_, model.intercept_ = sign * coefficients, sign * intercepts
+        else:
+            raise ValueError('Unsupported logistic regression: {} normalization of {} classes.'.format(
+                parsed.normalization, len(self.classes)))
+        return self._fitted(model)
+
+    def one_vs_rest(self, parsed):
+        from sklearn.linear_model import LogisticRegression
+        *classes, link = parsed.models
+        if link.normalization != 'simplemax' or any(m.normalization != 'logit' for m in classes):
+            raise ValueError('Unsupported chain of regressions.')
+        class_index = {c: k for k, c in enumerate(self.classes)}
+        # the link refers to the outputs of the regressions of the classes
+        output_class = {predictors[0][0]: class_index[category] for category, _, predictors in link.tables}
+        tables = [None] * len(self.classes)
+        for model in classes:
+            tables[output_class[model.output]] = model.tables[0]
+        model = LogisticRegression(multi_class='ovr')
+        model.coef_, model.intercept_ = self.coefficients(tables)
+        return self._fitted(model)
+
+    def _fitted(self, model):
+        model.classes_ = np.array(self.classes)
+        model.n_features_in_ = self.n_features
+        model.n_iter_ = np.zeros(1, dtype=np.int32)
+        return model
+
+
+def load(source):
+    """
+    Loads PMML document produced by this library into sklearn estimator - DecisionTreeClassifier,
+    RandomForestClassifier, LinearRegression or LogisticRegression.
+
+    :param source: (possibly compressed) file name or binary file-like object.
+    :return: estimator ready to predict (its inputs are the continuous fields of the data dictionary)
+    """
+    parser = DocumentParser()
+    with open_source(source) as stream:
+        model = parser.parse(stream)
+    return EstimatorBuilder(parser).build(model)
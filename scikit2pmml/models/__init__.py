@@ -2,12 +2,34 @@ try:
     import xml.etree.cElementTree as ET
 except ImportError:
     import xml.etree.ElementTree as ET
-from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from scikit2pmml.registry import is_a
+from scikit2pmml.backends import ElementWriter, create_writer
+from scikit2pmml.estimation import attribute_sizes, combine, measure, repeated
+from scikit2pmml.serialization import tostring
+import functools
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def fragment(build):
+    """
+    Turns method building a fragment into property whose value is cached on the document for the duration of one
+    export, so that fragments shared by many models (e.g. segments of an ensemble) are built just once. The cache is
+    keyed by the document inputs, so it is invalidated whenever they change.
+
+    :param build: method building the fragment.
+    :return: property
+    """
+    @functools.wraps(build)
+    def cached(self):
+        key = (build.__name__, self.pmml.fragment_key)
+        if key not in self.pmml.fragment_cache:
+            self.pmml.fragment_cache[key] = build(self)
+        return self.pmml.fragment_cache[key]
+    return property(cached)
+
+
 class Model:
 
     def __init__(self, estimator, pmml, function_name):
@@ -24,56 +46,175 @@ class Model:
         raise NotImplementedError('Override for every model.')
 
     @property
+    def model(self):
+        raise NotImplementedError('Override for every model.')
+
+    @property
+    def active_features(self):
+        """
+        Indices of features used by the model, None when all of them are used.
+        """
+        return None
+
+    @property
+    def cache_key(self):
+        """
+        Content hash identifying serialized model across exports, None when the model is not cacheable.
+        """
+        return None
+
+    def write(self, writer):
+        """
+        Writes the model as events into writer of the serialization backend, yields whenever the output written so far
+        may be drained (e.g. after every segment of an ensemble). Override along with model, by default the element
+        of the model is written as a whole.
+
+        :param writer: writer of the backend (see scikit2pmml.backends).
+        :return: generator
+        """
+        writer.element(self.model)
+        yield
+
+    def estimate(self):
+        """
+        Projected footprint of the serialized model (see scikit2pmml.estimate). Override to compute it from the model
+        arrays, by default the model is built and measured.
+
+        :return: Footprint
+        """
+        return measure(self.model)
+
+    @fragment
+    def feature_sizes(self):
+        """
+        Sizes of the escaped feature names indexed by feature, shared by the estimates of all the models.
+        """
+        return attribute_sizes(self.pmml.feature_names)
+
+    def mining_schema_footprint(self):
+        """
+        Footprint of the mining schema computed without building it (it has field per active feature).
+
+        :return: Footprint
+        """
+        mining_schema = ET.Element('MiningSchema')
+        mining_field = ET.SubElement(mining_schema, 'MiningField')
+        if self.pmml.target_name:
+            mining_field.set('name', self.pmml.target_name)
+            mining_field.set('usageType', 'predicted')
+        indices = [i for i, _ in self.pmml.active_fields]
+        fields = repeated(len(indices), 1, 2, '<MiningField name="" usageType="active" />',
+                          self.feature_sizes[indices].sum())
+        return combine(measure(mining_schema), fields)
+
+    def build(self):
+        """
+        Builds element of the model from the events written by write.
+
+        :return: XML element
+        """
+        writer = ElementWriter()
+        for _ in self.write(writer):
+            pass
+        return writer.root
+
+    def fragments(self):
+        """
+        Yields serialized model piece by piece so that the whole model does not need to be kept in memory.
+
+        :return: generator of UTF-8 encoded bytes
+        """
+        if self.pmml.backend == 'etree':
+            yield tostring(self.model)
+            return
+        writer = create_writer(self.pmml.backend)
+        for _ in self.write(writer):
+            yield writer.drain()
+        writer.close()
+        yield writer.drain()
+
+    def serialized(self, name):
+        """
+        Serializes (cached) fragment, e.g. mining schema shared by all segments is serialized once per export.
+
+        :param name: name of the fragment property.
+        :return: UTF-8 encoded bytes
+        """
+        key = ('serialized_' + name, self.pmml.fragment_key)
+        if key not in self.pmml.fragment_cache:
+            self.pmml.fragment_cache[key] = tostring(getattr(self, name))
+        return self.pmml.fragment_cache[key]
+
+    @fragment
     def mining_schema(self):
         mining_schema = ET.Element('MiningSchema')
         mining_field = ET.SubElement(mining_schema, 'MiningField')
         if self.pmml.target_name:
             mining_field.set('name', self.pmml.target_name)
             mining_field.set('usageType', 'predicted')
-        for f in self.pmml.feature_names:
+        for _, f in self.pmml.active_fields:
             mining_field = ET.SubElement(mining_schema, 'MiningField')
             mining_field.set('name', f)
             mining_field.set('usageType', 'active')
         return mining_schema
 
-    @property
+    @fragment
     def local_transformations(self):
         transformer = self.pmml.transformer
         if transformer:
             local_transformations = ET.Element('LocalTransformations')
-            for i, f in enumerate(self.pmml.feature_names):
+            for i, f in self.pmml.active_fields:
                 derived_field = ET.SubElement(local_transformations, 'DerivedField')
                 derived_field.set('optype', 'continuous')
                 derived_field.set('dataType', 'double')
                 derived_field.set('name', '{}*'.format(f))
-                if isinstance(transformer, StandardScaler):
+                if is_a(transformer, 'sklearn.preprocessing.StandardScaler'):
+                    norm_continuous = ET.SubElement(derived_field, 'NormContinuous')
+                    norm_continuous.set('field', f)
+                    ln1 = ET.SubElement(norm_continuous, 'LinearNorm')
+                    ln2 = ET.SubElement(norm_continuous, 'LinearNorm')
                     if transformer.mean_[i] == 0:
-                        norm_discrete = ET.SubElement(derived_field, 'NormDiscrete')
-                        norm_discrete.set('field', f)
-                        norm_discrete.set('value', '0.0')
-                        logging.warning('[!] {field} has zero mean, avoiding scaling. Check whether your data does not contains only one value!'.format(field=f))
+                        # (x - mean_) / scale_ sampled at 0 and scale_, the points at 0 and mean_ would coincide
+                        ln1.set('orig', '0.0')
+                        ln1.set('norm', '0.0')
+                        ln2.set('orig', (transformer.scale_[i]).astype(str))
+                        ln2.set('norm', '1.0')
                     else:
-                        norm_continuous = ET.SubElement(derived_field, 'NormContinuous')
-                        norm_continuous.set('field', f)
-                        ln1 = ET.SubElement(norm_continuous, 'LinearNorm')
-                        ln2 = ET.SubElement(norm_continuous, 'LinearNorm')
                         ln1.set('orig', '0.0')
                         ln1.set('norm', (-transformer.mean_[i] / transformer.scale_[i]).astype(str))
                         ln2.set('orig', (transformer.mean_[i]).astype(str))
                         ln2.set('norm', '0.0')
-                elif isinstance(transformer, MinMaxScaler):
+                elif is_a(transformer, 'sklearn.preprocessing.MinMaxScaler'):
                     norm_continuous = ET.SubElement(derived_field, 'NormContinuous')
                     norm_continuous.set('field', f)
                     ln1 = ET.SubElement(norm_continuous, 'LinearNorm')
                     ln2 = ET.SubElement(norm_continuous, 'LinearNorm')
+                    # x * scale_ + min_ sampled at 0 and 1, which keeps the points ordered even for constant features
                     ln1.set('orig', '0.0')
-                    ln1.set('norm', (- transformer.min_[i] / (transformer.data_max_[i] - transformer.min_[i])).astype(str))
-                    ln2.set('orig', (transformer.min_[i]).astype(str))
-                    ln2.set('norm', '0.0')
+                    ln1.set('norm', (transformer.min_[i]).astype(str))
+                    ln2.set('orig', '1.0')
+                    ln2.set('norm', (transformer.scale_[i] + transformer.min_[i]).astype(str))
             return local_transformations
         return None
 
-    @property
+    @staticmethod
+    def decision_output(name):
+        """
+        Output of the predicted value of model within chain (e.g. decision function of one class), so that following
+        models can refer to it.
+
+        :param name: name of the output field.
+        :return: XML element
+        """
+        output = ET.Element('Output')
+        output_field = ET.SubElement(output, 'OutputField')
+        output_field.set('name', name)
+        output_field.set('optype', 'continuous')
+        output_field.set('dataType', 'double')
+        output_field.set('feature', 'predictedValue')
+        return output
+
+    @fragment
     def output(self):
         output = ET.Element('Output')
         for t in self.pmml.target_values:
@@ -2,17 +2,41 @@ try:
     import xml.etree.cElementTree as ET
 except ImportError:
     import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from . import Model
-from scikit2pmml import TreeModel
-from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from scikit2pmml.models.tree import TreeModel
+from scikit2pmml.estimation import combine, digits, measure, repeated, wrapper
+from scikit2pmml.parallel import Completed, effective_n_jobs
+from scikit2pmml.registry import is_a
+from scikit2pmml.serialization import tostring, start_tag, end_tag, format_numbers
+import numpy as np
+
+
+# consecutive segments are serialized in chunks of at least this many nodes, so that many small trees (e.g. stages of
+# boosting) are not shipped into the worker processes one by one
+CHUNK_NODES = 10000
+
+
+def serialize_models(serializers):
+    """
+    Serializes models of a chunk of segments, module level function so that it can be run in worker processes.
+
+    :param serializers: models of the segments.
+    :return: list of UTF-8 encoded bytes (one item per segment)
+    """
+    return [b''.join(serializer.fragments()) for serializer in serializers]
 
 
 class Segmentation(Model):
 
+    multiple_model_method = 'average'
+
     def __init__(self, estimator, pmml, function_name):
         super(Segmentation, self).__init__(estimator, pmml, function_name)
-        if type(estimator) in [RandomForestClassifier, ExtraTreesClassifier]:
-            self.serializers = [TreeModel(tree, pmml, function_name) for tree in self.estimator.estimators_]
+        traffic = pmml.node_traffic if pmml.node_traffic is not None else [None] * len(self.estimator.estimators_)
+        self.serializers = [TreeModel(tree, pmml, function_name, node_traffic)
+                            for tree, node_traffic in zip(self.estimator.estimators_, traffic)]
 
     @property
     def n_features(self):
@@ -23,18 +47,298 @@ class Segmentation(Model):
         return self.estimator.n_classes_
 
     @property
-    def model(self):
+    def mining_model(self):
         mining_model = ET.Element('MiningModel')
         mining_model.set('functionName', self.function_name)
         if self.pmml.model_name:
             mining_model.set('modelName', self.pmml.model_name)
-        mining_model.append(self.mining_schema)
-        mining_model.append(self.output)
-        segmentation = ET.SubElement(mining_model, 'Segmentation')
-        segmentation.set('multipleModelMethod', 'average')
-        for i, serializer in enumerate(self.serializers):
-            segment = ET.SubElement(segmentation, 'Segment')
-            segment.set('id', str(i))
-            segment.append(ET.Element('True'))
-            segment.append(serializer.model)
         return mining_model
+
+    @property
+    def segmentation(self):
+        segmentation = ET.Element('Segmentation')
+        segmentation.set('multipleModelMethod', self.multiple_model_method)
+        return segmentation
+
+    @staticmethod
+    def segment(i):
+        segment = ET.Element('Segment')
+        segment.set('id', str(i))
+        return segment
+
+    def segments(self):
+        """
+        Serializes all the segments, in parallel when the document has n_jobs set. Workers receive the segment models
+        one by one and the results are yielded in the order of segment ids, so the output is deterministic.
+
+        :return: generator of UTF-8 encoded bytes (one item per segment)
+        """
+        n_jobs = effective_n_jobs(self.pmml.n_jobs)
+        if n_jobs == 1:
+            models = self._models(lambda fn, *args: Completed(fn(*args)), 1)
+            for segment in self._instrumented(self._wrap(models)):
+                yield segment
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                models = self._models(executor.submit, 2 * n_jobs)
+                for segment in self._instrumented(self._wrap(models)):
+                    yield segment
+
+    def _models(self, submit, window):
+        """
+        Serializes models of the segments in order, models found in the segment cache of the document are spliced in
+        as they are and only the rest is submitted in chunks (and stored into the cache afterwards).
+
+        :param submit: function submitting the serialization, returns future.
+        :param window: maximal number of submitted but not yet consumed chunks.
+        :return: generator of UTF-8 encoded bytes
+        """
+        cache = self.pmml.segment_cache
+        pending = deque()
+        for keys, chunk in self._chunks(cache):
+            pending.append((keys, submit(serialize_models, chunk) if keys else Completed([chunk])))
+            while len(pending) >= window:
+                for model in self._resolve(pending.popleft(), cache):
+                    yield model
+        while pending:
+            for model in self._resolve(pending.popleft(), cache):
+                yield model
+
+    def _chunks(self, cache):
+        """
+        Groups consecutive segments missing in the cache into chunks of at least CHUNK_NODES nodes.
+
+        :param cache: segment cache or None.
+        :return: generator of pairs of cache keys and models to be serialized, cached model comes with empty keys
+        """
+        keys, chunk, nodes = [], [], 0
+        for serializer in self.serializers:
+            key = serializer.cache_key if cache is not None else None
+            model = cache.get(key) if key is not None else None
+            if chunk and (model is not None or nodes >= CHUNK_NODES):
+                yield keys, chunk
+                keys, chunk, nodes = [], [], 0
+            if model is not None:
+                self.pmml.instrumentation.count('cache_hits', 1)
+                yield [], model
+            else:
+                keys.append(key)
+                chunk.append(serializer)
+                nodes += serializer.tree.node_count
+        if chunk:
+            yield keys, chunk
+
+    @staticmethod
+    def _resolve(item, cache):
+        keys, future = item
+        models = future.result()
+        for key, model in zip(keys, models):
+            if key is not None:
+                cache.put(key, model)
+        return models
+
+    def _wrap(self, models):
+        true = tostring(ET.Element('True'))
+        for i, model in enumerate(models):
+            yield b''.join([start_tag(self.segment(i)), true, model, end_tag('Segment')])
+
+    def _instrumented(self, segments):
+        """
+        Times production of every segment (waiting for the worker when run in parallel) and reports the progress.
+
+        :param segments: iterator of segments (serialized ones or None when written into the writer).
+        :return: generator of segments
+        """
+        instrumentation = self.pmml.instrumentation
+        total = len(self.serializers)
+        segments = iter(segments)
+        for i in range(total):
+            with instrumentation.phase('segment/{}'.format(i)):
+                segment = next(segments)
+            yield segment
+            instrumentation.segment_done(i + 1, total)
+
+    @property
+    def model(self):
+        return self.build()
+
+    def write(self, writer):
+        writer.start('MiningModel', self.mining_model.attrib)
+        writer.fragment(self, 'mining_schema')
+        if self.function_name == 'classification':
+            writer.fragment(self, 'output')
+        writer.start('Segmentation', self.segmentation.attrib)
+        for _ in self._written_segments(writer):
+            yield
+        writer.end('Segmentation')
+        writer.end('MiningModel')
+        yield
+
+    def _written_segments(self, writer):
+        """
+        Writes the segments one by one as the iterator is consumed, the serialized ones (from the workers or the
+        segment cache) are spliced into the output.
+
+        :param writer: writer of the backend.
+        :return: iterator advancing by one segment
+        """
+        if writer.serializes or effective_n_jobs(self.pmml.n_jobs) > 1 or self.pmml.segment_cache is not None:
+            return (writer.raw(segment) for segment in self.segments())
+        return self._instrumented(self._write_segments(writer))
+
+    def estimate(self):
+        footprints = [wrapper(self.mining_model), wrapper(self.segmentation), self.mining_schema_footprint()]
+        if self.function_name == 'classification':
+            footprints.append(measure(self.output))
+        return combine(self._segments_footprint(), *footprints)
+
+    def _segments_footprint(self):
+        segments = repeated(len(self.serializers), 2, 1, '<Segment id=""><True /></Segment>',
+                            digits([len(self.serializers)]))
+        return combine(segments, TreeModel.footprint(self.serializers))
+
+    def _write_segments(self, writer):
+        for i, serializer in enumerate(self.serializers):
+            writer.start('Segment', self.segment(i).attrib)
+            writer.empty('True', {})
+            for _ in serializer.write(writer):
+                pass
+            writer.end('Segment')
+            yield
+
+
+class GradientBoosting(Segmentation):
+    """
+    Gradient boosting as sum of regression trees, the learning rate is folded into the scores of the nodes and the
+    (constant) raw prediction of the init estimator into the scores of the first stage. Classifiers chain the sums of
+    the trees of every class (decision functions) into logit (binary) or softmax (multiclass) regression. Trees are
+    ordered class by class (and stage by stage within the class), which is the order of node_traffic too.
+    """
+
+    multiple_model_method = 'sum'
+
+    def __init__(self, estimator, pmml, function_name):
+        Model.__init__(self, estimator, pmml, function_name)
+        stages = self.estimator.estimators_
+        estimators = stages.T.ravel().tolist()
+        node_counts = [tree.tree_.node_count for tree in estimators]
+        # scores of all the trees are scaled and formatted in one batch
+        values = np.concatenate([tree.tree_.value[:, 0, 0] for tree in estimators]) * self.estimator.learning_rate
+        init = np.zeros(len(estimators))
+        init[::stages.shape[0]] = self._init_scores()
+        values += np.repeat(init, node_counts)
+        scores = format_numbers(values, pmml.compact, pmml.deterministic)
+        bounds = np.cumsum([0] + node_counts).tolist()
+        traffic = pmml.node_traffic if pmml.node_traffic is not None else [None] * len(estimators)
+        self.serializers = [TreeModel(tree, pmml, 'regression', node_traffic, scores[bounds[i]:bounds[i + 1]])
+                            for i, (tree, node_traffic) in enumerate(zip(estimators, traffic))]
+
+    @property
+    def n_features(self):
+        return self.estimator.n_features_in_
+
+    def _init_scores(self):
+        """
+        :return: raw predictions of the init estimator (one per class of the trees)
+        """
+        init = self.estimator.init_
+        n_trees = self.estimator.estimators_.shape[1]
+        if isinstance(init, str) and init == 'zero':
+            return np.zeros(n_trees)
+        if not (is_a(init, 'sklearn.dummy.DummyClassifier') or is_a(init, 'sklearn.dummy.DummyRegressor')):
+            raise TypeError("Only constant init estimator of gradient boosting is supported.")
+        # the dummy estimator predicts constant whatever the input is, the link of the loss turns the predicted
+        # probabilities (clipped like the loss of sklearn does) into log odds (binary) or log probabilities
+        row = np.zeros((1, self.n_features))
+        if self.function_name == 'regression':
+            return np.asarray(init.predict(row), dtype=np.float64).ravel()
+        eps = np.finfo(np.float32).eps
+        probabilities = np.clip(np.asarray(init.predict_proba(row), dtype=np.float64)[0], eps, 1 - eps)
+        if n_trees > 1:
+            return np.log(probabilities)
+        log_odds = np.log(probabilities[1] / (1 - probabilities[1]))
+        return np.array([0.5 * log_odds if self.estimator.loss == 'exponential' else log_odds])
+
+    @property
+    def decision_functions(self):
+        """
+        Names of the output fields of the sums of the trees of the classes.
+        """
+        if self.estimator.estimators_.shape[1] == 1:
+            return ['decisionFunction']
+        return ['decisionFunction({})'.format(t) for t in self.pmml.target_values]
+
+    @property
+    def link_model(self):
+        """
+        Regression turning the decision functions into probabilities, exponential loss of binary classifier doubles
+        the decision function.
+        """
+        decision_functions = self.decision_functions
+        binary = len(decision_functions) == 1
+        regression_model = ET.Element('RegressionModel')
+        regression_model.set('functionName', 'classification')
+        regression_model.set('normalizationMethod', 'logit' if binary else 'softmax')
+        mining_schema = ET.SubElement(regression_model, 'MiningSchema')
+        ET.SubElement(mining_schema, 'MiningField', {'name': self.pmml.target_name, 'usageType': 'predicted'})
+        for name in decision_functions:
+            ET.SubElement(mining_schema, 'MiningField', {'name': name, 'usageType': 'active'})
+        if binary:
+            coefficient = '2' if self.estimator.loss == 'exponential' else '1'
+            positive, negative = reversed(self.pmml.target_values)
+            table = ET.SubElement(regression_model, 'RegressionTable', {'targetCategory': positive, 'intercept': '0'})
+            ET.SubElement(table, 'NumericPredictor', {'name': decision_functions[0], 'coefficient': coefficient})
+            ET.SubElement(regression_model, 'RegressionTable', {'targetCategory': negative, 'intercept': '0'})
+        else:
+            for target_value, name in zip(self.pmml.target_values, decision_functions):
+                table = ET.SubElement(regression_model, 'RegressionTable',
+                                      {'targetCategory': target_value, 'intercept': '0'})
+                ET.SubElement(table, 'NumericPredictor', {'name': name, 'coefficient': '1'})
+        return regression_model
+
+    def write(self, writer):
+        if self.function_name == 'regression':
+            for _ in super(GradientBoosting, self).write(writer):
+                yield
+            return
+        writer.start('MiningModel', self.mining_model.attrib)
+        writer.fragment(self, 'mining_schema')
+        writer.fragment(self, 'output')
+        writer.start('Segmentation', {'multipleModelMethod': 'modelChain'})
+        segments = iter(self._written_segments(writer))
+        decision_functions = self.decision_functions
+        for k, name in enumerate(decision_functions):
+            writer.start('Segment', self.segment(k).attrib)
+            writer.empty('True', {})
+            writer.start('MiningModel', {'functionName': 'regression'})
+            writer.fragment(self, 'mining_schema')
+            writer.element(self.decision_output(name))
+            writer.start('Segmentation', self.segmentation.attrib)
+            for _ in range(self.estimator.estimators_.shape[0]):
+                next(segments)
+                yield
+            writer.end('Segmentation')
+            writer.end('MiningModel')
+            writer.end('Segment')
+        writer.start('Segment', self.segment(len(decision_functions)).attrib)
+        writer.empty('True', {})
+        writer.element(self.link_model)
+        writer.end('Segment')
+        writer.end('Segmentation')
+        writer.end('MiningModel')
+        yield
+
+    def estimate(self):
+        if self.function_name == 'regression':
+            return super(GradientBoosting, self).estimate()
+        mining_schema = self.mining_schema_footprint()
+        segmentation = wrapper(ET.Element('Segmentation', {'multipleModelMethod': 'modelChain'}))
+        footprints = [wrapper(self.mining_model), mining_schema, measure(self.output), segmentation,
+                      self._segments_footprint()]
+        true = measure(ET.Element('True'))
+        sums = wrapper(ET.Element('MiningModel', {'functionName': 'regression'}))
+        for k, name in enumerate(self.decision_functions):
+            footprints.extend([wrapper(self.segment(k)), true, sums, mining_schema, measure(self.decision_output(name)),
+                               wrapper(self.segmentation)])
+        footprints.extend([wrapper(self.segment(len(self.decision_functions))), true, measure(self.link_model)])
+        return combine(*footprints)
@@ -2,8 +2,34 @@ try:
     import xml.etree.cElementTree as ET
 except ImportError:
     import xml.etree.ElementTree as ET
-from . import Model
+from . import Model, fragment
+from scikit2pmml.estimation import SAMPLE_SIZE, Footprint, combine, formatted_size, measure, repeated, wrapper
+from scikit2pmml.registry import is_a
+from scikit2pmml.serialization import escape_attribute, format_numbers
 import numpy as np
+import sys
+
+
+def issparse(x):
+    # scipy is not imported unless sparse matrix is seen (then it is already imported)
+    sparse = sys.modules.get('scipy.sparse')
+    return sparse is not None and sparse.issparse(x)
+
+
+def is_multinomial(estimator):
+    """
+    Resolves multi_class of LogisticRegression as its predict_proba does.
+
+    :param estimator: logistic regression.
+    :return: True when the probabilities are softmax of the decision functions, False when every class has logistic
+        probability (normalized to unit sum when there are more than two classes)
+    """
+    multi_class = getattr(estimator, 'multi_class', 'auto')
+    if multi_class == 'multinomial':
+        return True
+    if multi_class not in ('auto', 'deprecated'):
+        return False
+    return estimator.classes_.size > 2 and getattr(estimator, 'solver', None) != 'liblinear'
 
 
 class RegressionModel(Model):
@@ -14,45 +40,303 @@ class RegressionModel(Model):
     def __init__(self, estimator, pmml, function_name, type):
         super(RegressionModel, self).__init__(estimator, pmml, function_name)
         self.type = type
+        self.multinomial = type == RegressionModel.LOGISTIC_REGRESSION and is_multinomial(estimator)
 
     @property
     def n_features(self):
-        return self.estimator.coef_.size
+        return self.estimator.coef_.shape[-1]
 
     @property
     def n_classes(self):
         return self.estimator.classes_.size
 
+    def _coefficients(self):
+        """
+        Coefficients and intercepts of the regression tables, the affine scaling of the transformer is folded into
+        them when fold_transformer is set (x is scaled as (x - mean_) / scale_ by StandardScaler and as
+        x * scale_ + min_ by MinMaxScaler). Binary multinomial model has doubled coefficients and intercept, as softmax
+        of the decision functions -d and d is logistic function of 2d.
+
+        :return: pair of coefficients (matrix with row per table, CSR matrix if sparse coef_ is exported in sparse
+            mode) and intercepts
+        """
+        coefficients = self.estimator.coef_
+        if issparse(coefficients):
+            coefficients = coefficients.tocsr(copy=True) if self.pmml.sparse else coefficients.toarray()
+        else:
+            coefficients = np.atleast_2d(coefficients)
+        intercepts = np.atleast_1d(self.estimator.intercept_)
+        if self.folded:
+            coefficients, intercepts = self._fold(coefficients, intercepts)
+        if self.multinomial and self.n_classes == 2:
+            coefficients, intercepts = coefficients * 2, intercepts * 2
+        return coefficients, intercepts
+
+    def _fold(self, coefficients, intercepts):
+        transformer = self.pmml.transformer
+        is_sparse = issparse(coefficients)
+        if is_a(transformer, 'sklearn.preprocessing.StandardScaler'):
+            # mean_ is fitted even when with_mean is False, only the flags tell which steps the scaler applies
+            if transformer.with_std:
+                if is_sparse:
+                    coefficients.data = coefficients.data / transformer.scale_[coefficients.indices]
+                else:
+                    coefficients = coefficients / transformer.scale_
+            if transformer.with_mean:
+                intercepts = intercepts - coefficients.dot(transformer.mean_)
+        elif is_a(transformer, 'sklearn.preprocessing.MinMaxScaler'):
+            intercepts = intercepts + coefficients.dot(transformer.min_)
+            if is_sparse:
+                coefficients.data = coefficients.data * transformer.scale_[coefficients.indices]
+            else:
+                coefficients = coefficients * transformer.scale_
+        return coefficients, intercepts
+
+    @property
+    def active_features(self):
+        coefficients = self.estimator.coef_
+        if issparse(coefficients):
+            coefficients = coefficients.tocsr(copy=True)
+            coefficients.eliminate_zeros()
+            return np.unique(coefficients.indices)
+        return np.flatnonzero(np.any(np.atleast_2d(coefficients) != 0, axis=0))
+
+    def _predictor_indices(self, coefficients, row):
+        """
+        Predictors of one regression table, only the non-zero ones in sparse mode.
+
+        :param coefficients: coefficients as returned by _coefficients.
+        :param row: index of the table.
+        :return: pair of feature indices (None when all the features are predictors) and coefficients
+        """
+        if issparse(coefficients):
+            start, end = coefficients.indptr[row], coefficients.indptr[row + 1]
+            indices, values = coefficients.indices[start:end], coefficients.data[start:end]
+            order = np.argsort(indices, kind='mergesort')
+            indices, values = indices[order], values[order]
+        elif self.pmml.sparse:
+            indices = np.flatnonzero(coefficients[row])
+            values = coefficients[row, indices]
+        else:
+            return None, coefficients[row]
+        nonzero = values != 0
+        return indices[nonzero], values[nonzero]
+
+    @property
+    def folded(self):
+        return self.pmml.fold_transformer and self.pmml.transformer is not None
+
     @property
     def model(self):
-        regression_model = ET.Element('RegressionModel')
-        regression_model.set('functionName', self.function_name)
+        return self.build()
+
+    @property
+    def regression_model(self):
+        attrib = {'functionName': self.function_name}
         if self.type == RegressionModel.LOGISTIC_REGRESSION:
-            regression_model.set('normalizationMethod', 'logit')
+            attrib['normalizationMethod'] = 'softmax' if self.multinomial and self.n_classes > 2 else 'logit'
         if self.pmml.model_name:
-            regression_model.set('modelName', self.pmml.model_name)
-        regression_model.append(self.mining_schema)
-        if self.local_transformations:
-            regression_model.append(self.local_transformations)
-        if self.function_name == 'classification':
-            regression_model.append(self.output)
+            attrib['modelName'] = self.pmml.model_name
+        return ET.Element('RegressionModel', attrib)
+
+    def _tables(self, intercepts):
+        """
+        :param intercepts: formatted intercepts.
+        :return: generator of pairs of attributes of regression table and index of its coefficients (None when the
+            table has no predictors)
+        """
+        if self.function_name == 'classification' and len(intercepts) > 1:
+            for k, target_value in enumerate(self.pmml.target_values):
+                yield {'targetCategory': target_value, 'intercept': intercepts[k]}, k
+        elif self.function_name == 'classification':
             for i, target_value in enumerate(reversed(self.pmml.target_values)):
-                regression_table = ET.SubElement(regression_model, 'RegressionTable')
-                regression_table.set('targetCategory', target_value)
                 if i == len(self.pmml.target_values) - 1:
-                    intercept = '0'
+                    yield {'targetCategory': target_value, 'intercept': '0'}, None
                 else:
-                    intercept = np.atleast_1d(self.estimator.intercept_).astype(str)[0]
-                    for feature, coefficient in zip(self.pmml.feature_names, self.estimator.coef_.astype(str).ravel()):
-                        numeric_predictor = ET.SubElement(regression_table, 'NumericPredictor')
-                        numeric_predictor.set('name', '{}*'.format(feature) if self.local_transformations else feature)
-                        numeric_predictor.set('coefficient', coefficient)
-                regression_table.set('intercept', intercept)
+                    yield {'targetCategory': target_value, 'intercept': intercepts[0]}, 0
+        else:
+            yield {'intercept': intercepts[0]}, 0
+
+    @fragment
+    def predictor_tags(self):
+        """
+        Serialized NumericPredictor tags of all the features up to the coefficient value, shared by all the tables.
+        """
+        name = '{}*' if self.pmml.transformer is not None and not self.folded else '{}'
+        return ['<NumericPredictor name="{}" coefficient="'.format(escape_attribute(name.format(f)))
+                for f in self.pmml.feature_names]
+
+    def write(self, writer):
+        writer.start('RegressionModel', self.regression_model.attrib)
+        writer.fragment(self, 'mining_schema')
+        if self.function_name == 'classification':
+            writer.fragment(self, 'output')
+        if not self.folded and self.local_transformations is not None:
+            writer.fragment(self, 'local_transformations')
+        coefficients, intercepts = self._coefficients()
+        for attrib, row in self._tables(format_numbers(intercepts, canonical=self.pmml.deterministic)):
+            self._write_table(writer, attrib, coefficients, row)
+            yield
+        writer.end('RegressionModel')
+        yield
+
+    def estimate(self):
+        footprints = [wrapper(self.regression_model), self.mining_schema_footprint()]
+        if self.function_name == 'classification':
+            footprints.append(measure(self.output))
+        footprints.append(measure(None if self.folded else self.local_transformations))
+        coefficients, intercepts = self._coefficients()
+        tables = self._tables(format_numbers(intercepts, canonical=self.pmml.deterministic))
+        return combine(*(footprints + self._tables_footprint(coefficients, tables)))
+
+    def _tables_footprint(self, coefficients, tables):
+        """
+        :param coefficients: coefficients as returned by _coefficients.
+        :param tables: pairs of attributes of regression table and index of its coefficients.
+        :return: list of footprints of the tables, the sizes of all the coefficients are extrapolated from one sample
+        """
+        values, n_values, names = [], 0, 0
+        n_tables, n_attributes, tags = 0, 0, 0
+        derived = self.pmml.transformer is not None and not self.folded
+        feature_sizes = self.feature_sizes
+        for attrib, row in tables:
+            indices, coefficients_row = self._predictor_indices(coefficients, row) if row is not None else ([], [])
+            # tags are sized directly, building thousands of elements would be the slowest part of the estimate
+            tag = '<RegressionTable' + ''.join([' {}="{}"'.format(k, escape_attribute(str(v)))
+                                                for k, v in attrib.items()])
+            n_tables += 1
+            n_attributes += len(attrib)
+            tags += len(tag.encode('utf-8')) + len(' />' if not len(coefficients_row) else '></RegressionTable>')
+            if not len(coefficients_row):
+                continue
+            names += feature_sizes.sum() if indices is None else feature_sizes[indices].sum()
+            # names of the derived fields have * suffix
+            names += len(coefficients_row) if derived else 0
+            values.append(coefficients_row)
+            n_values += len(coefficients_row)
+        footprints = [Footprint(0, 0, n_tables, n_attributes, tags)]
+        if values:
+            step = -(-n_values // SAMPLE_SIZE)
+            sampled = np.concatenate([row[::step] for row in values])
+            payload = names + formatted_size(sampled, canonical=self.pmml.deterministic, count=n_values)
+            footprints.append(repeated(n_values, 1, 2, '<NumericPredictor name="" coefficient="" />', payload))
+        return footprints
+
+    def _write_table(self, writer, attrib, coefficients, row):
+        """
+        Writes regression table, the coefficients of the row are formatted in one batch.
+
+        :param writer: writer of the backend.
+        :param attrib: attributes of the table.
+        :param coefficients: coefficients as returned by _coefficients.
+        :param row: index of the coefficients of the table (None when the table has no predictors).
+        """
+        indices, values = self._predictor_indices(coefficients, row) if row is not None else (None, [])
+        if not len(values):
+            writer.empty('RegressionTable', attrib)
+            return
+        values = format_numbers(values, canonical=self.pmml.deterministic)
+        writer.start('RegressionTable', attrib)
+        if writer.direct:
+            tags = self.predictor_tags
+            if indices is not None:
+                tags = [tags[i] for i in indices.tolist()]
+            writer.raw(('" />'.join(map(str.__add__, tags, values)) + '" />').encode('utf-8'))
         else:
-            regression_table = ET.SubElement(regression_model, 'RegressionTable')
-            for feature, coefficient in zip(self.pmml.feature_names, self.estimator.coef_.astype(str)):
-                numeric_predictor = ET.SubElement(regression_table, 'NumericPredictor')
-                numeric_predictor.set('name', '{}*'.format(feature) if self.local_transformations else feature)
-                numeric_predictor.set('coefficient', coefficient)
-            regression_table.set('intercept', self.estimator.intercept_.astype(str))
+            feature_names = self.pmml.feature_names
+            if indices is not None:
+                feature_names = [feature_names[i] for i in indices.tolist()]
+            predictor_name = '{}*' if self.pmml.transformer is not None and not self.folded else '{}'
+            for feature, coefficient in zip(feature_names, values):
+                writer.empty('NumericPredictor', {'name': predictor_name.format(feature), 'coefficient': coefficient})
+        writer.end('RegressionTable')
+
+
+class OneVsRestRegression(RegressionModel):
+    """
+    Logistic regression of more than two classes trained one-vs-rest - chain of the logistic regressions of the
+    classes (one table each, written segment by segment) and of regression normalizing their probabilities to unit
+    sum, as sklearn does.
+    """
+
+    def __init__(self, estimator, pmml):
+        super(OneVsRestRegression, self).__init__(estimator, pmml, 'classification',
+                                                  RegressionModel.LOGISTIC_REGRESSION)
+
+    @property
+    def probability_outputs(self):
+        """
+        Names of the output fields of the logistic probabilities of the classes.
+        """
+        return ['ovrProbability({})'.format(t) for t in self.pmml.target_values]
+
+    @property
+    def mining_model(self):
+        attrib = {'functionName': 'classification'}
+        if self.pmml.model_name:
+            attrib['modelName'] = self.pmml.model_name
+        return ET.Element('MiningModel', attrib)
+
+    @property
+    def class_model(self):
+        return ET.Element('RegressionModel', {'functionName': 'regression', 'normalizationMethod': 'logit'})
+
+    @property
+    def link_model(self):
+        regression_model = ET.Element('RegressionModel')
+        regression_model.set('functionName', 'classification')
+        regression_model.set('normalizationMethod', 'simplemax')
+        mining_schema = ET.SubElement(regression_model, 'MiningSchema')
+        ET.SubElement(mining_schema, 'MiningField', {'name': self.pmml.target_name, 'usageType': 'predicted'})
+        for name in self.probability_outputs:
+            ET.SubElement(mining_schema, 'MiningField', {'name': name, 'usageType': 'active'})
+        for target_value, name in zip(self.pmml.target_values, self.probability_outputs):
+            table = ET.SubElement(regression_model, 'RegressionTable',
+                                  {'targetCategory': target_value, 'intercept': '0'})
+            ET.SubElement(table, 'NumericPredictor', {'name': name, 'coefficient': '1'})
         return regression_model
+
+    def write(self, writer):
+        writer.start('MiningModel', self.mining_model.attrib)
+        writer.fragment(self, 'mining_schema')
+        writer.fragment(self, 'output')
+        if not self.folded and self.local_transformations is not None:
+            writer.fragment(self, 'local_transformations')
+        writer.start('Segmentation', {'multipleModelMethod': 'modelChain'})
+        coefficients, intercepts = self._coefficients()
+        intercepts = format_numbers(intercepts, canonical=self.pmml.deterministic)
+        probability_outputs = self.probability_outputs
+        for k, name in enumerate(probability_outputs):
+            writer.start('Segment', {'id': str(k)})
+            writer.empty('True', {})
+            writer.start('RegressionModel', self.class_model.attrib)
+            writer.fragment(self, 'mining_schema')
+            writer.element(self.decision_output(name))
+            self._write_table(writer, {'intercept': intercepts[k]}, coefficients, k)
+            writer.end('RegressionModel')
+            writer.end('Segment')
+            yield
+        writer.start('Segment', {'id': str(len(probability_outputs))})
+        writer.empty('True', {})
+        writer.element(self.link_model)
+        writer.end('Segment')
+        writer.end('Segmentation')
+        writer.end('MiningModel')
+        yield
+
+    def estimate(self):
+        mining_schema = self.mining_schema_footprint()
+        footprints = [wrapper(self.mining_model), mining_schema, measure(self.output),
+                      measure(None if self.folded else self.local_transformations),
+                      wrapper(ET.Element('Segmentation', {'multipleModelMethod': 'modelChain'}))]
+        true = measure(ET.Element('True'))
+        for k, name in enumerate(self.probability_outputs):
+            footprints.extend([wrapper(ET.Element('Segment', {'id': str(k)})), true, wrapper(self.class_model),
+                               mining_schema, measure(self.decision_output(name))])
+        coefficients, intercepts = self._coefficients()
+        intercepts = format_numbers(intercepts, canonical=self.pmml.deterministic)
+        tables = [({'intercept': intercept}, k) for k, intercept in enumerate(intercepts)]
+        footprints.extend(self._tables_footprint(coefficients, tables))
+        last = ET.Element('Segment', {'id': str(len(intercepts))})
+        footprints.extend([wrapper(last), true, measure(self.link_model)])
+        return combine(*footprints)
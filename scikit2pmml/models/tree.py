@@ -3,15 +3,135 @@ try:
 except ImportError:
     import xml.etree.ElementTree as ET
 from . import Model
-from sklearn.tree import _tree
+from scikit2pmml.cache import fingerprint
+from scikit2pmml.estimation import EMPTY, Footprint, attribute_sizes, combine, digits, formatted_size, measure, \
+    repeated, sample
+from scikit2pmml.serialization import start_tag, end_tag, escape_attribute, format_numbers
+from collections import namedtuple
+from itertools import repeat
+import contextlib
+import gc
 import numpy as np
 
+# children of leaves in sklearn.tree._tree.Tree
+TREE_LEAF = -1
+# feature and threshold of leaves in sklearn.tree._tree.Tree
+TREE_UNDEFINED = -2
+# operators of the predicates indexed by the codes of TreeModel._layout (None is True predicate)
+OPERATORS = (None, 'lessOrEqual', 'greaterThan')
+# formatted predicates (up to the value and field) by operator
+PREDICATES = {
+    None: '<True />',
+    'lessOrEqual': '<SimplePredicate operator="lessOrEqual"',
+    'greaterThan': '<SimplePredicate operator="greaterThan"'
+}
+
+CollapsedTree = namedtuple('CollapsedTree', ['node_count', 'max_depth', 'children_left', 'children_right', 'feature',
+                                             'threshold', 'value', 'weighted_n_node_samples'])
+CollapsedTree.__doc__ = """
+Arrays of tree with collapsed subtrees, in the layout of sklearn.tree._tree.Tree (nodes renumbered in pre-order).
+"""
+
+
+def collapse_tree(tree, regression, probabilities=False):
+    """
+    Collapses subtrees whose leaves all have the same score into single leaves, which keep the summed record counts
+    of the subtree. Leaves of regression trees have the same value, leaves of classification trees predict the same
+    class - the pooled distribution predicts that class too, so the predicted labels are unchanged, yet the
+    probabilities change. With probabilities set the leaves have the same class distribution (normalized to unit sum)
+    instead, which is the pooled distribution too, so probabilities (and predictions of ensembles averaging them) are
+    unchanged, but such subtrees are rare. Nodes are processed level by level (bottom-up for the collapsing, top-down
+    for the renumbering), each level in one vectorized step.
+
+    :param tree: sklearn.tree._tree.Tree
+    :param regression: whether the tree is regression one.
+    :param probabilities: whether the class distributions of classification tree are kept (not just the labels).
+    :return: tuple of the tree (the given one when nothing collapses), ids of the kept nodes and ids of the nodes the
+        scores of the kept nodes come from (both None when nothing collapses)
+    """
+    left, right = tree.children_left, tree.children_right
+    internal = left != TREE_LEAF
+    levels = []
+    level = np.zeros(1, dtype=left.dtype)
+    while level.size:
+        levels.append(level)
+        level = level[internal[level]]
+        level = np.concatenate([left[level], right[level]])
+    values = tree.value[:, 0]
+    if regression:
+        codes = np.unique(values[:, 0], return_inverse=True)[1]
+    elif probabilities:
+        proportions = values / values.sum(axis=1, keepdims=True)
+        codes = np.unique(proportions, axis=0, return_inverse=True)[1].reshape(-1)
+    else:
+        codes = np.argmax(values, axis=1)
+    uniform = ~internal
+    # leaf the score of every uniform node comes from
+    source = np.arange(tree.node_count)
+    for level in reversed(levels):
+        level = level[internal[level]]
+        children_left, children_right = left[level], right[level]
+        uniform[level] = uniform[children_left] & uniform[children_right] & \
+            (codes[children_left] == codes[children_right])
+        codes[level] = codes[children_left]
+        source[level] = np.where(uniform[level], source[children_left], level)
+    split = internal & ~uniform
+    if split.sum() == internal.sum():
+        return tree, None, None
+
+    reachable = np.zeros(tree.node_count, dtype=bool)
+    reachable[0] = True
+    max_depth = 0
+    for depth, level in enumerate(levels):
+        level = level[reachable[level]]
+        if level.size:
+            max_depth = depth
+        level = level[split[level]]
+        reachable[left[level]] = True
+        reachable[right[level]] = True
+    kept = np.flatnonzero(reachable)
+    ids = np.cumsum(reachable) - 1
+    split = split[kept]
+    value = tree.value[source[kept]] if regression else tree.value[kept]
+    collapsed = CollapsedTree(len(kept), max_depth,
+                              np.where(split, ids[left[kept]], TREE_LEAF), np.where(split, ids[right[kept]], TREE_LEAF),
+                              np.where(split, tree.feature[kept], TREE_UNDEFINED),
+                              np.where(split, tree.threshold[kept], TREE_UNDEFINED), value,
+                              tree.weighted_n_node_samples[kept])
+    return collapsed, kept, source[kept]
+
+
+@contextlib.contextmanager
+def _collection_paused():
+    """
+    Pauses the cyclic garbage collector while elements of large tree are created - they cannot form cycles, yet every
+    full collection triggered by the allocations would traverse all of them again.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
 
 class TreeModel(Model):
 
-    def __init__(self, estimator, pmml, function_name):
+    def __init__(self, estimator, pmml, function_name, node_traffic=None, scores=None):
         super(TreeModel, self).__init__(estimator, pmml, function_name)
         self.tree = self.estimator.tree_
+        # ids of the nodes kept by collapsing (None when the tree is exported whole)
+        self.kept = None
+        if pmml.collapse:
+            if pmml.collapse not in (True, 'labels', 'probabilities'):
+                raise ValueError('Unknown collapse: {}, use labels or probabilities.'.format(pmml.collapse))
+            self.tree, self.kept, source = collapse_tree(self.tree, function_name == 'regression',
+                                                         pmml.collapse == 'probabilities')
+            if scores is not None and source is not None:
+                scores = [scores[i] for i in source.tolist()]
+        self.node_traffic = node_traffic
+        self.scores = scores
 
     @property
     def n_features(self):
@@ -22,35 +142,394 @@ class TreeModel(Model):
         return self.estimator.n_classes_
 
     @property
-    def model(self):
+    def cache_key(self):
+        tree = self.tree
+        arrays = [tree.children_left, tree.children_right, tree.feature, tree.threshold, tree.value]
+        if self.pmml.child_order is not None:
+            arrays.append(self._node_weights())
+        if self.scores is not None:
+            arrays.append(np.asarray(self.scores))
+        return fingerprint(arrays, (type(self).__name__, self.function_name) + self.pmml.cache_context)
 
-        def split(node_id, parent_id, operator, parent):
-            node = ET.SubElement(parent, 'Node')
-            node.set('id', str(node_id))
-            left_child = self.tree.children_left[node_id]
-            right_child = self.tree.children_right[node_id]
-            values = self.tree.value[node_id][0]
-            node.set('recordCount', str(sum(values)))
-            node.set('score', self.pmml.target_values[np.argmax(values)])
-            if operator:
-                predicate = ET.SubElement(node, 'SimplePredicate')
-                predicate.set('operator', operator)
-                predicate.set('value', str(self.tree.threshold[parent_id]))
-                predicate.set('field', self.pmml.feature_names[self.tree.feature[parent_id]])
-            else:
-                node.append(ET.Element('True'))
-            for target_value, cnt_records in zip(self.pmml.target_values, values):
-                score_distribution = ET.SubElement(node, 'ScoreDistribution')
-                score_distribution.set('value', str(target_value))
-                score_distribution.set('recordCount', str(cnt_records))
-            if left_child != _tree.TREE_LEAF:
-                split(left_child, node_id, 'lessOrEqual', node)
-                split(right_child, node_id, 'greaterThan', node)
+    def _node_weights(self):
+        """
+        :return: per-node weights ordering the children - training records or traffic counts supplied by the caller
+        """
+        if self.pmml.child_order == 'records':
+            return self.tree.weighted_n_node_samples
+        if self.pmml.child_order == 'traffic':
+            traffic = self.node_traffic if self.node_traffic is not None else self.pmml.node_traffic
+            if traffic is None:
+                raise ValueError("Provide node_traffic to order the children by traffic.")
+            traffic = np.asarray(traffic, dtype=np.float64).ravel()
+            node_count = self.estimator.tree_.node_count
+            if traffic.shape[0] != node_count:
+                raise ValueError('Expected traffic of {} nodes, got {}.'.format(node_count, traffic.shape[0]))
+            return traffic if self.kept is None else traffic[self.kept]
+        raise ValueError('Unknown child order: {}, use records or traffic.'.format(self.pmml.child_order))
+
+    def regression_scores(self):
+        """
+        :return: formatted scores of the nodes of regression tree - the given ones (e.g. scaled by the learning rate of
+            boosting) or the values of the tree
+        """
+        if self.scores is not None:
+            return self.scores
+        return format_numbers(self.tree.value[:, 0, 0], self.pmml.compact, self.pmml.deterministic)
 
+    def _score_labels(self, escape):
+        """
+        :param escape: whether the labels are escaped for the direct formatting.
+        :return: labels the score indices of the nodes point to - target values (classification) or formatted scores of
+            the nodes (regression)
+        """
+        if self.function_name == 'regression':
+            return self.regression_scores()
+        return [escape_attribute(str(t)) if escape else str(t) for t in self.pmml.target_values]
+
+    def _node_attributes(self):
+        """
+        Precomputes all the per-node attributes in one batch, so that the traversal only looks them up.
+
+        :return: tuple of lists indexed by node id - ids, record counts (None if omitted), score indices (into the
+            score labels), thresholds and feature indices
+        """
+        compact = self.pmml.compact
+        canonical = self.pmml.deterministic
+        n_nodes = self.tree.node_count
+        ids = list(map(str, range(n_nodes)))
+        if self.function_name == 'regression':
+            record_counts = self.tree.weighted_n_node_samples
+            return (ids,
+                    format_numbers(record_counts, compact, canonical) if self.pmml.record_counts else None,
+                    list(range(n_nodes)),
+                    format_numbers(self.tree.threshold, compact, canonical),
+                    self.tree.feature.tolist())
+        values = self.tree.value[:, 0]
+        # summed class by class (not pairwise) to keep the float rounding of the builtin sum
+        record_counts = values[:, 0].copy()
+        for k in range(1, values.shape[1]):
+            record_counts += values[:, k]
+        return (ids,
+                format_numbers(record_counts, compact, canonical) if self.pmml.record_counts else None,
+                np.argmax(values, axis=1).tolist(),
+                format_numbers(self.tree.threshold, compact, canonical),
+                self.tree.feature.tolist())
+
+    def _score_distributions(self):
+        """
+        Class distributions of the nodes. In compact mode they are kept only for leaves and without zero counts,
+        regression trees have none. Trees repeat the small counts a lot, so every distinct entry (class and record
+        count) is formatted just once.
+
+        :return: tuple of attributes of the distinct entries, list of indices into them of the entries of all the
+            nodes and bounds of the entries of every node
+        """
+        n_nodes = self.tree.node_count
+        if self.function_name == 'regression':
+            return [], [], [0] * (n_nodes + 1)
+        values = self.tree.value[:, 0]
+        n_classes = values.shape[1]
+        if self.pmml.compact:
+            leaves = np.flatnonzero(self.tree.children_left == TREE_LEAF)
+            rows, classes = np.nonzero(values[leaves])
+            counts = values[leaves[rows], classes]
+            bounds = np.searchsorted(leaves[rows], np.arange(n_nodes + 1))
+        else:
+            classes = np.tile(np.arange(n_classes), n_nodes)
+            counts = values.ravel()
+            bounds = np.arange(0, counts.size + 1, n_classes)
+        # counts are compared bitwise to keep negative zero apart from zero
+        _, first, inverse = np.unique(counts.view('u{}'.format(counts.itemsize)), return_index=True,
+                                      return_inverse=True)
+        keys, indices = np.unique(inverse.reshape(-1) * n_classes + classes, return_inverse=True)
+        target_values = [str(t) for t in self.pmml.target_values]
+        record_counts = format_numbers(counts[first[keys // n_classes]], self.pmml.compact, self.pmml.deterministic)
+        attributes = [{'value': target_values[k], 'recordCount': cnt_records}
+                      for k, cnt_records in zip((keys % n_classes).tolist(), record_counts)]
+        return attributes, indices.reshape(-1).tolist(), bounds.tolist()
+
+    @property
+    def tree_model(self):
         tree_model = ET.Element('TreeModel')
-        tree_model.append(self.mining_schema)
-        tree_model.append(self.output)
         tree_model.set('splitCharacteristic', 'binarySplit')
-        tree_model.set('functionName', 'classification')
-        split(0, 0, None, tree_model)
+        tree_model.set('functionName', self.function_name)
         return tree_model
+
+    def _layout(self):
+        """
+        Order of the children and operators of the predicates computed from the tree arrays in one batch. Children are
+        ordered by child_order of the document (the more frequent child first, so that engines evaluating children in
+        document order mostly succeed with the first predicate) and the last one gets True predicate when true_last
+        is set (the complementary predicate is implied by the failure of the first one).
+
+        :return: tuple of lists indexed by node id - first child, last child (TREE_LEAF for leaves), parent (the root
+            is its own parent) and operator of the predicate (None for True predicate)
+        """
+        left, right = self.tree.children_left, self.tree.children_right
+        internal = np.flatnonzero(left != TREE_LEAF)
+        if self.pmml.child_order is None:
+            swap = np.zeros(len(internal), dtype=bool)
+        else:
+            weights = self._node_weights()
+            swap = weights[right[internal]] > weights[left[internal]]
+        first, last = left.copy(), right.copy()
+        first[internal] = np.where(swap, right[internal], left[internal])
+        last[internal] = np.where(swap, left[internal], right[internal])
+        parents = np.zeros(self.tree.node_count, dtype=np.intp)
+        parents[first[internal]] = internal
+        parents[last[internal]] = internal
+        # indices into OPERATORS, the root has True predicate
+        codes = np.zeros(self.tree.node_count, dtype=np.intp)
+        codes[first[internal]] = np.where(swap, 2, 1)
+        if not self.pmml.true_last:
+            codes[last[internal]] = np.where(swap, 1, 2)
+        return first.tolist(), last.tolist(), parents.tolist(), [OPERATORS[c] for c in codes.tolist()]
+
+    def _traverse(self):
+        """
+        Walks the tree in document order using explicit stack (no recursion limits on deep trees).
+
+        :return: generator of (node id, parent id, operator) tuples (operator is None for True predicate), None is
+            yielded when node is closed
+        """
+        first, last, parents, operators = self._layout()
+        stack = [0]
+        while stack:
+            node_id = stack.pop()
+            if node_id == TREE_LEAF:
+                yield None
+                continue
+            yield node_id, parents[node_id], operators[node_id]
+            stack.append(TREE_LEAF)
+            if first[node_id] != TREE_LEAF:
+                stack.append(last[node_id])
+                stack.append(first[node_id])
+
+    @property
+    def model(self):
+        """
+        Builds the element straight from the precomputed node attributes - the elements of all the nodes are created
+        in batches and linked to their parents afterwards, so no traversal (nor writer events) is involved. Equal
+        score distributions (and True predicates) are shared by the nodes.
+        """
+        ids, record_counts, scores, thresholds, features = self._node_attributes()
+        first, last, parents, operators = self._layout()
+        labels = self._score_labels(escape=False)
+        feature_names = self.pmml.feature_names
+
+        tree_model = self.tree_model
+        tree_model.append(self.mining_schema)
+        if self.function_name == 'classification':
+            tree_model.append(self.output)
+        make = tree_model.makeelement
+        with _collection_paused():
+            if record_counts:
+                attributes = [{'id': node_id, 'recordCount': cnt_records, 'score': labels[score]}
+                              for node_id, cnt_records, score in zip(ids, record_counts, scores)]
+            else:
+                attributes = [{'id': node_id, 'score': labels[score]} for node_id, score in zip(ids, scores)]
+            nodes = list(map(make, repeat('Node'), attributes))
+            true = make('True', {})
+            predicates = [make('SimplePredicate', {
+                'operator': operator,
+                'value': thresholds[parent_id],
+                'field': feature_names[features[parent_id]]
+            }) if operator else true for operator, parent_id in zip(operators, parents)]
+            distributions, indices, bounds = self._score_distributions()
+            scored = list(map(make, repeat('ScoreDistribution'), distributions))
+            scored = list(map(scored.__getitem__, indices))
+            for node, predicate, start, end, first_id, last_id in zip(
+                    nodes, predicates, bounds, bounds[1:], first, last):
+                node.append(predicate)
+                node.extend(scored[start:end])
+                if first_id != TREE_LEAF:
+                    node.append(nodes[first_id])
+                    node.append(nodes[last_id])
+        tree_model.append(nodes[0])
+        return tree_model
+
+    def write(self, writer):
+        if writer.direct:
+            for fragment in self._emit():
+                writer.raw(fragment)
+            yield
+            return
+        if not writer.serializes:
+            writer.element(self.model)
+            yield
+            return
+        ids, record_counts, scores, thresholds, features = self._node_attributes()
+        attributes, indices, bounds = self._score_distributions()
+        labels = self._score_labels(escape=False)
+        feature_names = self.pmml.feature_names
+
+        writer.start('TreeModel', self.tree_model.attrib)
+        writer.fragment(self, 'mining_schema')
+        if self.function_name == 'classification':
+            writer.fragment(self, 'output')
+        for item in self._traverse():
+            if item is None:
+                writer.end('Node')
+                continue
+            node_id, parent_id, operator = item
+            if record_counts:
+                attrib = {'id': ids[node_id], 'recordCount': record_counts[node_id], 'score': labels[scores[node_id]]}
+            else:
+                attrib = {'id': ids[node_id], 'score': labels[scores[node_id]]}
+            writer.start('Node', attrib)
+            if operator:
+                writer.empty('SimplePredicate', {
+                    'operator': operator,
+                    'value': thresholds[parent_id],
+                    'field': feature_names[features[parent_id]]
+                })
+            else:
+                writer.empty('True', {})
+            for i in indices[bounds[node_id]:bounds[node_id + 1]]:
+                writer.empty('ScoreDistribution', attributes[i])
+        writer.end('TreeModel')
+        yield
+
+    def estimate(self):
+        return TreeModel.footprint([self])
+
+    @staticmethod
+    def footprint(serializers):
+        """
+        Footprint of serialized trees computed from the tree arrays in one vectorized pass over all of them (e.g. the
+        trees of a forest), without building any XML. Sizes of the formatted numbers are extrapolated from sample.
+
+        :param serializers: tree models of the same document.
+        :return: Footprint
+        """
+        if not serializers:
+            return EMPTY
+        model = serializers[0]
+        pmml = model.pmml
+        trees = [serializer.tree for serializer in serializers]
+        node_counts = np.array([tree.node_count for tree in trees])
+        internal = np.concatenate([tree.children_left for tree in trees]) != TREE_LEAF
+        values = np.concatenate([tree.value[:, 0] for tree in trees])
+        thresholds = np.concatenate([tree.threshold for tree in trees])[internal]
+        features = np.concatenate([tree.feature for tree in trees])[internal]
+        target_sizes = attribute_sizes(pmml.target_values)
+        compact, canonical = pmml.compact, pmml.deterministic
+        n_nodes, n_internal = values.shape[0], int(internal.sum())
+
+        regression = model.function_name == 'regression'
+        if regression and all(serializer.scores is not None for serializer in serializers):
+            scores = sum(len(score) for serializer in serializers for score in serializer.scores)
+        elif regression:
+            scores = formatted_size(values[:, 0], compact, canonical)
+        elif target_sizes.min() == target_sizes.max():
+            scores = n_nodes * target_sizes[0]
+        else:
+            scores = target_sizes[np.argmax(values, axis=1)].sum()
+        nodes = repeated(n_nodes, 1, 2, '<Node id="" score=""></Node>', digits(node_counts) + scores, nodes=1)
+        if pmml.record_counts and regression:
+            record_counts = repeated(n_nodes, 0, 1, ' recordCount=""', formatted_size(
+                np.concatenate([tree.weighted_n_node_samples for tree in trees]), compact, canonical))
+        elif pmml.record_counts:
+            record_counts = repeated(n_nodes, 0, 1, ' recordCount=""',
+                                     formatted_size(sample(values).sum(axis=1), compact, canonical, n_nodes))
+        else:
+            record_counts = EMPTY
+        # every split has SimplePredicate on both children (on the first one only with true_last), the rest is True
+        predicated = 1 if pmml.true_last else 2
+        n_predicates = predicated * n_internal
+        predicates = repeated(n_predicates, 1, 3, '<SimplePredicate operator="lessOrEqual" value="" field="" />',
+                              predicated * (formatted_size(thresholds, compact, canonical) +
+                                            model.feature_sizes[features].sum()))
+        trues = repeated(n_nodes - n_predicates, 1, 0, '<True />')
+        if regression:
+            n_distributions, payload = 0, 0
+        elif compact:
+            leaves = values[~internal]
+            rows, classes = np.nonzero(leaves)
+            n_distributions, payload = len(classes), target_sizes[classes].sum()
+            payload += formatted_size(leaves[rows, classes], compact, canonical)
+        else:
+            n_distributions = values.size
+            payload = n_nodes * target_sizes.sum() + formatted_size(values, compact, canonical)
+        distributions = repeated(n_distributions, 1, 2, '<ScoreDistribution value="" recordCount="" />', payload)
+
+        tree_model = measure(model.tree_model)
+        tree_model = tree_model._replace(size=len(start_tag(model.tree_model)) + len(end_tag('TreeModel')))
+        header = combine(tree_model, model.mining_schema_footprint())
+        if model.function_name == 'classification':
+            header = combine(header, measure(model.output))
+        headers = Footprint(0, 0, len(trees) * header.elements, len(trees) * header.attributes,
+                            len(trees) * header.size)
+        return combine(headers, nodes, record_counts, predicates, trues, distributions,
+                       Footprint(0, max(tree.max_depth for tree in trees), 0, 0, 0))
+
+    def _emit(self):
+        """
+        Formats the tree directly (the bytes backend), which is considerably faster than writing the events. Text of
+        every node up to its children is concatenated from the pieces precomputed for all the nodes, every distinct
+        score distribution is formatted just once.
+
+        :return: generator of UTF-8 encoded bytes
+        """
+        yield start_tag(self.tree_model)
+        yield self.serialized('mining_schema')
+        if self.function_name == 'classification':
+            yield self.serialized('output')
+        with _collection_paused():
+            nodes = self._emit_nodes()
+        yield nodes
+        yield end_tag('TreeModel')
+
+    def _emit_nodes(self):
+        """
+        :return: UTF-8 encoded nodes of the tree (the garbage collector is paused by the caller for the lists of all
+            the nodes)
+        """
+        ids, record_counts, scores, thresholds, features = self._node_attributes()
+        first, last, parents, operators = self._layout()
+        labels = self._score_labels(escape=True)
+        feature_names = [escape_attribute(f) for f in self.pmml.feature_names]
+        # both children of a split share the value and field of their predicates
+        split = ' value="{}" field="{}" />'
+        splits = [split.format(threshold, feature_names[feature]) if first_id != TREE_LEAF else None
+                  for threshold, feature, first_id in zip(thresholds, features, first)]
+        predicates = [PREDICATES[operator] + splits[parent_id] if operator else PREDICATES[None]
+                      for operator, parent_id in zip(operators, parents)]
+        attributes, indices, bounds = self._score_distributions()
+        entries = ['<ScoreDistribution value="{}" recordCount="{}" />'.format(
+            escape_attribute(attrib['value']), attrib['recordCount']) for attrib in attributes]
+        if self.function_name == 'regression':
+            scored = repeat('')
+        else:
+            # nodes with equal distributions share the formatted string
+            if self.pmml.compact:
+                keys = [tuple(indices[start:end]) for start, end in zip(bounds, bounds[1:])]
+            else:
+                keys = list(zip(*[iter(indices)] * len(self.pmml.target_values)))
+            formatted = dict.fromkeys(keys)
+            for key in formatted:
+                formatted[key] = ''.join([entries[i] for i in key])
+            scored = map(formatted.__getitem__, keys)
+        labels = map(labels.__getitem__, scores)
+        if record_counts:
+            pieces = zip(repeat('<Node id="'), ids, repeat('" recordCount="'), record_counts, repeat('" score="'),
+                         labels, repeat('">'), predicates, scored)
+        else:
+            pieces = zip(repeat('<Node id="'), ids, repeat('" score="'), labels, repeat('">'), predicates, scored)
+        texts = list(map(''.join, pieces))
+        pieces = []
+        stack = [0]
+        while stack:
+            node_id = stack.pop()
+            if node_id == TREE_LEAF:
+                pieces.append('</Node>')
+            elif first[node_id] == TREE_LEAF:
+                pieces.append(texts[node_id])
+                pieces.append('</Node>')
+            else:
+                pieces.append(texts[node_id])
+                stack.append(TREE_LEAF)
+                stack.append(last[node_id])
+                stack.append(first[node_id])
+        return ''.join(pieces).encode('utf-8')
@@ -0,0 +1,48 @@
+from collections import deque
+import os
+
+
+def effective_n_jobs(n_jobs):
+    """
+    Resolves number of worker processes, negative values are counted from the number of CPUs (-1 means all of them).
+
+    :param n_jobs: requested number of jobs.
+    :return: positive number of workers
+    """
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max((os.cpu_count() or 1) + 1 + n_jobs, 1)
+    return n_jobs
+
+
+class Completed:
+    """
+    Future-like holder of result which is already known (e.g. computed in the calling process or taken from cache).
+    """
+
+    def __init__(self, result):
+        self._result = result
+
+    def result(self):
+        return self._result
+
+
+def ordered_map(executor, fn, tasks, window):
+    """
+    Maps function over the tasks using executor, results are yielded in the order of tasks. In contrast to
+    executor.map at most window tasks are in flight, which bounds the memory when results are consumed slowly.
+
+    :param executor: concurrent.futures executor.
+    :param fn: function to be called (must be picklable for process pools).
+    :param tasks: iterable of argument tuples.
+    :param window: maximal number of submitted but not yet consumed tasks.
+    :return: generator of results
+    """
+    pending = deque()
+    for args in tasks:
+        pending.append(executor.submit(fn, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
@@ -0,0 +1,155 @@
+"""
+Registry of converters (serializers) keyed by path of the estimator class, e.g. 'sklearn.tree.DecisionTreeClassifier'.
+Estimators are matched by path of their class, so sklearn is never imported by the package itself - it is already
+imported whenever its estimator is exported. Subclasses (e.g. LogisticRegressionCV of LogisticRegression) may differ
+from their bases in ways the converter does not know about, hence they are matched only when the converter is registered
+for them. Third party estimators are supported by registering converter:
+
+    register_converter('mypackage.MyTree', lambda estimator, pmml: TreeModel(estimator, pmml, 'classification'))
+"""
+import importlib
+
+CONVERTERS = {}
+# paths of the classes whose converters accept subclasses too
+SUBCLASSES = set()
+_resolved = {}
+
+
+def class_paths(cls):
+    """
+    Paths under which the class is known - the full one and the public one, without private submodules (e.g.
+    sklearn.tree._classes.DecisionTreeClassifier is known as sklearn.tree.DecisionTreeClassifier too).
+
+    :param cls: class.
+    :return: set of paths
+    """
+    public = []
+    for part in cls.__module__.split('.'):
+        if part.startswith('_'):
+            break
+        public.append(part)
+    return {'{}.{}'.format(cls.__module__, cls.__qualname__), '{}.{}'.format('.'.join(public), cls.__qualname__)}
+
+
+def is_a(obj, path):
+    """
+    Checks whether object is instance of class given by path without importing it.
+
+    :param obj: instance to be checked.
+    :param path: path of the class.
+    :return: bool
+    """
+    return any(path in class_paths(cls) for cls in type(obj).__mro__)
+
+
+def register_converter(estimator, converter, subclasses=False):
+    """
+    Registers converter of estimators of the given class.
+
+    :param estimator: path of the estimator class (module need not be imported) or the class itself.
+    :param converter: callable taking estimator and PMMLDocument and returning serializer (instance of Model).
+    :param subclasses: whether the converter handles subclasses of the class too (the closest registered base wins).
+    """
+    path = _path(estimator)
+    CONVERTERS[path] = converter
+    if subclasses:
+        SUBCLASSES.add(path)
+    else:
+        SUBCLASSES.discard(path)
+    _resolved.clear()
+
+
+def unregister_converter(estimator):
+    """
+    Removes converter registered for the estimator class.
+
+    :param estimator: path of the estimator class or the class itself.
+    """
+    CONVERTERS.pop(_path(estimator), None)
+    SUBCLASSES.discard(_path(estimator))
+    _resolved.clear()
+
+
+def _path(estimator):
+    return estimator if isinstance(estimator, str) else '{}.{}'.format(estimator.__module__, estimator.__qualname__)
+
+
+def _import_class(path):
+    module, _, name = path.rpartition('.')
+    try:
+        return getattr(importlib.import_module(module), name)
+    except (ImportError, AttributeError):
+        return None
+
+
+def find_converter(estimator):
+    """
+    Finds converter of the estimator class, or of the closest base class registered along with its subclasses. Paths
+    not matching the class by name (e.g. re-exported classes) are resolved by import, but only within the package of
+    the estimator which is already imported.
+
+    :param estimator: estimator to be exported.
+    :return: converter or None if the estimator is not supported
+    """
+    cls = type(estimator)
+    if cls not in _resolved:
+        _resolved[cls] = _find(cls)
+    return _resolved[cls]
+
+
+def _find(cls):
+    mro = cls.__mro__
+    for base in mro:
+        for path in class_paths(base):
+            if path in CONVERTERS and (base is cls or path in SUBCLASSES):
+                return CONVERTERS[path]
+    package = cls.__module__.split('.')[0]
+    for path, converter in CONVERTERS.items():
+        if path.split('.')[0] != package:
+            continue
+        resolved = _import_class(path)
+        if resolved is cls or (path in SUBCLASSES and resolved in mro):
+            return converter
+    return None
+
+
+def _linear_regression(estimator, pmml):
+    from scikit2pmml.models.regression import RegressionModel
+    return RegressionModel(estimator, pmml, 'regression', RegressionModel.LINEAR_REGRESSION)
+
+
+def _logistic_regression(estimator, pmml):
+    from scikit2pmml.models.regression import OneVsRestRegression, RegressionModel, is_multinomial
+    if estimator.classes_.size > 2 and not is_multinomial(estimator):
+        return OneVsRestRegression(estimator, pmml)
+    return RegressionModel(estimator, pmml, 'classification', RegressionModel.LOGISTIC_REGRESSION)
+
+
+def _tree_classifier(estimator, pmml):
+    from scikit2pmml.models.tree import TreeModel
+    return TreeModel(estimator, pmml, 'classification')
+
+
+def _forest_classifier(estimator, pmml):
+    from scikit2pmml.models.ensemble import Segmentation
+    return Segmentation(estimator, pmml, 'classification')
+
+
+def _gradient_boosting_classifier(estimator, pmml):
+    from scikit2pmml.models.ensemble import GradientBoosting
+    return GradientBoosting(estimator, pmml, 'classification')
+
+
+def _gradient_boosting_regressor(estimator, pmml):
+    from scikit2pmml.models.ensemble import GradientBoosting
+    return GradientBoosting(estimator, pmml, 'regression')
+
+
+register_converter('sklearn.linear_model.LinearRegression', _linear_regression)
+register_converter('sklearn.linear_model.LogisticRegression', _logistic_regression)
+register_converter('sklearn.tree.DecisionTreeClassifier', _tree_classifier)
+register_converter('sklearn.tree.ExtraTreeClassifier', _tree_classifier)
+register_converter('sklearn.ensemble.RandomForestClassifier', _forest_classifier)
+register_converter('sklearn.ensemble.ExtraTreesClassifier', _forest_classifier)
+register_converter('sklearn.ensemble.GradientBoostingClassifier', _gradient_boosting_classifier)
+register_converter('sklearn.ensemble.GradientBoostingRegressor', _gradient_boosting_regressor)
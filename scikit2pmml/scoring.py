@@ -0,0 +1,353 @@
+"""
+Vectorized scoring of the PMML documents produced by this library (TreeModel, MiningModel with averaged or summed
+TreeModel segments or with chain of models and RegressionModel including LocalTransformations). Documents are compiled
+into flat NumPy arrays, so that whole batch of rows is scored at once, e.g. for parity checks against the original
+estimator:
+
+    scorer = compile_scorer('iris.pmml')
+    probabilities = scorer.predict_proba(X)
+"""
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+from scikit2pmml.files import read_pmml
+import numpy as np
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _children(element, tag):
+    return [child for child in element if _local(child.tag) == tag]
+
+
+def _child(element, tag):
+    children = _children(element, tag)
+    return children[0] if children else None
+
+
+class TreeEnsemble:
+    """
+    Trees packed into flat node arrays, scored level by level for all rows and all trees at once. Leaves point to
+    themselves (with infinite threshold), so that every row simply takes max_depth steps without any masking.
+    """
+
+    def __init__(self, trees, classes, aggregation='average'):
+        self.classes = classes
+        self.aggregation = aggregation
+        self.fields = sorted(set(field for tree in trees for field in tree['fields'] if field is not None))
+        field_index = {field: i for i, field in enumerate(self.fields)}
+        offsets = np.cumsum([0] + [len(tree['left']) for tree in trees])
+        self.roots = offsets[:-1]
+        self.max_depth = max(tree['max_depth'] for tree in trees)
+        self.feature = np.concatenate([[field_index.get(f, 0) for f in tree['fields']] for tree in trees])
+        self.feature = self.feature.astype(np.intp)
+        self.threshold = np.concatenate([np.where(tree['left'] >= 0, tree['threshold'], np.inf) for tree in trees])
+        self.children = np.empty((offsets[-1], 2), dtype=np.intp)
+        for tree, offset in zip(trees, offsets):
+            nodes = np.arange(len(tree['left'])) + offset
+            leaf = tree['left'] < 0
+            self.children[nodes, 0] = np.where(leaf, nodes, tree['left'] + offset)
+            self.children[nodes, 1] = np.where(leaf, nodes, tree['right'] + offset)
+        self.children = self.children.ravel()
+        self.values = np.concatenate([tree['values'] for tree in trees])
+
+    def leaves(self, env, n_rows, batch_size=1024):
+        """
+        :param env: dictionary of input columns.
+        :param n_rows: number of the input rows (the environment has no columns when no field is active).
+        :param batch_size: number of rows traversed at once (small batches stay in CPU cache).
+        :return: matrix (rows x trees) of leaf indices
+        """
+        X = np.column_stack([env[field] for field in self.fields]) if self.fields else np.zeros((n_rows, 1))
+        leaves = np.empty((n_rows, len(self.roots)), dtype=np.intp)
+        for start in range(0, n_rows, batch_size):
+            batch = X[start:start + batch_size]
+            flat = batch.ravel()
+            row_offsets = (np.arange(batch.shape[0]) * batch.shape[1])[:, None]
+            nodes = np.repeat(self.roots[None, :], batch.shape[0], axis=0)
+            for _ in range(self.max_depth):
+                go_right = flat[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+                nodes = self.children[2 * nodes + go_right]
+            leaves[start:start + batch_size] = nodes
+        return leaves
+
+    def evaluate(self, env, n_rows):
+        values = self.values[self.leaves(env, n_rows)]
+        if self.aggregation == 'sum':
+            return values.sum(axis=1)
+        return values.mean(axis=1)
+
+
+class ModelChain:
+    """
+    Models evaluated in order, outputs of the models are available to the following ones as fields, the last model
+    gives the result.
+
+    :param models: list of (name of output field or None, compiled model) pairs.
+    """
+
+    def __init__(self, models):
+        self.models = models
+
+    def evaluate(self, env, n_rows):
+        env = dict(env)
+        for name, model in self.models[:-1]:
+            value = model.evaluate(env, n_rows)
+            if name is not None:
+                env[name] = value
+        return self.models[-1][1].evaluate(env, n_rows)
+
+
+class Regression:
+    """
+    Regression tables compiled into coefficient matrix (inputs x tables) and intercept vector.
+    """
+
+    def __init__(self, tables, classes, normalization):
+        self.classes = classes
+        self.normalization = normalization
+        self.terms = sorted(set((name, exponent) for _, _, predictors in tables for name, _, exponent in predictors))
+        term_index = {term: i for i, term in enumerate(self.terms)}
+        self.coefficients = np.zeros((len(self.terms), len(tables)))
+        self.intercepts = np.zeros(len(tables))
+        order = [classes.index(category) for category, _, _ in tables] if classes is not None else [0]
+        for j, (_, intercept, predictors) in zip(order, tables):
+            self.intercepts[j] = intercept
+            for name, coefficient, exponent in predictors:
+                self.coefficients[term_index[(name, exponent)], j] += coefficient
+        self.last = order[-1]
+
+    def evaluate(self, env, n_rows):
+        Z = np.column_stack([env[name] ** exponent for name, exponent in self.terms]) if self.terms else \
+            np.zeros((n_rows, 0))
+        y = Z.dot(self.coefficients) + self.intercepts
+        if self.classes is None:
+            y = y[:, 0]
+            if self.normalization == 'logit':
+                return 1 / (1 + np.exp(-y))
+            if self.normalization == 'exp':
+                return np.exp(y)
+            return y
+        if self.normalization == 'softmax':
+            e = np.exp(y - y.max(axis=1, keepdims=True))
+            return e / e.sum(axis=1, keepdims=True)
+        if self.normalization == 'simplemax':
+            return y / y.sum(axis=1, keepdims=True)
+        if self.normalization == 'logit':
+            p = 1 / (1 + np.exp(-y))
+            others = np.arange(p.shape[1]) != self.last
+            p[:, self.last] = 1 - p[:, others].sum(axis=1)
+            return p
+        return y
+
+
+class Scorer:
+    """
+    Compiled PMML document.
+
+    :param feature_names: names of the active fields (order of the input columns).
+    :param target_name: name of the predicted field.
+    :param classes: list of target values (None for regression).
+    :param transformations: list of (derived field, function of environment) pairs evaluated before the model.
+    :param model: compiled model (TreeEnsemble or Regression).
+    """
+
+    def __init__(self, feature_names, target_name, classes, transformations, model):
+        self.feature_names = feature_names
+        self.target_name = target_name
+        self.classes = classes
+        self.transformations = transformations
+        self.model = model
+
+    def _evaluate(self, X, batch_size):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != len(self.feature_names):
+            raise ValueError('Expected 2-D input with {} columns.'.format(len(self.feature_names)))
+        results = []
+        for start in range(0, max(X.shape[0], 1), batch_size):
+            batch = X[start:start + batch_size]
+            env = {name: batch[:, i] for i, name in enumerate(self.feature_names)}
+            for name, transformation in self.transformations:
+                env[name] = transformation(env)
+            results.append(self.model.evaluate(env, batch.shape[0]))
+        return np.concatenate(results)
+
+    def predict_proba(self, X, batch_size=65536):
+        """
+        :param X: 2-D array of input rows (columns ordered as feature_names).
+        :param batch_size: number of rows scored at once.
+        :return: matrix of class probabilities (columns ordered as classes)
+        """
+        if self.classes is None:
+            raise TypeError('Regression model does not predict probabilities.')
+        return self._evaluate(X, batch_size)
+
+    def predict(self, X, batch_size=65536):
+        """
+        :param X: 2-D array of input rows (columns ordered as feature_names).
+        :param batch_size: number of rows scored at once.
+        :return: predicted target values (classification) or predicted values (regression)
+        """
+        result = self._evaluate(X, batch_size)
+        if self.classes is None:
+            return result
+        return np.asarray(self.classes)[np.argmax(result, axis=1)]
+
+
+def _compile_tree(tree_model, classes):
+    class_index = {c: i for i, c in enumerate(classes)} if classes is not None else None
+    stack = [(_child(tree_model, 'Node'), -1, None, 0)]
+    # nodes are numbered in document order, children are linked to their parent once visited
+    fields, thresholds, lefts, rights, values = [], [], [], [], []
+    max_depth = 0
+    while stack:
+        node, parent, side, depth = stack.pop()
+        max_depth = max(max_depth, depth)
+        index = len(fields)
+        if parent >= 0:
+            (lefts if side == 'left' else rights)[parent] = index
+        children = _children(node, 'Node')
+        fields.append(None)
+        thresholds.append(0.0)
+        lefts.append(-1)
+        rights.append(-1)
+        values.append(_node_value(node, class_index))
+        if children:
+            if len(children) != 2:
+                raise ValueError('Only binary splits are supported.')
+            predicate = _child(children[0], 'SimplePredicate')
+            if predicate is None:
+                raise ValueError('First child of the node has to carry SimplePredicate.')
+            operator = predicate.get('operator')
+            if operator not in ('lessOrEqual', 'greaterThan'):
+                raise ValueError('Unsupported operator: {}.'.format(operator))
+            fields[index] = predicate.get('field')
+            thresholds[index] = float(predicate.get('value'))
+            first, second = ('left', 'right') if operator == 'lessOrEqual' else ('right', 'left')
+            stack.append((children[1], index, second, depth + 1))
+            stack.append((children[0], index, first, depth + 1))
+    return {
+        'fields': fields,
+        'threshold': np.asarray(thresholds, dtype=np.float64),
+        'left': np.asarray(lefts, dtype=np.intp),
+        'right': np.asarray(rights, dtype=np.intp),
+        'values': np.asarray(values, dtype=np.float64),
+        'max_depth': max_depth
+    }
+
+
+def _node_value(node, class_index):
+    if class_index is None:
+        return float(node.get('score'))
+    counts = np.zeros(len(class_index))
+    for distribution in _children(node, 'ScoreDistribution'):
+        counts[class_index[distribution.get('value')]] = float(distribution.get('recordCount'))
+    total = float(node.get('recordCount', counts.sum()))
+    if total > 0 and counts.any():
+        return counts / total
+    # no distribution available, the score is certain
+    counts[class_index[node.get('score')]] = 1.0
+    return counts
+
+
+def _compile_regression(regression_model, classes):
+    tables = []
+    for table in _children(regression_model, 'RegressionTable'):
+        predictors = [(p.get('name'), float(p.get('coefficient')), float(p.get('exponent', 1)))
+                      for p in _children(table, 'NumericPredictor')]
+        tables.append((table.get('targetCategory'), float(table.get('intercept', 0)), predictors))
+    return Regression(tables, classes, regression_model.get('normalizationMethod', 'none'))
+
+
+def _compile_transformations(model):
+    transformations = []
+    local_transformations = _child(model, 'LocalTransformations')
+    if local_transformations is None:
+        return transformations
+    for derived_field in _children(local_transformations, 'DerivedField'):
+        expression = list(derived_field)[0]
+        field = expression.get('field')
+        if _local(expression.tag) == 'NormContinuous':
+            points = sorted((float(n.get('orig')), float(n.get('norm'))) for n in _children(expression, 'LinearNorm'))
+            transformations.append((derived_field.get('name'), _linear_norm(field, points)))
+        elif _local(expression.tag) == 'NormDiscrete':
+            value = float(expression.get('value'))
+            transformations.append((derived_field.get('name'), lambda env, f=field, v=value: (env[f] == v) * 1.0))
+        else:
+            raise ValueError('Unsupported transformation: {}.'.format(_local(expression.tag)))
+    return transformations
+
+
+def _linear_norm(field, points):
+    origs = np.array([p[0] for p in points])
+    norms = np.array([p[1] for p in points])
+
+    def transform(env):
+        x = env[field]
+        # piecewise linear, outliers are extrapolated from the outermost segments
+        segment = np.clip(np.searchsorted(origs, x) - 1, 0, len(origs) - 2)
+        slope = (norms[segment + 1] - norms[segment]) / (origs[segment + 1] - origs[segment])
+        return norms[segment] + (x - origs[segment]) * slope
+    return transform
+
+
+def _compile_model(model, classes):
+    tag = _local(model.tag)
+    if tag == 'TreeModel':
+        return TreeEnsemble([_compile_tree(model, classes)], classes)
+    if tag == 'RegressionModel':
+        return _compile_regression(model, classes)
+    if tag == 'MiningModel':
+        segmentation = _child(model, 'Segmentation')
+        method = segmentation.get('multipleModelMethod')
+        segments = [[child for child in segment if _local(child.tag) != 'True'][0]
+                    for segment in _children(segmentation, 'Segment')]
+        if method in ('average', 'sum') and all(_local(s.tag) == 'TreeModel' for s in segments):
+            return TreeEnsemble([_compile_tree(s, classes) for s in segments], classes, method)
+        if method == 'modelChain':
+            return ModelChain([(_output_name(s), _compile_model(s, classes if _is_classification(s) else None))
+                               for s in segments])
+        raise ValueError('Unsupported segmentation: {}.'.format(method))
+    raise ValueError('Unsupported model: {}.'.format(tag))
+
+
+def _is_classification(model):
+    return model.get('functionName') == 'classification'
+
+
+def _output_name(model):
+    """
+    :return: name of the output field carrying predicted value of the model (None if there is none)
+    """
+    output = _child(model, 'Output')
+    fields = _children(output, 'OutputField') if output is not None else []
+    names = [f.get('name') for f in fields if f.get('feature', 'predictedValue') == 'predictedValue']
+    return names[0] if names else None
+
+
+def compile_scorer(source):
+    """
+    Compiles PMML document into vectorized scorer.
+
+    :param source: (possibly compressed) file name, file-like object, element tree or root element of the PMML document.
+    :return: Scorer
+    """
+    if isinstance(source, ET.ElementTree):
+        root = source.getroot()
+    elif hasattr(source, 'tag'):
+        root = source
+    else:
+        root = read_pmml(source).getroot()
+    data_dictionary = _child(root, 'DataDictionary')
+    model = [child for child in root if _local(child.tag) in ('TreeModel', 'MiningModel', 'RegressionModel')][0]
+    mining_fields = _children(_child(model, 'MiningSchema'), 'MiningField')
+    feature_names = [f.get('name') for f in mining_fields if f.get('usageType', 'active') == 'active']
+    target_name = [f.get('name') for f in mining_fields if f.get('usageType') == 'predicted'][0]
+    classes = None
+    if model.get('functionName') == 'classification':
+        target = [f for f in _children(data_dictionary, 'DataField') if f.get('name') == target_name][0]
+        classes = [value.get('value') for value in _children(target, 'Value')]
+    return Scorer(feature_names, target_name, classes, _compile_transformations(model), _compile_model(model, classes))
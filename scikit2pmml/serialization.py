@@ -0,0 +1,133 @@
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+import numpy as np
+import re
+
+# characters which ElementTree escapes in attribute values
+ATTRIBUTE_SPECIALS = re.compile('[&<>"\n\r\t]')
+
+XML_DECLARATION = b"<?xml version='1.0' encoding='utf-8'?>\n"
+# number of serialized tags joined into one chunk by iterserialize
+CHUNK_TAGS = 10000
+
+
+def _escape_text(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def iterserialize(element):
+    """
+    Serializes element exactly as ElementTree.write does within the whole document, walking it with explicit stack
+    (ElementTree recurses), so that arbitrarily deep trees are serialized without hitting the recursion limit.
+
+    :param element: element to be serialized (including all its children).
+    :return: generator of UTF-8 encoded bytes without XML declaration
+    """
+    pieces = []
+    stack = [(element, False)]
+    while stack:
+        elem, closing = stack.pop()
+        if closing:
+            pieces.append('</{}>'.format(elem.tag))
+        else:
+            attributes = ''.join(' {}="{}"'.format(key, escape_attribute(value)) for key, value in elem.items())
+            if elem.text or len(elem):
+                pieces.append('<{}{}>'.format(elem.tag, attributes))
+                if elem.text:
+                    pieces.append(_escape_text(elem.text))
+                stack.append((elem, True))
+                stack.extend((child, False) for child in reversed(elem))
+                continue
+            pieces.append('<{}{} />'.format(elem.tag, attributes))
+        if elem.tail:
+            pieces.append(_escape_text(elem.tail))
+        if len(pieces) >= CHUNK_TAGS:
+            yield ''.join(pieces).encode('utf-8')
+            pieces = []
+    yield ''.join(pieces).encode('utf-8')
+
+
+def tostring(element):
+    """
+    Serializes element exactly as ElementTree.write does within the whole document (see iterserialize).
+
+    :param element: element to be serialized (including all its children).
+    :return: UTF-8 encoded bytes without XML declaration
+    """
+    return b''.join(iterserialize(element))
+
+
+def start_tag(element):
+    """
+    Serializes opening tag (including attributes) of an element which has neither text nor children.
+
+    :param element: empty element whose opening tag should be written.
+    :return: UTF-8 encoded bytes
+    """
+    return tostring(element)[:-len(b' />')] + b'>'
+
+
+def end_tag(tag):
+    """
+    Serializes closing tag.
+
+    :param tag: name of the element.
+    :return: UTF-8 encoded bytes
+    """
+    return '</{}>'.format(tag).encode('utf-8')
+
+
+def escape_attribute(value):
+    """
+    Escapes attribute value exactly as ElementTree does.
+
+    :param value: attribute value.
+    :return: escaped string
+    """
+    if not ATTRIBUTE_SPECIALS.search(value):
+        return value
+    serialized = ET.tostring(ET.Element('_', {'a': value}), encoding='unicode')
+    return serialized[len('<_ a="'):-len('" />')]
+
+
+def _format_flat(flat, compact):
+    """
+    :return: array of strings (objects) formatted from 1-D array of numbers (see format_numbers)
+    """
+    strings = np.empty(flat.shape, dtype=object)
+    if compact:
+        integral = np.isfinite(flat) & (np.abs(flat) < 1e15)
+        integral[integral] = flat[integral] == np.round(flat[integral])
+        strings[integral] = flat[integral].astype(np.int64).astype(str)
+        strings[~integral] = flat[~integral].astype(str)
+    else:
+        strings[:] = flat.astype(str)
+    return strings
+
+
+def format_numbers(values, compact=False, canonical=False):
+    """
+    Formats numbers in one batch as shortest strings which round-trip to the same float (as str does).
+
+    :param values: 1-D or 2-D array of numbers.
+    :param compact: if True then integral values are written without trailing '.0'.
+    :param canonical: if True then numbers are formatted as float64 whatever their dtype is and negative zero as zero.
+    :return: (nested) list of strings
+    """
+    values = np.asarray(values)
+    if canonical:
+        values = values.astype(np.float64) + 0.0
+    flat = values.ravel()
+    if flat.dtype.kind == 'f' and flat.size:
+        # tree arrays repeat the same numbers a lot (class counts, thresholds of leaves...), so every distinct value
+        # is formatted once - compared bitwise to keep negative zero apart from zero
+        _, first, inverse = np.unique(flat.view('u{}'.format(flat.itemsize)), return_index=True, return_inverse=True)
+        strings = _format_flat(flat[first], compact)[inverse.reshape(-1)].tolist()
+    else:
+        strings = _format_flat(flat, compact).tolist()
+    if values.ndim == 2:
+        n = values.shape[1]
+        return [strings[i:i + n] for i in range(0, len(strings), n)]
+    return strings
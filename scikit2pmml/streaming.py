@@ -0,0 +1,110 @@
+"""
+Export as iterator of encoded chunks, e.g. for sending PMML in HTTP response while it is being generated. The chunks are
+produced only when asked for, so that slow consumer throttles the export and the memory of one export stays bounded by
+the largest fragment (header, data dictionary, tree...) no matter the size of the document.
+"""
+import asyncio
+
+from scikit2pmml.document import PMMLDocument
+
+# fragments smaller than this are merged into one chunk (e.g. thousands of small trees of gradient boosting)
+CHUNK_SIZE = 1 << 16
+
+
+def coalesce(fragments, chunk_size=CHUNK_SIZE):
+    """
+    Merges small fragments into chunks of at least chunk_size bytes (except the last one), the first fragment
+    (declaration and header) is yielded as it is, so that the first byte is sent right away. Fragments are never split.
+
+    :param fragments: iterable of bytes.
+    :param chunk_size: minimal size of the chunk.
+    :return: generator of bytes
+    """
+    fragments = iter(fragments)
+    for fragment in fragments:
+        yield fragment
+        break
+    buffered, size = [], 0
+    for fragment in fragments:
+        buffered.append(fragment)
+        size += len(fragment)
+        if size >= chunk_size:
+            yield b''.join(buffered)
+            buffered, size = [], 0
+    if buffered:
+        yield b''.join(buffered)
+
+
+def iter_pmml(estimator, transformer=None, chunk_size=CHUNK_SIZE, **kwargs):
+    """
+    Exports sklearn model as PMML yielded in UTF-8 encoded chunks as the header, data dictionary and the model (segment
+    by segment for ensembles) are serialized. The joined chunks are identical to the streamed export. Unsupported model
+    raises TypeError right away, before any chunk is produced.
+
+    :param estimator: sklearn model to be exported as PMML.
+    :param transformer: if provided then scaling is applied to data fields.
+    :param chunk_size: smaller fragments are merged into chunks of at least this size.
+    :param kwargs: params of the export - see documentation for details.
+    :return: generator of bytes
+    """
+    pmml = PMMLDocument(estimator, transformer, **kwargs)
+    return coalesce(pmml.stream(), chunk_size)
+
+
+class AsyncPMMLIterator:
+    """
+    Asynchronous counterpart of iter_pmml for asyncio servers - the export runs in executor (thread pool of the loop by
+    default), so that the event loop is not blocked. Next chunk is prepared while the current one is being sent, but no
+    further, which bounds the memory and lets slow client throttle the export. Digest and size of the document are
+    available in pmml once the iteration finishes:
+
+        async for chunk in AsyncPMMLIterator(forest, n_jobs=4):
+            await response.write(chunk)
+
+    :param estimator: sklearn model to be exported as PMML.
+    :param transformer: if provided then scaling is applied to data fields.
+    :param chunk_size: smaller fragments are merged into chunks of at least this size.
+    :param executor: concurrent.futures executor running the export (thread based - the export is generator).
+    :param kwargs: params of the export - see documentation for details.
+    """
+
+    def __init__(self, estimator, transformer=None, chunk_size=CHUNK_SIZE, executor=None, **kwargs):
+        self.pmml = PMMLDocument(estimator, transformer, **kwargs)
+        self.chunks = coalesce(self.pmml.stream(), chunk_size)
+        self.executor = executor
+        self.pending = None
+
+    def _next(self):
+        # called from the coroutines only, None marks the end (StopIteration cannot be passed through future)
+        return asyncio.get_running_loop().run_in_executor(self.executor, next, self.chunks, None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.pending is None:
+            self.pending = self._next()
+        chunk = await self.pending
+        self.pending = None
+        if chunk is None:
+            raise StopAsyncIteration
+        self.pending = self._next()
+        return chunk
+
+    async def aclose(self):
+        """
+        Stops the export (e.g. when the client disconnects) and releases its resources (e.g. worker processes).
+        """
+        if self.pending is not None:
+            try:
+                await self.pending
+            except Exception:
+                pass
+            self.pending = None
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.chunks.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
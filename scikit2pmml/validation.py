@@ -0,0 +1,134 @@
+"""
+Validation of PMML documents against the XSD schemas of PMML (shipped with the package, requires lxml). Documents are
+validated incrementally as they are parsed (or written) and the validated elements are dropped right away, so that
+even huge documents are validated in constant memory.
+"""
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+import functools
+import os
+from scikit2pmml.files import CHUNK_SIZE, ChunkedWriter, open_source
+from scikit2pmml.serialization import iterserialize
+
+SCHEMAS = {'4.1': 'pmml-4-1.xsd', '4.2': 'pmml-4-2.xsd', '4.3': 'pmml-4-3.xsd'}
+SCHEMA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'xsd')
+# elements dropped once validated (along with their children) - the repeated ones, the rest is small
+DROPPED = ('{*}Node', '{*}Segment', '{*}DataField', '{*}MiningField', '{*}DerivedField', '{*}NumericPredictor')
+
+
+def _etree():
+    try:
+        from lxml import etree
+    except ImportError:
+        raise ImportError("Install lxml package to validate PMML.")
+    return etree
+
+
+@functools.lru_cache(maxsize=None)
+def compiled_schema(version):
+    """
+    Compiles schema of the PMML version, compiled schemas are cached.
+
+    :param version: PMML version (e.g. 4.2).
+    :return: lxml.etree.XMLSchema
+    """
+    if version not in SCHEMAS:
+        raise ValueError('No schema of PMML {}, use one of {}.'.format(version, ', '.join(sorted(SCHEMAS))))
+    etree = _etree()
+    return etree.XMLSchema(etree.parse(os.path.join(SCHEMA_DIRECTORY, SCHEMAS[version])))
+
+
+class Validator:
+    """
+    Validates document fed piece by piece (e.g. while it is written), elements are discarded once validated. Invalid
+    document raises ValueError as soon as the invalid part is fed.
+
+    :param version: PMML version, taken from the version attribute of the root element when None.
+    """
+
+    def __init__(self, version=None):
+        self.etree = _etree()
+        self.version = version
+        self.parser = None
+        self.head = []
+        if version is not None:
+            self._start(version)
+        else:
+            self.sniffer = self.etree.XMLPullParser(events=('start',), huge_tree=True)
+
+    def _start(self, version):
+        self.version = version
+        # huge_tree lifts the limits of libxml2 which deep trees exceed (nesting of 256 levels, 2048 are allowed then)
+        self.parser = self.etree.XMLPullParser(events=('end',), tag=DROPPED, schema=compiled_schema(version),
+                                               huge_tree=True)
+
+    def feed(self, data):
+        """
+        :param data: next piece of UTF-8 encoded document.
+        """
+        if self.parser is None:
+            # the data are held back until the version is read from the root element
+            self.head.append(data)
+            self.sniffer.feed(data)
+            for _, root in self.sniffer.read_events():
+                self._start(root.get('version'))
+                data = b''.join(self.head)
+                self.head = self.sniffer = None
+                break
+            else:
+                return
+        try:
+            self.parser.feed(data)
+        except self.etree.XMLSyntaxError as error:
+            raise ValueError('Invalid PMML {}: {}'.format(self.version, error))
+        self._drop()
+
+    def write(self, data):
+        # file-like interface, so that the validator can be written into
+        self.feed(data)
+        return len(data)
+
+    def _drop(self):
+        for _, element in self.parser.read_events():
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+    def close(self):
+        """
+        Finishes the validation.
+        """
+        if self.parser is None:
+            raise ValueError('Invalid PMML: root element not found.')
+        try:
+            self.parser.close()
+        except self.etree.XMLSyntaxError as error:
+            raise ValueError('Invalid PMML {}: {}'.format(self.version, error))
+        self._drop()
+
+
+def validate(source, version=None):
+    """
+    Validates PMML document against the schema of its version. Files are parsed incrementally (compressed ones are
+    decompressed on the fly) and element trees are serialized into the validator piece by piece, so the document is
+    never held in memory twice.
+
+    :param source: (possibly compressed) file name, binary file-like object, element tree or root element of the PMML
+        document.
+    :param version: PMML version (e.g. 4.2), by default taken from the document.
+    :raises ValueError: when the document is not valid
+    """
+    validator = Validator(version)
+    if isinstance(source, ET.ElementTree) or hasattr(source, 'tag'):
+        root = source.getroot() if isinstance(source, ET.ElementTree) else source
+        sink = ChunkedWriter(validator)
+        for chunk in iterserialize(root):
+            sink.write(chunk)
+        sink.flush()
+    else:
+        with open_source(source) as stream:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                validator.feed(chunk)
+    validator.close()
@@ -13,6 +13,7 @@ setup(
     version='0.0.2',
     packages=['scikit2pmml', 'scikit2pmml.models'],
     include_package_data=True,
+    package_data={'scikit2pmml': ['xsd/*.xsd']},
     license='MIT',
     description='Simple exporter of sklearn models into PMML.',
     long_description=long_description,
@@ -24,6 +25,13 @@ setup(
         'SciPy>= 0.9',
         'scikit-learn>=0.17.1'
     ],
+    extras_require={
+        'zstd': ['zstandard'],
+        'validation': ['lxml']
+    },
+    entry_points={
+        'console_scripts': ['scikit2pmml = scikit2pmml.cli:main']
+    },
     tests_require=[
         'lxml'
     ],
@@ -1,10 +1,21 @@
-import os
+import hashlib
+import io
+from datetime import datetime
+from unittest import mock
 try:
     import xml.etree.cElementTree as ET
 except ImportError:
     import xml.etree.ElementTree as ET
-from lxml import etree
-from scikit2pmml import scikit2pmml
+import numpy as np
+from scikit2pmml import scikit2pmml, validate, estimate as scikit2pmml_estimate
+from scikit2pmml.scoring import compile_scorer
+
+
+def strip_header(document):
+    """
+    :return: serialized document without the header (which holds the timestamp)
+    """
+    return document[document.index(b'</Header>'):]
 
 
 class GenericModelMixin:
@@ -38,28 +49,129 @@ class GenericModelMixin:
         else:
             self.assertEqual(len(continuous_fields), self.num_inputs + 1, 'Correct number of continuous fields.')
 
+    def test_stream(self):
+        streamed, written = io.BytesIO(), io.BytesIO()
+        with mock.patch('scikit2pmml.document.datetime') as clock:
+            clock.now.return_value = datetime(2016, 1, 1)
+            scikit2pmml(self.model, file=streamed, stream=True)
+            scikit2pmml(self.model, file=written)
+        self.assertEqual(streamed.getvalue(), written.getvalue(), 'Streamed document is identical.')
+
+    def test_deterministic(self):
+        first, second = io.BytesIO(), io.BytesIO()
+        digest = scikit2pmml(self.model, file=first, stream=True, deterministic=True)
+        self.assertEqual(scikit2pmml(self.model, file=second, stream=True, deterministic=True), digest)
+        self.assertEqual(first.getvalue(), second.getvalue(), 'Repeated export is byte-identical.')
+        self.assertEqual(hashlib.sha256(first.getvalue()).hexdigest(), digest, 'Digest of the written document.')
+        self.assertEqual(scikit2pmml(self.model, stream=True, deterministic=True), digest, 'Digest without file.')
+        stamped = scikit2pmml(self.model, timestamp='2016-01-01 00:00:00', deterministic=True)
+        self.assertEqual(stamped.find('Header/Timestamp').text, '2016-01-01 00:00:00', 'Timestamp of the caller.')
+
+    def test_estimate(self):
+        estimate = scikit2pmml_estimate(self.model, timestamp='2016-01-01 00:00:00', true_last=True)
+        profiles = [(estimate.default, {'true_last': True}),
+                    (estimate.compact, {'true_last': True, 'compact': True, 'record_counts': False})]
+        for footprint, kwargs in profiles:
+            streamed = io.BytesIO()
+            scikit2pmml(self.model, file=streamed, stream=True, timestamp='2016-01-01 00:00:00', **kwargs)
+            elements = list(ET.fromstring(streamed.getvalue()).iter())
+            self.assertEqual(footprint.nodes, sum(e.tag.endswith('}Node') for e in elements), 'Number of nodes.')
+            self.assertEqual(footprint.elements, len(elements), 'Number of elements.')
+            # xmlns is not parsed as attribute
+            self.assertEqual(footprint.attributes, sum(len(e.attrib) for e in elements) + 1, 'Number of attributes.')
+            # lengths of the numbers are extrapolated from sample on large models
+            self.assertAlmostEqual(footprint.size, len(streamed.getvalue()), delta=len(streamed.getvalue()) / 100)
+        trees = [e.tree_ for e in np.ravel(getattr(self.model, 'estimators_', [self.model])) if hasattr(e, 'tree_')]
+        self.assertEqual(estimate.default.depth, max([tree.max_depth for tree in trees], default=0), 'Depth of trees.')
+
     def test_model(self):
         raise NotImplementedError()
 
 
 class SchemaValidationMixin:
 
-    @staticmethod
-    def _validate_against_schema(schema, pmml):
-        with open(schema, 'r') as f:
-            schema_root = etree.XML(f.read())
-        schema = etree.XMLSchema(schema_root)
-        parser = etree.XMLParser(schema=schema)
-        etree.fromstring(ET.tostring(pmml.getroot(), encoding='utf-8', method='xml'), parser)
+    def test_backends(self):
+        with mock.patch('scikit2pmml.document.datetime') as clock:
+            clock.now.return_value = datetime(2016, 1, 1)
+            expected = ET.canonicalize(ET.tostring(scikit2pmml(self.model).getroot()))
+            for backend in ['bytes', 'lxml', 'etree']:
+                streamed = io.BytesIO()
+                scikit2pmml(self.model, file=streamed, stream=True, backend=backend)
+                self.assertEqual(ET.canonicalize(streamed.getvalue()), expected, 'Equivalent output.')
+                streamed.seek(0)
+                validate(streamed, '4.2')
 
     def test_schema_4_1(self):
-        tree = scikit2pmml(estimator=self.model, pmml_version='4.1')
-        self._validate_against_schema('{}/xsd/pmml-4-1.xsd'.format(os.path.dirname(os.path.abspath(__file__))), tree)
+        validate(scikit2pmml(estimator=self.model, pmml_version='4.1'), '4.1')
 
     def test_schema_4_2(self):
-        tree = scikit2pmml(estimator=self.model, pmml_version='4.2')
-        self._validate_against_schema('{}/xsd/pmml-4-2.xsd'.format(os.path.dirname(os.path.abspath(__file__))), tree)
+        validate(scikit2pmml(estimator=self.model, pmml_version='4.2'), '4.2')
 
     def test_schema_4_3(self):
-        tree = scikit2pmml(estimator=self.model, pmml_version='4.3')
-        self._validate_against_schema('{}/xsd/pmml-4-3.xsd'.format(os.path.dirname(os.path.abspath(__file__))), tree)
+        validate(scikit2pmml(estimator=self.model, pmml_version='4.3'), '4.3')
+
+    def test_inline_validation(self):
+        self.assertIsNotNone(scikit2pmml(self.model, stream=True, validate=True, pmml_version='4.3'))
+
+
+class ChildOrderMixin:
+
+    def node_traffic(self, X):
+        trees = getattr(self.model, 'estimators_', [self.model])
+        traffic = [np.asarray(tree.decision_path(X).sum(axis=0)).ravel() for tree in trees]
+        return traffic if hasattr(self.model, 'estimators_') else traffic[0]
+
+    def _assert_ordered(self, pmml, weight):
+        for node in pmml.iter('Node'):
+            children = node.findall('Node')
+            if children:
+                self.assertGreaterEqual(weight(children[0]), weight(children[1]), 'More frequent child first.')
+                self.assertIsNotNone(children[1].find('True'), 'Last child has True predicate.')
+
+    def test_child_order(self):
+        X = self.dataset.data
+        default = compile_scorer(scikit2pmml(self.model)).predict_proba(X)
+        pmml = scikit2pmml(self.model, child_order='records', true_last=True)
+        self._assert_ordered(pmml, lambda node: float(node.attrib['recordCount']))
+        np.testing.assert_allclose(compile_scorer(pmml).predict_proba(X), default)
+        streamed = self._stream(child_order='records', true_last=True)
+        self.assertEqual(ET.tostring(pmml.getroot())[-1000:], streamed[-1000:], 'Streamed alike.')
+
+    def test_traffic_order(self):
+        X = self.dataset.data[::-1][:30]
+        traffic = self.node_traffic(X)
+        pmml = scikit2pmml(self.model, child_order='traffic', node_traffic=traffic)
+        trees = traffic if isinstance(traffic, list) else [traffic]
+        for tree, counts in zip(pmml.iter('TreeModel'), trees):
+            for node in tree.iter('Node'):
+                children = node.findall('Node')
+                if children:
+                    first, second = [counts[int(child.attrib['id'])] for child in children]
+                    self.assertGreaterEqual(first, second, 'More frequent child first.')
+        np.testing.assert_allclose(compile_scorer(pmml).predict_proba(self.dataset.data),
+                                   compile_scorer(scikit2pmml(self.model)).predict_proba(self.dataset.data))
+
+    def _stream(self, **kwargs):
+        streamed = io.BytesIO()
+        scikit2pmml(self.model, file=streamed, stream=True, **kwargs)
+        return streamed.getvalue()
+
+
+class CompactOutputMixin:
+
+    def test_compact(self):
+        default = scikit2pmml(self.model)
+        compact = scikit2pmml(self.model, compact=True, record_counts=False)
+        self.assertLess(len(ET.tostring(compact.getroot())), len(ET.tostring(default.getroot())), 'Smaller document.')
+        for node in compact.iter('Node'):
+            self.assertNotIn('recordCount', node.attrib)
+            if node.find('Node') is not None:
+                self.assertIsNone(node.find('ScoreDistribution'), 'Only leaves carry score distributions.')
+            for distribution in node.findall('ScoreDistribution'):
+                self.assertNotEqual(float(distribution.attrib['recordCount']), 0, 'No zero counts.')
+        X = self.dataset.data
+        np.testing.assert_allclose(compile_scorer(compact).predict_proba(X), compile_scorer(default).predict_proba(X))
+
+    def test_compact_schema(self):
+        for version in ['4.1', '4.2', '4.3']:
+            validate(scikit2pmml(estimator=self.model, pmml_version=version, compact=True, record_counts=False))
@@ -1,10 +1,5 @@
-try:
-    import xml.etree.cElementTree as ET
-except ImportError:
-    import xml.etree.ElementTree as ET
 import unittest
-from lxml import etree
-from scikit2pmml import scikit2pmml
+from scikit2pmml import scikit2pmml, validate
 from sklearn.datasets import load_iris, load_breast_cancer, load_boston
 import numpy as np
 from sklearn.tree import DecisionTreeClassifier, ExtraTreeClassifier
@@ -14,25 +9,14 @@ from sklearn.linear_model import LinearRegression, LogisticRegression
 
 class SchemaValidationTestCase:
 
-    @staticmethod
-    def _validate_against_schema(schema, pmml):
-        with open(schema, 'r') as f:
-            schema_root = etree.XML(f.read())
-        schema = etree.XMLSchema(schema_root)
-        parser = etree.XMLParser(schema=schema)
-        etree.fromstring(ET.tostring(pmml.getroot(), encoding='utf-8', method='xml'), parser)
-
     def test_schema_4_1(self):
-        tree = scikit2pmml(estimator=self.model, pmml_version='4.1')
-        self._validate_against_schema('xsd/pmml-4-1.xsd', tree)
+        validate(scikit2pmml(estimator=self.model, pmml_version='4.1'), '4.1')
 
     def test_schema_4_2(self):
-        tree = scikit2pmml(estimator=self.model, pmml_version='4.2')
-        self._validate_against_schema('xsd/pmml-4-2.xsd', tree)
+        validate(scikit2pmml(estimator=self.model, pmml_version='4.2'), '4.2')
 
     def test_schema_4_3(self):
-        tree = scikit2pmml(estimator=self.model, pmml_version='4.3')
-        self._validate_against_schema('xsd/pmml-4-3.xsd', tree)
+        validate(scikit2pmml(estimator=self.model, pmml_version='4.3'), '4.3')
 
 
 class DecisionTreeClassifierTestCase(SchemaValidationTestCase, unittest.TestCase):
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.svm import SVC
+from scikit2pmml import scikit2pmml_many
+from scikit2pmml.files import read_pmml
+
+
+class BatchExportMixin:
+
+    n_jobs = 1
+
+    def setUp(self):
+        iris = load_iris()
+        self.models = [DecisionTreeClassifier(max_depth=d).fit(iris.data, iris.target) for d in range(1, 6)]
+        self.models.append(RandomForestClassifier(n_estimators=3).fit(iris.data, iris.target))
+        self.models.insert(2, SVC().fit(iris.data, iris.target))
+
+    def test_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            tasks = [(model, None, {'compact': True}, os.path.join(directory, '{}.pmml.gz'.format(i)))
+                     for i, model in enumerate(self.models)]
+            batch = scikit2pmml_many(iter(tasks), n_jobs=self.n_jobs, window=2)
+            results = sorted(batch)
+            self.assertListEqual([r.index for r in results], list(range(len(self.models))), 'All models reported.')
+            self.assertIn('TypeError', results[2].error, 'Error of the bad model reported.')
+            self.assertEqual((batch.exported, batch.failed), (len(self.models) - 1, 1), 'Others exported.')
+            for result in results[:2] + results[3:]:
+                self.assertIsNone(result.error)
+                root = read_pmml(result.destination).getroot()
+                self.assertRegex(root[-1].tag, '(TreeModel|MiningModel)$', 'Readable document.')
+            self.assertGreater(batch.models_per_second, 0, 'Throughput reported.')
+
+    def test_documents(self):
+        results = list(scikit2pmml_many(((model, None, {}, None) for model in self.models[:2]), n_jobs=self.n_jobs))
+        for result in results:
+            self.assertTrue(result.document.startswith(b'<?xml'), 'Document returned.')
+            self.assertEqual(len(result.document), result.size, 'Size of the document.')
+
+
+class SerialBatchExportTestCase(BatchExportMixin, unittest.TestCase):
+    pass
+
+
+class ParallelBatchExportTestCase(BatchExportMixin, unittest.TestCase):
+
+    n_jobs = 2
@@ -0,0 +1,91 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import joblib
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from scikit2pmml.cli import main
+from scikit2pmml.files import read_pmml
+
+
+class CommandLineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        iris = load_iris()
+        self.directory = tempfile.mkdtemp()
+        self.models = os.path.join(self.directory, 'models')
+        self.output = os.path.join(self.directory, 'pmml')
+        os.makedirs(os.path.join(self.models, 'nested'))
+        joblib.dump(RandomForestClassifier(n_estimators=3).fit(iris.data, iris.target),
+                    os.path.join(self.models, 'forest.joblib'))
+        joblib.dump(LogisticRegression(max_iter=1000).fit(iris.data, iris.target),
+                    os.path.join(self.models, 'nested', 'linear.pkl'))
+        with open(os.path.join(self.models, 'forest.json'), 'w') as f:
+            json.dump({'feature_names': iris.feature_names, 'target_values': list(iris.target_names)}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_main(self, *args):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            status = main(list(args))
+        return status, out.getvalue()
+
+    def test_directory(self):
+        status, out = self.run_main(self.models, '--output-dir', self.output, '--extension', '.pmml.gz', '-j', '2')
+        self.assertEqual(status, 0)
+        self.assertIn('Exported 2 models (0 failed, 0 skipped)', out)
+        forest = read_pmml(os.path.join(self.output, 'forest.pmml.gz')).getroot()
+        names = [field.attrib['name'] for field in forest.findall('.//{*}DataField')]
+        self.assertIn('sepal length (cm)', names, 'Feature names from the sidecar.')
+        self.assertIn('setosa', [value.attrib['value'] for value in forest.findall('.//{*}Value')], 'Target values.')
+        self.assertTrue(os.path.exists(os.path.join(self.output, 'nested', 'linear.pmml.gz')), 'Subdirectory kept.')
+
+        status, out = self.run_main(self.models, '--output-dir', self.output, '--extension', '.pmml.gz', '-j', '1')
+        self.assertIn('Exported 0 models (0 failed, 2 skipped)', out, 'Up-to-date outputs skipped.')
+        later = time.time() + 10
+        os.utime(os.path.join(self.models, 'forest.json'), (later, later))
+        status, out = self.run_main(self.models, '--output-dir', self.output, '--extension', '.pmml.gz', '-j', '1')
+        self.assertIn('Exported 1 models (0 failed, 1 skipped)', out, 'Changed sidecar exported again.')
+
+    def test_manifest(self):
+        manifest = os.path.join(self.models, 'manifest.txt')
+        with open(manifest, 'w') as f:
+            f.write('# models to convert\nnested/linear.pkl\nmissing.joblib\n')
+        status, out = self.run_main('--manifest', manifest, '-j', '1', '--no-mmap', '--compact')
+        self.assertEqual(status, 1, 'Failure reported by exit status.')
+        self.assertIn('missing.pmml failed', out)
+        self.assertTrue(os.path.exists(os.path.join(self.models, 'nested', 'linear.pmml')), 'Output next to model.')
+
+    def test_same_names(self):
+        os.makedirs(os.path.join(self.models, 'other'))
+        shutil.copy(os.path.join(self.models, 'nested', 'linear.pkl'), os.path.join(self.models, 'other'))
+        status, out = self.run_main(self.models, '--output-dir', self.output, '-j', '1')
+        self.assertEqual(status, 0)
+        self.assertIn('Exported 3 models (0 failed, 0 skipped)', out)
+        for directory in ['nested', 'other']:
+            self.assertTrue(os.path.exists(os.path.join(self.output, directory, 'linear.pmml')), 'Both exported.')
+        status, out = self.run_main(os.path.join(self.models, 'nested', 'linear.pkl'),
+                                    os.path.join(self.models, 'other', 'linear.pkl'), '--output-dir', self.output,
+                                    '-j', '1', '--force')
+        self.assertEqual(status, 1, 'Colliding outputs reported by exit status.')
+        self.assertIn('failed (duplicate output)', out)
+        self.assertIn('Exported 1 models (1 failed, 0 skipped)', out)
+
+    def test_failed_export(self):
+        with open(os.path.join(self.models, 'forest.json'), 'w') as f:
+            json.dump({'child_order': 'traffic'}, f)
+        for _ in range(2):
+            status, out = self.run_main(self.models, '--output-dir', self.output, '-j', '1')
+            self.assertEqual(status, 1, 'Failure reported again, not skipped as up to date.')
+            self.assertIn('forest.pmml failed', out)
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'forest.pmml')), 'No partial output.')
+        self.assertListEqual(sorted(os.listdir(self.output)), ['nested'], 'Temporary file removed.')
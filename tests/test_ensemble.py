@@ -1,14 +1,81 @@
+import io
+import tempfile
 import unittest
 
-from sklearn.datasets import load_iris
-from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier
-from scikit2pmml import scikit2pmml
+import numpy as np
+from sklearn.datasets import load_breast_cancer, load_diabetes, load_iris
+from sklearn.ensemble import (RandomForestClassifier, ExtraTreesClassifier, GradientBoostingClassifier,
+                              GradientBoostingRegressor)
+from scikit2pmml import scikit2pmml, FragmentCache, DiskFragmentCache, Instrumentation
+from scikit2pmml.scoring import compile_scorer
 
 from tests.generic import GenericModelMixin
 from tests.generic import SchemaValidationMixin
+from tests.generic import CompactOutputMixin
+from tests.generic import ChildOrderMixin
+from tests.generic import strip_header
 
 
-class RandomForestClassifierTestCase(GenericModelMixin, SchemaValidationMixin, unittest.TestCase):
+class ParallelSegmentationMixin:
+
+    def test_parallel(self):
+        serial, parallel = io.BytesIO(), io.BytesIO()
+        scikit2pmml(self.model, file=serial, stream=True)
+        scikit2pmml(self.model, file=parallel, stream=True, n_jobs=2)
+        self.assertEqual(strip_header(parallel.getvalue()), strip_header(serial.getvalue()), 'Identical output.')
+        pmml = scikit2pmml(self.model, n_jobs=2)
+        ids = [segment.attrib['id'] for segment in pmml.findall('MiningModel/Segmentation/Segment')]
+        self.assertListEqual(ids, [str(i) for i in range(len(self.model.estimators_))], 'Segments in order.')
+
+
+class SegmentCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dataset = load_iris()
+        self.model = RandomForestClassifier(n_estimators=5, warm_start=True, random_state=0)
+        self.model.fit(self.dataset.data, self.dataset.target)
+
+    def _export(self, **kwargs):
+        document = io.BytesIO()
+        scikit2pmml(self.model, file=document, stream=True, **kwargs)
+        return strip_header(document.getvalue())
+
+    def _check_warm_start(self, cache):
+        instrumentation = Instrumentation()
+        self.assertEqual(self._export(segment_cache=cache), self._export(), 'Identical output.')
+        self.assertEqual(len(cache), 5, 'All trees cached.')
+        self.model.set_params(n_estimators=7)
+        self.model.fit(self.dataset.data, self.dataset.target)
+        self.assertEqual(self._export(segment_cache=cache, instrumentation=instrumentation), self._export(),
+                         'Cached trees are spliced in.')
+        self.assertEqual(instrumentation.counters['cache_hits'], 5, 'Only new trees serialized.')
+        self.assertNotEqual(self._export(segment_cache=cache, feature_names=['a', 'b', 'c', 'd']), self._export(),
+                            'Naming is part of the key.')
+
+    def test_memory(self):
+        self._check_warm_start(FragmentCache())
+
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self._check_warm_start(DiskFragmentCache(directory))
+            self.assertEqual(len(DiskFragmentCache(directory)), 14, 'Cache persists.')
+
+    def test_backends(self):
+        cache = FragmentCache()
+        self._export(segment_cache=cache, backend='lxml', deterministic=True)
+        self.assertEqual(self._export(segment_cache=cache, deterministic=True), self._export(deterministic=True),
+                         'Segments of other backend are not reused.')
+        self.assertEqual(len(cache), 10, 'Backend is part of the key.')
+
+    def test_eviction(self):
+        cache = FragmentCache(max_bytes=10000)
+        self._export(segment_cache=cache)
+        self.assertLessEqual(cache.size, 10000, 'Size bounded.')
+        self.assertLess(len(cache), 5, 'Least recently used trees evicted.')
+
+
+class RandomForestClassifierTestCase(GenericModelMixin, SchemaValidationMixin, CompactOutputMixin, ChildOrderMixin,
+                                     ParallelSegmentationMixin, unittest.TestCase):
 
     def setUp(self):
         super().prepare_model(RandomForestClassifier(), load_iris())
@@ -18,8 +85,36 @@ class RandomForestClassifierTestCase(GenericModelMixin, SchemaValidationMixin, u
         trees = pmml.findall('MiningModel/Segmentation/Segment/TreeModel')
         self.assertEqual(len(trees), len(self.model.estimators_), 'Correct number of trees.')
 
+    def test_collapse(self):
+        # exactly balanced xor of the first two features, trees splitting the third one have uniform subtrees
+        X = np.array([[a, b, c] for a in (0, 1) for b in (0, 1) for c in (0, 1)] * 50, dtype=np.float64)
+        y = X[:, 0].astype(int) ^ X[:, 1].astype(int)
+        model = RandomForestClassifier(n_estimators=20, max_depth=2, max_features=1, bootstrap=False, random_state=0)
+        model.fit(X, y)
+        serial, parallel = io.BytesIO(), io.BytesIO()
+        scikit2pmml(model, file=serial, stream=True, collapse='probabilities', deterministic=True)
+        scikit2pmml(model, file=parallel, stream=True, collapse='probabilities', deterministic=True, n_jobs=2)
+        self.assertEqual(parallel.getvalue(), serial.getvalue(), 'Identical output.')
+        self.assertLess(serial.getvalue().count(b'<Node '), sum(tree.tree_.node_count for tree in model.estimators_))
+        scorer = compile_scorer(scikit2pmml(model, collapse='probabilities'))
+        np.testing.assert_allclose(scorer.predict_proba(X), model.predict_proba(X), err_msg='Probabilities unchanged.')
+        np.testing.assert_array_equal(np.argmax(scorer.predict_proba(X), axis=1), model.predict(X), 'Labels unchanged.')
+
+    def test_collapse_labels(self):
+        dataset = load_breast_cancer()
+        model = RandomForestClassifier(n_estimators=10, min_samples_leaf=10, random_state=0)
+        model.fit(dataset.data, dataset.target)
+        node_count = sum(tree.tree_.node_count for tree in model.estimators_)
+        collapsed = len(list(scikit2pmml(model, collapse=True).iter('Node')))
+        self.assertLess(collapsed, node_count * 2 // 3, 'Same-class subtrees collapsed.')
+        pmml = scikit2pmml(model, collapse='probabilities')
+        self.assertLess(collapsed, len(list(pmml.iter('Node'))), 'Equal distributions are rarer than equal labels.')
+        np.testing.assert_allclose(compile_scorer(pmml).predict_proba(dataset.data), model.predict_proba(dataset.data),
+                                   err_msg='Probabilities of forest unchanged.')
+
 
-class ExtraTreesClassifierTestCase(GenericModelMixin, SchemaValidationMixin, unittest.TestCase):
+class ExtraTreesClassifierTestCase(GenericModelMixin, SchemaValidationMixin, CompactOutputMixin, ChildOrderMixin,
+                                   ParallelSegmentationMixin, unittest.TestCase):
 
     def setUp(self):
         super().prepare_model(ExtraTreesClassifier(), load_iris())
@@ -28,3 +123,69 @@ class ExtraTreesClassifierTestCase(GenericModelMixin, SchemaValidationMixin, uni
         pmml = scikit2pmml(self.model)
         trees = pmml.findall('MiningModel/Segmentation/Segment/TreeModel')
         self.assertEqual(len(trees), len(self.model.estimators_), 'Correct number of trees.')
+
+
+class GradientBoostingClassifierTestCase(GenericModelMixin, SchemaValidationMixin, CompactOutputMixin,
+                                         unittest.TestCase):
+
+    def setUp(self):
+        super().prepare_model(GradientBoostingClassifier(n_estimators=20), load_iris())
+
+    def test_model(self):
+        pmml = scikit2pmml(self.model)
+        chain = pmml.findall('MiningModel/Segmentation/Segment')
+        self.assertEqual(len(chain), 4, 'Sum of trees per class and softmax regression.')
+        for segment in chain[:-1]:
+            trees = segment.findall('MiningModel/Segmentation/Segment/TreeModel')
+            self.assertEqual(len(trees), self.model.n_estimators, 'Tree per stage.')
+        self.assertIsNone(pmml.find('.//ScoreDistribution'), 'Regression trees.')
+        np.testing.assert_allclose(compile_scorer(pmml).predict_proba(self.dataset.data),
+                                   self.model.predict_proba(self.dataset.data), atol=1e-12)
+
+    def test_parallel(self):
+        serial, parallel = io.BytesIO(), io.BytesIO()
+        scikit2pmml(self.model, file=serial, stream=True, deterministic=True)
+        scikit2pmml(self.model, file=parallel, stream=True, deterministic=True, n_jobs=2)
+        self.assertEqual(parallel.getvalue(), serial.getvalue(), 'Identical output.')
+
+
+class BinaryGradientBoostingClassifierTestCase(GenericModelMixin, SchemaValidationMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().prepare_model(GradientBoostingClassifier(n_estimators=20, loss='exponential'), load_breast_cancer())
+
+    def test_model(self):
+        pmml = scikit2pmml(self.model)
+        link = pmml.find('MiningModel/Segmentation/Segment/RegressionModel')
+        self.assertEqual(link.attrib['normalizationMethod'], 'logit', 'Logistic link of binary classifier.')
+        np.testing.assert_allclose(compile_scorer(pmml).predict_proba(self.dataset.data),
+                                   self.model.predict_proba(self.dataset.data), atol=1e-12)
+
+    def test_log_loss(self):
+        model = GradientBoostingClassifier(n_estimators=20).fit(self.dataset.data, self.dataset.target)
+        np.testing.assert_allclose(compile_scorer(scikit2pmml(model)).predict_proba(self.dataset.data),
+                                   model.predict_proba(self.dataset.data), atol=1e-12)
+
+
+class GradientBoostingRegressorTestCase(GenericModelMixin, SchemaValidationMixin, ParallelSegmentationMixin,
+                                        unittest.TestCase):
+
+    def setUp(self):
+        super().prepare_model(GradientBoostingRegressor(n_estimators=20, init='zero'), load_diabetes())
+
+    def test_model(self):
+        pmml = scikit2pmml(self.model)
+        self.assertEqual(pmml.find('MiningModel/Segmentation').attrib['multipleModelMethod'], 'sum')
+        np.testing.assert_allclose(compile_scorer(pmml).predict(self.dataset.data),
+                                   self.model.predict(self.dataset.data), rtol=1e-12)
+        self.assertEqual(scikit2pmml(self.model, stream=True, collapse=True, deterministic=True),
+                         scikit2pmml(self.model, stream=True, deterministic=True), 'Nothing to collapse.')
+        default = GradientBoostingRegressor(n_estimators=20).fit(self.dataset.data, self.dataset.target)
+        np.testing.assert_allclose(compile_scorer(scikit2pmml(default)).predict(self.dataset.data),
+                                   default.predict(self.dataset.data), rtol=1e-12)
+
+    def test_init_losses(self):
+        for loss in ['absolute_error', 'huber', 'quantile']:
+            model = GradientBoostingRegressor(n_estimators=20, loss=loss).fit(self.dataset.data, self.dataset.target)
+            np.testing.assert_allclose(compile_scorer(scikit2pmml(model)).predict(self.dataset.data),
+                                       model.predict(self.dataset.data), rtol=1e-12, err_msg=loss)
@@ -0,0 +1,79 @@
+import importlib.util
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from scikit2pmml import scikit2pmml
+from scikit2pmml.files import read_pmml
+from tests.generic import strip_header
+
+
+class CompressedFilesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        iris = load_iris()
+        self.model = RandomForestClassifier(n_estimators=5).fit(iris.data, iris.target)
+        self.directory = tempfile.mkdtemp()
+        buffer = io.BytesIO()
+        scikit2pmml(self.model, file=buffer, stream=True)
+        self.expected = buffer.getvalue()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _assert_round_trip(self, extension, stream):
+        file = os.path.join(self.directory, 'model.pmml{}'.format(extension))
+        scikit2pmml(self.model, file=file, stream=stream)
+        tree = read_pmml(file)
+        trees = tree.findall('{http://www.dmg.org/PMML-4_2}MiningModel/{http://www.dmg.org/PMML-4_2}Segmentation/'
+                             '{http://www.dmg.org/PMML-4_2}Segment')
+        self.assertEqual(len(trees), len(self.model.estimators_), 'Whole document read back.')
+        return file
+
+    def test_plain(self):
+        file = self._assert_round_trip('', stream=True)
+        with open(file, 'rb') as f:
+            content = f.read()
+        self.assertEqual(strip_header(content), strip_header(self.expected), 'Written as is.')
+
+    def test_gzip(self):
+        self._assert_round_trip('.gz', stream=True)
+        self._assert_round_trip('.gz', stream=False)
+
+    def test_gzip_deterministic(self):
+        file = os.path.join(self.directory, 'model.pmml.gz')
+        digest = scikit2pmml(self.model, file=file, stream=True, deterministic=True)
+        with open(file, 'rb') as f:
+            first = f.read()
+        self.assertEqual(scikit2pmml(self.model, file=file, stream=True, deterministic=True), digest)
+        with open(file, 'rb') as f:
+            self.assertEqual(f.read(), first, 'Compressed file is byte-identical too.')
+
+    def test_failed_export(self):
+        file = os.path.join(self.directory, 'model.pmml.gz')
+        scikit2pmml(self.model, file=file, stream=True)
+        with open(file, 'rb') as f:
+            previous = f.read()
+        with self.assertRaises(ValueError):
+            scikit2pmml(self.model, file=file, stream=True, child_order='traffic')
+        with open(file, 'rb') as f:
+            self.assertEqual(f.read(), previous, 'Previous file kept.')
+        self.assertListEqual(os.listdir(self.directory), ['model.pmml.gz'], 'Temporary file removed.')
+
+    def test_xz(self):
+        self._assert_round_trip('.xz', stream=True)
+        self._assert_round_trip('.xz', stream=False)
+
+    @unittest.skipUnless(importlib.util.find_spec('zstandard'), 'zstandard is not installed')
+    def test_zstd(self):
+        self._assert_round_trip('.zst', stream=True)
+
+    def test_stream(self):
+        buffer = io.BytesIO()
+        scikit2pmml(self.model, file=buffer)
+        buffer.seek(0)
+        self.assertEqual(len(read_pmml(buffer).getroot()), 3, 'Header, DataDictionary and MiningModel.')
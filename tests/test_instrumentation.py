@@ -0,0 +1,58 @@
+import io
+import unittest
+
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from scikit2pmml import Instrumentation, InstrumentationAdapter, scikit2pmml
+
+
+class RecordingAdapter(InstrumentationAdapter):
+
+    def __init__(self):
+        self.events = []
+
+    def start_phase(self, name):
+        self.events.append(('start', name))
+
+    def end_phase(self, name, seconds):
+        self.events.append(('end', name))
+
+
+class InstrumentationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        iris = load_iris()
+        self.model = RandomForestClassifier(n_estimators=5).fit(iris.data, iris.target)
+        self.nodes = sum(tree.tree_.node_count for tree in self.model.estimators_)
+
+    def _assert_instrumented(self, instrumentation):
+        phases = ['validation', 'header', 'data_dictionary', 'model']
+        self.assertTrue(set(phases) <= set(instrumentation.timings), 'All phases timed.')
+        segments = ['segment/{}'.format(i) for i in range(len(self.model.estimators_))]
+        self.assertTrue(set(segments) <= set(instrumentation.timings), 'All segments timed.')
+        self.assertEqual(instrumentation.counters['nodes'], self.nodes, 'All nodes counted.')
+
+    def test_document(self):
+        instrumentation = Instrumentation()
+        pmml = scikit2pmml(self.model, instrumentation=instrumentation)
+        self._assert_instrumented(instrumentation)
+        self.assertEqual(instrumentation.counters['elements'], len(list(pmml.getroot().iter())))
+
+    def test_stream(self):
+        instrumentation = Instrumentation()
+        scikit2pmml(self.model, file=io.BytesIO(), stream=True, instrumentation=instrumentation)
+        self._assert_instrumented(instrumentation)
+        document = Instrumentation()
+        scikit2pmml(self.model, instrumentation=document)
+        self.assertEqual(instrumentation.counters['elements'], document.counters['elements'], 'Same counts.')
+
+    def test_progress(self):
+        progress = []
+        scikit2pmml(self.model, file=io.BytesIO(), stream=True, progress=lambda done, total: progress.append(done))
+        self.assertListEqual(progress, list(range(1, len(self.model.estimators_) + 1)))
+
+    def test_adapter(self):
+        adapter = RecordingAdapter()
+        scikit2pmml(self.model, instrumentation=Instrumentation(adapter=adapter), n_jobs=2)
+        self.assertIn(('start', 'segment/0'), adapter.events)
+        self.assertEqual(adapter.events[-1], ('end', 'model'), 'Phases are nested.')
@@ -0,0 +1,111 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.datasets import load_boston, load_breast_cancer, load_iris
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+from scikit2pmml import scikit2pmml, load
+from scikit2pmml.scoring import compile_scorer
+
+
+def export(model, transformer=None, **kwargs):
+    streamed = io.BytesIO()
+    scikit2pmml(model, transformer, file=streamed, stream=True, deterministic=True, **kwargs)
+    streamed.seek(0)
+    return streamed
+
+
+class TreeLoadingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.X, self.y = load_iris(return_X_y=True)
+        self.models = [DecisionTreeClassifier(random_state=0).fit(self.X, self.y),
+                       RandomForestClassifier(n_estimators=10, min_samples_leaf=3, random_state=0).fit(self.X, self.y)]
+
+    def test_round_trip(self):
+        for model in self.models:
+            for kwargs in [{}, {'compact': True, 'record_counts': False},
+                           {'child_order': 'records', 'true_last': True}]:
+                loaded = load(export(model, **kwargs))
+                self.assertEqual(type(loaded), type(model))
+                np.testing.assert_allclose(loaded.predict_proba(self.X), model.predict_proba(self.X))
+                self.assertListEqual(list(loaded.classes_), ['y0', 'y1', 'y2'], 'Classes are the target values.')
+
+    def test_tree_arrays(self):
+        tree, loaded = self.models[0].tree_, load(export(self.models[0], compact=True)).tree_
+        self.assertEqual(loaded.max_depth, tree.max_depth)
+        for name in ['children_left', 'children_right', 'feature', 'n_node_samples', 'value']:
+            np.testing.assert_array_equal(getattr(loaded, name), getattr(tree, name), name)
+        np.testing.assert_allclose(loaded.impurity, tree.impurity)
+        np.testing.assert_array_equal(loaded.threshold[tree.feature >= 0], tree.threshold[tree.feature >= 0])
+
+    def test_re_export(self):
+        for model in self.models:
+            document = export(model).getvalue()
+            self.assertEqual(export(load(io.BytesIO(document))).getvalue(), document, 'Identical document.')
+
+    def test_collapsed(self):
+        pmml = export(self.models[1], collapse=True)
+        # sklearn compares float32 features, the scorer has to see them alike on the thresholds
+        X = self.X.astype(np.float32).astype(np.float64)
+        expected = compile_scorer(scikit2pmml(self.models[1], collapse=True)).predict_proba(X)
+        np.testing.assert_allclose(load(pmml).predict_proba(X), expected)
+
+    def test_compressed_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            file = os.path.join(directory, 'forest.pmml.gz')
+            scikit2pmml(self.models[1], file=file, stream=True)
+            loaded = load(file)
+            np.testing.assert_allclose(loaded.predict_proba(self.X), self.models[1].predict_proba(self.X))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            load(export(GradientBoostingClassifier(n_estimators=3).fit(self.X, self.y)))
+
+
+class RegressionLoadingTestCase(unittest.TestCase):
+
+    def _assert_round_trip(self, model, X, y, transformer=None):
+        model.fit(X if transformer is None else transformer.transform(X), y)
+        loaded = load(export(model, transformer))
+        expected = X if transformer is None else transformer.transform(X)
+        np.testing.assert_allclose(loaded.predict_proba(X), model.predict_proba(expected), atol=1e-12)
+        return loaded
+
+    def test_binary(self):
+        X, y = load_breast_cancer(return_X_y=True)
+        self._assert_round_trip(LogisticRegression(max_iter=5000), X, y)
+        self._assert_round_trip(LogisticRegression(max_iter=5000, multi_class='multinomial'), X, y)
+
+    def test_local_transformations(self):
+        X, y = load_breast_cancer(return_X_y=True)
+        self._assert_round_trip(LogisticRegression(), X, y, StandardScaler().fit(X))
+
+    def test_zero_mean(self):
+        X, y = load_breast_cancer(return_X_y=True)
+        # integers symmetric around zero have mean of exactly zero
+        X = np.column_stack([np.arange(len(y)) - (len(y) - 1) // 2, X])
+        transformer = StandardScaler().fit(X)
+        self.assertEqual(transformer.mean_[0], 0)
+        self._assert_round_trip(LogisticRegression(max_iter=5000), X, y, transformer)
+
+    def test_multiclass(self):
+        X, y = load_iris(return_X_y=True)
+        for multi_class in ['multinomial', 'ovr']:
+            loaded = self._assert_round_trip(LogisticRegression(max_iter=5000, multi_class=multi_class), X, y)
+            self.assertEqual(loaded.multi_class, multi_class)
+
+    def test_linear_regression(self):
+        X, y = load_boston(return_X_y=True)
+        model = LinearRegression().fit(X, y)
+        loaded = load(export(model))
+        np.testing.assert_allclose(loaded.predict(X), model.predict(X))
@@ -0,0 +1,89 @@
+import subprocess
+import sys
+import unittest
+
+from sklearn.datasets import load_iris
+from sklearn.linear_model import LogisticRegressionCV
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+from scikit2pmml import scikit2pmml, register_converter, TreeModel
+from scikit2pmml.registry import class_paths, find_converter, unregister_converter
+
+# seconds, measured as the best of several runs in fresh interpreter (most of it is import of numpy)
+IMPORT_BUDGET = 0.5
+
+IMPORT_SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+import scikit2pmml
+print(time.perf_counter() - start, 'sklearn' in sys.modules, 'scipy' in sys.modules)
+'''
+
+
+class WrappedTree:
+    """
+    Third party estimator exposing fitted sklearn tree.
+    """
+
+    def __init__(self, tree):
+        self.tree_ = tree.tree_
+        self.n_features_ = tree.n_features_in_
+        self.n_classes_ = tree.n_classes_
+
+    def fit(self, X, y):
+        pass
+
+
+class PrunedTree(WrappedTree):
+    """
+    Subclass of the third party estimator.
+    """
+
+
+def convert_wrapped_tree(estimator, pmml):
+    return TreeModel(estimator, pmml, 'classification')
+
+
+class RegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.iris = load_iris()
+
+    def test_import_time(self):
+        runs = []
+        for _ in range(3):
+            output = subprocess.check_output([sys.executable, '-c', IMPORT_SCRIPT]).decode().split()
+            runs.append(float(output[0]))
+            self.assertListEqual(output[1:], ['False', 'False'], 'Neither sklearn nor scipy imported.')
+        self.assertLess(min(runs), IMPORT_BUDGET, 'Import within budget.')
+
+    def test_class_paths(self):
+        self.assertIn('sklearn.tree.DecisionTreeClassifier', class_paths(DecisionTreeClassifier), 'Public path.')
+
+    def test_subclass(self):
+        model = LogisticRegressionCV(cv=2).fit(self.iris.data, self.iris.target == 0)
+        self.assertIsNone(find_converter(model), 'Subclass of supported estimator is not supported.')
+        tree = DecisionTreeClassifier().fit(self.iris.data, self.iris.target)
+        register_converter(WrappedTree, convert_wrapped_tree)
+        try:
+            self.assertIsNone(find_converter(PrunedTree(tree)), 'Exact class only.')
+            register_converter(WrappedTree, convert_wrapped_tree, subclasses=True)
+            self.assertIs(find_converter(PrunedTree(tree)), convert_wrapped_tree, 'Converter of the base class.')
+            self.assertEqual(len(scikit2pmml(PrunedTree(tree)).findall('.//Node')), tree.tree_.node_count)
+        finally:
+            unregister_converter(WrappedTree)
+        self.assertIsNone(find_converter(PrunedTree(tree)), 'Unregistered.')
+
+    def test_unsupported(self):
+        with self.assertRaises(TypeError):
+            scikit2pmml(SVC().fit(self.iris.data, self.iris.target))
+
+    def test_register_converter(self):
+        tree = DecisionTreeClassifier().fit(self.iris.data, self.iris.target)
+        register_converter(WrappedTree, convert_wrapped_tree)
+        try:
+            pmml = scikit2pmml(WrappedTree(tree))
+        finally:
+            unregister_converter(WrappedTree)
+        nodes = pmml.findall('.//Node')
+        self.assertEqual(len(nodes), tree.tree_.node_count, 'Exported by registered converter.')
@@ -1,8 +1,15 @@
 import unittest
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
 
 import numpy as np
-from sklearn.datasets import load_boston, load_breast_cancer
+from sklearn.datasets import load_boston, load_breast_cancer, load_iris
 from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.preprocessing import StandardScaler
+from scikit2pmml import PMMLDocument, scikit2pmml, validate
+from scikit2pmml.scoring import compile_scorer
 
 from tests.generic import GenericModelMixin
 from tests.generic import SchemaValidationMixin
@@ -24,3 +31,103 @@ class LogisticRegressionClassifierTestCase(GenericModelMixin, SchemaValidationMi
 
     def test_model(self):
         pass
+
+    def test_local_transformations(self):
+        transformer = StandardScaler().fit(self.dataset.data)
+        pmml = scikit2pmml(self.model, transformer)
+        derived_fields = pmml.findall('RegressionModel/LocalTransformations/DerivedField')
+        predictors = pmml.findall('RegressionModel/RegressionTable/NumericPredictor')
+        self.assertEqual(len(derived_fields), self.num_inputs, 'One derived field per feature.')
+        self.assertListEqual([p.attrib['name'] for p in predictors], ['{}*'.format(f) for f in self.features])
+        validate(pmml)
+
+    def test_fold_transformer(self):
+        pmml = scikit2pmml(self.model, StandardScaler().fit(self.dataset.data), fold_transformer=True)
+        predictors = pmml.findall('RegressionModel/RegressionTable/NumericPredictor')
+        self.assertIsNone(pmml.find('RegressionModel/LocalTransformations'), 'No derived fields.')
+        self.assertListEqual([p.attrib['name'] for p in predictors], self.features)
+
+    def test_fold_partial_scaler(self):
+        for with_mean, with_std in [(False, True), (True, False), (False, False)]:
+            transformer = StandardScaler(with_mean=with_mean, with_std=with_std).fit(self.dataset.data)
+            model = LogisticRegression(max_iter=5000).fit(transformer.transform(self.dataset.data), self.dataset.target)
+            pmml = scikit2pmml(model, transformer, fold_transformer=True)
+            np.testing.assert_allclose(compile_scorer(pmml).predict_proba(self.dataset.data),
+                                       model.predict_proba(transformer.transform(self.dataset.data)), atol=1e-9,
+                                       err_msg='with_mean={}, with_std={}'.format(with_mean, with_std))
+
+    def test_sparse(self):
+        model = LogisticRegression(penalty='l1', C=0.01, solver='liblinear').fit(self.dataset.data, self.dataset.target)
+        active = np.flatnonzero(model.coef_)
+        pmml = scikit2pmml(model, sparse=True)
+        predictors = pmml.findall('RegressionModel/RegressionTable/NumericPredictor')
+        fields = pmml.findall("DataDictionary/DataField/[@optype='continuous']")
+        mining_fields = pmml.findall("RegressionModel/MiningSchema/MiningField/[@usageType='active']")
+        expected = [self.features[i] for i in active]
+        self.assertLess(len(active), self.num_inputs, 'Some coefficients are zero.')
+        self.assertListEqual([p.attrib['name'] for p in predictors], expected, 'Only non-zero predictors.')
+        self.assertListEqual([f.attrib['name'] for f in fields], expected, 'Pruned data dictionary.')
+        self.assertListEqual([f.attrib['name'] for f in mining_fields], expected, 'Pruned mining schema.')
+        scored = compile_scorer(pmml).predict_proba(self.dataset.data[:, active])
+        np.testing.assert_allclose(scored, model.predict_proba(self.dataset.data), atol=1e-9)
+        model.sparsify()
+        self.assertEqual(ET.tostring(scikit2pmml(model, sparse=True).find('RegressionModel')),
+                         ET.tostring(pmml.find('RegressionModel')), 'Sparse coefficients are exported alike.')
+        self.assertEqual(len(scikit2pmml(model).findall('RegressionModel/RegressionTable/NumericPredictor')),
+                         self.num_inputs, 'Densified without sparse mode.')
+
+    def test_sparse_zero_coefficients(self):
+        model = LogisticRegression(penalty='l1', C=1e-6, solver='liblinear').fit(self.dataset.data, self.dataset.target)
+        self.assertFalse(model.coef_.any(), 'All coefficients are zero.')
+        pmml = scikit2pmml(model, sparse=True)
+        self.assertListEqual(pmml.findall('RegressionModel/RegressionTable/NumericPredictor'), [], 'No predictors.')
+        X = self.dataset.data[:, []]
+        np.testing.assert_allclose(compile_scorer(pmml).predict_proba(X), model.predict_proba(self.dataset.data),
+                                   atol=1e-9)
+
+    def test_binary_multinomial(self):
+        model = LogisticRegression(multi_class='multinomial', max_iter=5000)
+        model.fit(self.dataset.data, self.dataset.target)
+        np.testing.assert_allclose(compile_scorer(scikit2pmml(model)).predict_proba(self.dataset.data),
+                                   model.predict_proba(self.dataset.data), atol=1e-12)
+
+    def test_fragment_cache(self):
+        document = PMMLDocument(self.model, StandardScaler().fit(self.dataset.data))
+        document._validate_inputs()
+        local_transformations = document.serializer.local_transformations
+        self.assertIs(document.serializer.local_transformations, local_transformations, 'Built only once.')
+        document.feature_names = ['f{}'.format(i) for i in range(self.num_inputs)]
+        self.assertIsNot(document.serializer.local_transformations, local_transformations, 'Invalidated.')
+
+
+class MultinomialLogisticRegressionTestCase(GenericModelMixin, SchemaValidationMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().prepare_model(LogisticRegression(max_iter=1000), load_iris())
+
+    def test_model(self):
+        pmml = scikit2pmml(self.model, StandardScaler().fit(self.dataset.data), fold_transformer=True)
+        regression_model = pmml.find('RegressionModel')
+        self.assertEqual(regression_model.attrib['normalizationMethod'], 'softmax')
+        tables = regression_model.findall('RegressionTable')
+        self.assertListEqual([t.attrib['targetCategory'] for t in tables], self.class_names, 'Table per class.')
+        np.testing.assert_allclose(compile_scorer(scikit2pmml(self.model)).predict_proba(self.dataset.data),
+                                   self.model.predict_proba(self.dataset.data), atol=1e-12)
+
+
+class OneVsRestLogisticRegressionTestCase(GenericModelMixin, SchemaValidationMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().prepare_model(LogisticRegression(multi_class='ovr', max_iter=1000), load_iris())
+
+    def test_model(self):
+        transformer = StandardScaler().fit(self.dataset.data)
+        model = LogisticRegression(solver='liblinear')
+        model.fit(transformer.transform(self.dataset.data), self.dataset.target)
+        pmml = scikit2pmml(model, transformer)
+        segments = pmml.findall('MiningModel/Segmentation/Segment')
+        self.assertEqual(len(segments), self.num_outputs + 1, 'Regression per class and normalization.')
+        self.assertEqual(segments[-1].find('RegressionModel').attrib['normalizationMethod'], 'simplemax')
+        np.testing.assert_allclose(compile_scorer(pmml).predict_proba(self.dataset.data),
+                                   model.predict_proba(transformer.transform(self.dataset.data)), atol=1e-12)
+        validate(pmml)
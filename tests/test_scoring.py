@@ -0,0 +1,96 @@
+import io
+import unittest
+
+import numpy as np
+from sklearn.datasets import load_boston, load_breast_cancer, load_iris
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+from scikit2pmml import scikit2pmml
+from scikit2pmml.scoring import compile_scorer
+
+
+class ScoringParityMixin:
+
+    options = {}
+
+    def prepare_model(self, model, dataset, transformer=None):
+        # sklearn trees compare single precision features, hence the data are representable as float32
+        self.X = dataset.data.astype(np.float32).astype(np.float64)
+        self.transformer = transformer.fit(self.X) if transformer else None
+        self.model = model.fit(self.transformer.transform(self.X) if transformer else self.X, dataset.target)
+
+    def expected(self):
+        X = self.transformer.transform(self.X) if self.transformer else self.X
+        return self.model.predict_proba(X) if hasattr(self.model, 'predict_proba') else self.model.predict(X)
+
+    def test_parity(self):
+        scorer = compile_scorer(scikit2pmml(self.model, self.transformer, **self.options))
+        scored = scorer.predict_proba(self.X) if scorer.classes else scorer.predict(self.X)
+        np.testing.assert_allclose(scored, self.expected(), atol=1e-9)
+
+    def test_parity_from_file(self):
+        buffer = io.BytesIO()
+        scikit2pmml(self.model, self.transformer, file=buffer, stream=True, **self.options)
+        buffer.seek(0)
+        scorer = compile_scorer(buffer)
+        scored = scorer.predict_proba(self.X) if scorer.classes else scorer.predict(self.X)
+        np.testing.assert_allclose(scored, self.expected(), atol=1e-9)
+
+
+class DecisionTreeClassifierScoringTestCase(ScoringParityMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.prepare_model(DecisionTreeClassifier(), load_iris())
+
+    def test_predict(self):
+        scorer = compile_scorer(scikit2pmml(self.model))
+        expected = np.asarray(['y{}'.format(c) for c in self.model.predict(self.X)])
+        np.testing.assert_array_equal(scorer.predict(self.X), expected)
+
+
+class RandomForestClassifierScoringTestCase(ScoringParityMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.prepare_model(RandomForestClassifier(n_estimators=20), load_iris())
+
+
+class ExtraTreesClassifierScoringTestCase(ScoringParityMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.prepare_model(ExtraTreesClassifier(n_estimators=20), load_breast_cancer())
+
+
+class LogisticRegressionScoringTestCase(ScoringParityMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.prepare_model(LogisticRegression(), load_breast_cancer(), StandardScaler())
+
+
+class LogisticRegressionMinMaxScoringTestCase(ScoringParityMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.prepare_model(LogisticRegression(), load_breast_cancer(), MinMaxScaler())
+
+
+class LogisticRegressionFoldedScoringTestCase(ScoringParityMixin, unittest.TestCase):
+
+    options = {'fold_transformer': True}
+
+    def setUp(self):
+        self.prepare_model(LogisticRegression(), load_breast_cancer(), StandardScaler())
+
+
+class LinearRegressionFoldedScoringTestCase(ScoringParityMixin, unittest.TestCase):
+
+    options = {'fold_transformer': True}
+
+    def setUp(self):
+        self.prepare_model(LinearRegression(), load_boston(), MinMaxScaler(feature_range=(-1, 1)))
+
+
+class LinearRegressionScoringTestCase(ScoringParityMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.prepare_model(LinearRegression(), load_boston())
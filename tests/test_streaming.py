@@ -0,0 +1,59 @@
+import asyncio
+import io
+import unittest
+
+from sklearn.datasets import load_iris
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.svm import SVC
+from scikit2pmml import scikit2pmml, iter_pmml, AsyncPMMLIterator
+
+
+class StreamingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        iris = load_iris()
+        self.model = GradientBoostingClassifier(n_estimators=50, random_state=0).fit(iris.data, iris.target)
+        streamed = io.BytesIO()
+        self.digest = scikit2pmml(self.model, file=streamed, stream=True, deterministic=True)
+        self.document = streamed.getvalue()
+
+    def test_chunks(self):
+        chunks = list(iter_pmml(self.model, chunk_size=10000, deterministic=True))
+        self.assertEqual(b''.join(chunks), self.document, 'Identical to streamed export.')
+        self.assertIn(b'</Header>', chunks[0], 'Header comes first.')
+        self.assertNotIn(b'<DataDictionary', chunks[0], 'Header is not held back.')
+        self.assertTrue(all(len(chunk) >= 10000 for chunk in chunks[1:-1]), 'Small fragments merged.')
+        self.assertGreater(len(chunks), 3, 'Document is not buffered whole.')
+        with self.assertRaises(TypeError):
+            iter_pmml(SVC())
+
+    def test_async(self):
+        async def consume(**kwargs):
+            chunks = []
+            async with AsyncPMMLIterator(self.model, deterministic=True, **kwargs) as export:
+                async for chunk in export:
+                    chunks.append(chunk)
+            return export, chunks
+
+        export, chunks = asyncio.run(consume(chunk_size=10000))
+        self.assertEqual(b''.join(chunks), self.document, 'Identical to streamed export.')
+        self.assertEqual((export.pmml.digest, export.pmml.size), (self.digest, len(self.document)), 'Digest.')
+
+    def test_async_close(self):
+        async def consume():
+            export = AsyncPMMLIterator(self.model, chunk_size=1)
+            first = await export.__anext__()
+            await export.aclose()
+            return first, export
+
+        first, export = asyncio.run(consume())
+        self.assertTrue(first.startswith(b'<?xml'), 'First chunk received.')
+        self.assertIsNone(export.pmml.digest, 'Export stopped.')
+        self.assertIsNone(next(export.chunks, None), 'Generator closed.')
+
+    def test_async_error(self):
+        async def consume():
+            return [chunk async for chunk in AsyncPMMLIterator(self.model, validate=True, pmml_version='4.2.1')]
+
+        with self.assertRaises(ValueError):
+            asyncio.run(consume())
@@ -1,13 +1,24 @@
+import io
 import unittest
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
 
-from sklearn.datasets import load_iris
+import numpy as np
+from sklearn.datasets import load_breast_cancer, load_iris
 from sklearn.tree import DecisionTreeClassifier, ExtraTreeClassifier
+from scikit2pmml import scikit2pmml, estimate, validate
+from scikit2pmml.scoring import compile_scorer
 
 from tests.generic import GenericModelMixin
 from tests.generic import SchemaValidationMixin
+from tests.generic import CompactOutputMixin
+from tests.generic import ChildOrderMixin
 
 
-class DecisionTreeClassifierTestCase(GenericModelMixin, SchemaValidationMixin, unittest.TestCase):
+class DecisionTreeClassifierTestCase(GenericModelMixin, SchemaValidationMixin, CompactOutputMixin, ChildOrderMixin,
+                                     unittest.TestCase):
 
     def setUp(self):
         super().prepare_model(DecisionTreeClassifier(), load_iris())
@@ -15,8 +26,72 @@ class DecisionTreeClassifierTestCase(GenericModelMixin, SchemaValidationMixin, u
     def test_model(self):
         pass
 
+    def test_deep_tree(self):
+        # alternating labels along single feature grow a chain deeper than the default recursion limit
+        X = np.arange(2400, dtype=np.float64).reshape(-1, 1)
+        y = np.arange(2400) % 2
+        model = DecisionTreeClassifier().fit(X, y)
+        self.assertGreater(model.tree_.max_depth, 1000)
+        buffer = io.BytesIO()
+        scikit2pmml(model, file=buffer, stream=True, deterministic=True)
+        self.assertEqual(buffer.getvalue().count(b'<Node '), model.tree_.node_count, 'All nodes exported.')
+        written = io.BytesIO()
+        scikit2pmml(model, file=written, deterministic=True)
+        self.assertEqual(written.getvalue(), buffer.getvalue(), 'Element tree written alike.')
+        etree = io.BytesIO()
+        scikit2pmml(model, file=etree, stream=True, deterministic=True, backend='etree')
+        self.assertEqual(etree.getvalue(), buffer.getvalue(), 'Etree backend serializes alike.')
 
-class ExtraTreeClassifierTestCase(GenericModelMixin, SchemaValidationMixin, unittest.TestCase):
+    def test_collapse(self):
+        # exactly balanced xor of the first two features, the third one splits nothing (children as mixed as parent)
+        X = np.array([[a, b, c] for a in (0, 1) for b in (0, 1) for c in (0, 1)] * 50, dtype=np.float64)
+        y = X[:, 0].astype(int) ^ X[:, 1].astype(int)
+        model = DecisionTreeClassifier(max_depth=2, max_features=1, random_state=0).fit(X, y)
+        pmml = scikit2pmml(model, collapse='probabilities')
+        nodes = list(pmml.iter('Node'))
+        self.assertLess(len(nodes), model.tree_.node_count, 'Subtrees collapsed.')
+        self.assertGreater(len(nodes), 1, 'Informative split kept.')
+        self.assertEqual(estimate(model, collapse='probabilities').default.nodes, len(nodes), 'Estimated alike.')
+        root = scikit2pmml(model).find('TreeModel/Node')
+        self.assertEqual(nodes[0].attrib['recordCount'], root.attrib['recordCount'], 'Records kept.')
+        for node in nodes:
+            leaves = {tuple(float(d.attrib['recordCount']) / float(leaf.attrib['recordCount'])
+                            for d in leaf.findall('ScoreDistribution'))
+                      for leaf in node.iter('Node') if leaf.find('Node') is None}
+            if node.find('Node') is not None:
+                self.assertGreater(len(leaves), 1, 'No uniform subtree left.')
+        proba = compile_scorer(pmml).predict_proba(X)
+        np.testing.assert_array_equal(proba, model.predict_proba(X), 'Probabilities unchanged.')
+        validate(pmml)
+        traffic = np.asarray(model.decision_path(X[:50]).sum(axis=0)).ravel()
+        ordered = scikit2pmml(model, collapse='probabilities', child_order='traffic', node_traffic=traffic,
+                              true_last=True)
+        self.assertEqual(len(list(ordered.iter('Node'))), len(nodes), 'Traffic of the kept nodes.')
+        with self.assertRaises(ValueError):
+            scikit2pmml(model, collapse='leaves')
+
+    def test_collapse_labels(self):
+        dataset = load_breast_cancer()
+        model = DecisionTreeClassifier(min_samples_leaf=5, random_state=0).fit(dataset.data, dataset.target)
+        pmml = scikit2pmml(model, collapse=True)
+        nodes = list(pmml.iter('Node'))
+        self.assertLess(len(nodes), model.tree_.node_count * 2 // 3, 'Same-class subtrees collapsed.')
+        self.assertEqual(estimate(model, collapse=True).default.nodes, len(nodes), 'Estimated alike.')
+        for node in nodes:
+            if node.find('Node') is not None:
+                labels = {leaf.attrib['score'] for leaf in node.iter('Node') if leaf.find('Node') is None}
+                self.assertGreater(len(labels), 1, 'No same-class subtree left.')
+        self.assertEqual(ET.tostring(scikit2pmml(model, collapse='labels').find('TreeModel')),
+                         ET.tostring(pmml.find('TreeModel')), 'Labels by default.')
+        np.testing.assert_array_equal(compile_scorer(pmml).predict(dataset.data),
+                                      ['y{}'.format(c) for c in model.predict(dataset.data)], 'Labels unchanged.')
+        self.assertEqual(len(list(scikit2pmml(model, collapse='probabilities').iter('Node'))), model.tree_.node_count,
+                         'No subtree of equal distributions.')
+        validate(pmml)
+
+
+class ExtraTreeClassifierTestCase(GenericModelMixin, SchemaValidationMixin, CompactOutputMixin, ChildOrderMixin,
+                                  unittest.TestCase):
 
     def setUp(self):
         super().prepare_model(ExtraTreeClassifier(), load_iris())
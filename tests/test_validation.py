@@ -0,0 +1,66 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+from scikit2pmml import scikit2pmml, validate, Validator
+from scikit2pmml.validation import compiled_schema
+
+
+class ValidationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        iris = load_iris()
+        self.model = RandomForestClassifier(n_estimators=3, random_state=0).fit(iris.data, iris.target)
+        self.directory = tempfile.mkdtemp()
+        buffer = io.BytesIO()
+        scikit2pmml(self.model, file=buffer, stream=True)
+        self.document = buffer.getvalue()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cached_schema(self):
+        self.assertIs(compiled_schema('4.2'), compiled_schema('4.2'), 'Schema compiled once.')
+        with self.assertRaises(ValueError):
+            compiled_schema('4.2.1')
+
+    def test_file(self):
+        for extension in ['', '.gz', '.xz']:
+            file = os.path.join(self.directory, 'model.pmml{}'.format(extension))
+            scikit2pmml(self.model, file=file, stream=True, pmml_version='4.3')
+            validate(file)
+            with self.assertRaises(ValueError):
+                validate(file, '4.2')
+
+    def test_invalid(self):
+        invalid = self.document.replace(b'operator="lessOrEqual"', b'operator="less"', 1)
+        with self.assertRaisesRegex(ValueError, 'operator'):
+            validate(io.BytesIO(invalid))
+        validator = Validator()
+        with self.assertRaisesRegex(ValueError, 'operator'):
+            for i in range(0, len(invalid), 1000):
+                validator.feed(invalid[i:i + 1000])
+            validator.close()
+
+    def test_inline(self):
+        digest = scikit2pmml(self.model, stream=True, validate=True, deterministic=True)
+        self.assertEqual(scikit2pmml(self.model, stream=True, deterministic=True), digest, 'Output unaffected.')
+        with self.assertRaises(ValueError):
+            scikit2pmml(self.model, stream=True, validate=True, pmml_version='4.2.1')
+
+    def test_deep_tree(self):
+        # alternating labels along single feature grow a chain nested deeper than the default limit of libxml2 (256),
+        # but within the limit of huge_tree (2048 in libxml2 2.11 and newer)
+        X = np.arange(1500, dtype=np.float64).reshape(-1, 1)
+        model = DecisionTreeClassifier().fit(X, np.arange(1500) % 2)
+        self.assertGreater(model.tree_.max_depth, 1000)
+        buffer = io.BytesIO()
+        scikit2pmml(model, file=buffer, stream=True, validate=True)
+        validate(io.BytesIO(buffer.getvalue()))
+        validate(scikit2pmml(model))